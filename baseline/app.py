@@ -3,7 +3,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-from baseline.pipeline import answer_question
+from baseline.pipeline import answer_question_stream
 from evaluation.evaluation_metrics import evaluate
 
 # — Apply our “environment” theme via CSS —
@@ -118,13 +118,19 @@ if mode == "🔍 Ask a Question":
         if not question.strip():
             st.warning("❗ Please enter a question.")
         else:
-            with st.spinner("Generating answer..."):
-                try:
-                    answer = answer_question(question=question, threshold=threshold)
-                    st.success("✅ Answer:")
-                    st.markdown(f"<div style='font-size:1.1em; color:#1b5e20;'>{answer}</div>", unsafe_allow_html=True)
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+            try:
+                stream = answer_question_stream(question=question, threshold=threshold)
+                # spinner only until the first token; the rest renders as it arrives
+                with st.spinner("Generating answer..."):
+                    answer = next(stream, "")
+                st.success("✅ Answer:")
+                box = st.empty()
+                box.markdown(f"<div style='font-size:1.1em; color:#1b5e20;'>{answer}</div>", unsafe_allow_html=True)
+                for piece in stream:
+                    answer += piece
+                    box.markdown(f"<div style='font-size:1.1em; color:#1b5e20;'>{answer}</div>", unsafe_allow_html=True)
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
 
 
 elif mode == "🧪 Evaluate on Test Set":
@@ -0,0 +1,87 @@
+# baseline/generator/answer_cache.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class SemanticAnswerCache:
+    """
+    Reuses generated answers for near-duplicate questions.
+    Past question embeddings live in a small FAISS inner-product index; a lookup
+    hits when a stored question has cosine similarity >= `threshold` and was
+    answered from the same contexts. Everything is dropped when the corpus
+    index version changes.
+    """
+    def __init__(self, threshold: float = 0.95, capacity: int = 1000, candidates: int = 5):
+        self.threshold  = threshold
+        self.capacity   = capacity
+        self.candidates = candidates
+        self.hits       = 0
+        self.misses     = 0
+        self.version    = None
+        self._index     = None
+        self._entries   = OrderedDict()   # id -> (context_key, answer)
+        self._next_id   = 0
+        self._lock      = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync_version(self, version):
+        # caller holds the lock
+        if version != self.version:
+            self._index   = None
+            self._entries = OrderedDict()
+            self.version  = version
+
+    def lookup(self, query_vec, context_key, version):
+        """
+        Returns the stored answer for a similar question with the same
+        context_key, or None. `query_vec` must be L2-normalized.
+        """
+        qv = np.asarray(query_vec, dtype="float32").reshape(1, -1)
+        with self._lock:
+            self._sync_version(version)
+            if not self._entries:
+                self.misses += 1
+                return None
+            sims, ids = self._index.search(qv, min(self.candidates, len(self._entries)))
+            for sim, eid in zip(sims[0], ids[0]):
+                if eid < 0 or sim < self.threshold:
+                    break
+                key, answer = self._entries[int(eid)]
+                if key == context_key:
+                    self._entries.move_to_end(int(eid))
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def store(self, query_vec, context_key, answer, version):
+        qv = np.asarray(query_vec, dtype="float32").reshape(1, -1)
+        with self._lock:
+            self._sync_version(version)
+            if self._index is None:
+                import faiss
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(qv.shape[1]))
+            eid = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(qv, np.array([eid], dtype="int64"))
+            self._entries[eid] = (context_key, answer)
+            if len(self._entries) > self.capacity:
+                old, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([old], dtype="int64"))
+
+    def clear(self):
+        with self._lock:
+            self._index   = None
+            self._entries = OrderedDict()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "size":     len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0
+        }
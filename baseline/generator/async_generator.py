@@ -0,0 +1,228 @@
+# baseline/generator/async_generator.py
+
+import os
+import time
+import random
+import asyncio
+import threading
+from dotenv import load_dotenv
+from baseline.generator.generator import usage_tokens
+from utils.metrics import REGISTRY
+load_dotenv()
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Async token bucket: at most `rate` acquisitions per second on average,
+    with bursts of up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate     = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens  = self.capacity
+        self._updated = time.monotonic()
+        self._lock    = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _is_transient(exc: Exception) -> bool:
+    from cerebras.cloud.sdk import APIConnectionError, APIStatusError
+    if isinstance(exc, APIConnectionError):
+        # includes APITimeoutError
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRY_STATUSES
+    return False
+
+def _retry_after(exc: Exception):
+    """
+    Seconds from a Retry-After header, if the server sent one.
+    """
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _landed(flights: dict, key, task):
+    if flights.get(key) is task:
+        del flights[key]
+    if not task.cancelled():
+        # marks the exception retrieved when every caller has gone away
+        task.exception()
+
+class _Shared:
+    # what async generators with the same key and endpoint share on one loop
+    def __init__(self, client):
+        self.client  = client
+        # identical requests in flight: (model, prompt, max_length) -> task
+        self.flights = {}
+
+# shared by all async generators in the process, like get_client() and
+# _FLIGHTS for sync ones: (loop, api_key, base_url) -> _Shared
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+def _loop_shared(api_key: str, base_url: str) -> _Shared:
+    """
+    The AsyncCerebras client and in-flight requests of the running loop for
+    this key and endpoint; the HTTP pool and futures belong to one loop.
+    """
+    key = (asyncio.get_running_loop(), api_key, base_url)
+    with _SHARED_LOCK:
+        shared = _SHARED.get(key)
+        if shared is None:
+            from cerebras.cloud.sdk import AsyncCerebras
+            # retries are ours, so the SDK must not retry as well
+            shared = _Shared(AsyncCerebras(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                warm_tcp_connection=False
+            ))
+            # drop state of loops that have since been closed
+            for k in [k for k in _SHARED if k[0].is_closed()]:
+                del _SHARED[k]
+            _SHARED[key] = shared
+    return shared
+
+class _LoopState:
+    # asyncio primitives belong to one event loop; limits are per generator
+    def __init__(self, shared: _Shared, max_concurrency: int, rate_limit: float):
+        self.shared    = shared
+        self.client    = shared.client
+        self.flights   = shared.flights
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket    = TokenBucket(rate_limit) if rate_limit else None
+
+class AsyncGenerator:
+    """
+    Async counterpart of Generator built on the SDK's AsyncCerebras client.
+    At most `max_concurrency` requests are in flight, request starts are
+    limited to `rate_limit` per second (0 = unlimited), and transient failures
+    are retried with jittered exponential backoff.
+    """
+    def __init__(
+        self,
+        model_name: str = "llama3.1-8b",
+        max_concurrency: int = 8,
+        rate_limit: float = 0.0,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        base_url: str = None,
+        api_key: str = None
+    ):
+        self.api_key = api_key or os.environ.get("CEREBRAS_API_KEY")
+        if not self.api_key:
+            raise ValueError("❌ CEREBRAS_API_KEY environment variable not set.")
+        self.model_name      = model_name
+        self.max_concurrency = max_concurrency
+        self.rate_limit      = rate_limit
+        self.max_retries     = max_retries
+        self.base_delay      = base_delay
+        self.max_delay       = max_delay
+        self.base_url        = base_url or os.environ.get("CEREBRAS_BASE_URL")
+        self._states         = {}
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        shared = _loop_shared(self.api_key, self.base_url)
+        state = self._states.get(loop)
+        if state is None or state.shared is not shared:
+            # drop state of loops that have since been closed
+            self._states = {l: s for l, s in self._states.items() if not l.is_closed()}
+            state = self._states[loop] = _LoopState(shared, self.max_concurrency, self.rate_limit)
+        return state
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(self.max_delay, hinted)
+        # "full jitter": uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def generate(self, prompt: str, max_length: int = 128) -> str:
+        return (await self.complete(prompt, max_length))[0]
+
+    async def complete(self, prompt: str, max_length: int = 128):
+        """
+        Returns (answer, tokens) where tokens holds the API's usage counts.
+        A request identical to one already in flight (same model, prompt and
+        max_length) awaits that one instead of being sent again; the joining
+        callers get empty tokens, since only one request was billed.
+        """
+        state = self._state()
+        key   = (self.model_name, prompt, max_length)
+        task  = state.flights.get(key)
+        if task is not None:
+            REGISTRY.inc("rag_coalesced_requests_total")
+            # shielded: a cancelled caller must not cancel the others' request
+            answer, _ = await asyncio.shield(task)
+            return answer, {}
+        task = state.flights[key] = asyncio.ensure_future(self._request(state, prompt, max_length))
+        task.add_done_callback(lambda t: _landed(state.flights, key, t))
+        return await asyncio.shield(task)
+
+    async def _request(self, state: _LoopState, prompt: str, max_length: int):
+        messages = [{"role": "user", "content": prompt}]
+        attempt = 0
+        while True:
+            async with state.semaphore:
+                if state.bucket is not None:
+                    await state.bucket.acquire()
+                try:
+                    response = await state.client.chat.completions.create(
+                        messages=messages,
+                        model=self.model_name,
+                        max_tokens=max_length
+                    )
+                    return response.choices[0].message.content, usage_tokens(response.usage)
+                except Exception as exc:
+                    if attempt >= self.max_retries or not _is_transient(exc):
+                        raise
+                    delay = self._backoff(attempt, exc)
+            # sleep outside the semaphore so waiting retries do not hold a slot
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def generate_batch(self, prompts: list, max_lengths=128) -> list:
+        """
+        Generates all prompts concurrently (bounded by max_concurrency);
+        answers are returned in prompt order.
+        """
+        return [answer for answer, _ in await self.complete_batch(prompts, max_lengths)]
+
+    async def complete_batch(self, prompts: list, max_lengths=128) -> list:
+        """
+        generate_batch() returning (answer, tokens) pairs.
+        """
+        if isinstance(max_lengths, int):
+            max_lengths = [max_lengths] * len(prompts)
+        return list(await asyncio.gather(
+            *(self.complete(p, m) for p, m in zip(prompts, max_lengths))
+        ))
+
+    async def aclose(self):
+        """
+        Closes the HTTP client of the running loop, which every generator
+        with this key and endpoint shares; the next request opens a new one.
+        """
+        loop = asyncio.get_running_loop()
+        self._states.pop(loop, None)
+        with _SHARED_LOCK:
+            shared = _SHARED.pop((loop, self.api_key, self.base_url), None)
+        if shared is not None:
+            await shared.client.close()
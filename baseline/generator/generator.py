@@ -1,21 +1,205 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import os
-from cerebras.cloud.sdk import Cerebras
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.metrics import REGISTRY
 load_dotenv()
+
+def usage_tokens(usage) -> dict:
+    """
+    {"prompt": n, "completion": m} from an API usage object ({} if absent).
+    """
+    if usage is None:
+        return {}
+    return {"prompt": usage.prompt_tokens or 0, "completion": usage.completion_tokens or 0}
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function and callers arriving while it runs wait for its result (or
+    exception) instead of repeating it. Nothing is kept once the call ends.
+    """
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Returns (result, shared); shared is True for callers that waited on
+        another caller's call.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+class StreamFlight:
+    """
+    SingleFlight for streams: concurrent calls with the same key share one
+    upstream stream. Every caller gets all of its items from the start;
+    whichever caller is furthest ahead reads the next one from upstream, and
+    the stream is closed early only once every caller has stopped reading.
+    """
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._streams = {}
+
+    def join(self, key, open_stream):
+        """
+        Returns (items, shared): a generator over the stream's items, to be
+        closed when done, and whether another caller's stream was joined.
+        `open_stream` is called once, when the first item is needed.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            shared = stream is not None
+            if not shared:
+                stream = self._streams[key] = _SharedStream(self, key, open_stream)
+            stream.readers += 1
+        return stream.read(), shared
+
+_PULL = object()
+
+class _SharedStream:
+    def __init__(self, flight, key, open_stream):
+        self.flight   = flight
+        self.key      = key
+        self.open     = open_stream
+        self.upstream = None
+        self.items    = []
+        self.done     = False
+        self.error    = None
+        self.readers  = 0
+        self.pulling  = False
+        self.cond     = threading.Condition(flight._lock)
+
+    def read(self):
+        i = 0
+        try:
+            while True:
+                with self.cond:
+                    while i >= len(self.items) and not self.done and self.pulling:
+                        self.cond.wait()
+                    if i < len(self.items):
+                        item = self.items[i]
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    else:
+                        self.pulling, item = True, _PULL
+                if item is _PULL:
+                    self._pull()
+                    continue
+                i += 1
+                yield item
+        finally:
+            with self.cond:
+                self.readers -= 1
+                abandoned = self.readers == 0 and not self.done
+                if abandoned:
+                    self._finish()
+            if abandoned:
+                self._close()
+
+    def _pull(self):
+        item, end, error = None, False, None
+        try:
+            if self.upstream is None:
+                self.upstream = self.open()
+            item = next(self.upstream)
+        except StopIteration:
+            end = True
+        except BaseException as e:
+            end, error = True, e
+        with self.cond:
+            self.pulling = False
+            if end:
+                self.error = error
+                self._finish()
+            else:
+                self.items.append(item)
+            self.cond.notify_all()
+        if end:
+            self._close()
+
+    def _finish(self):
+        # under the lock: later calls with this key start a new stream
+        self.done = True
+        if self.flight._streams.get(self.key) is self:
+            del self.flight._streams[self.key]
+
+    def _close(self):
+        # frees the connection if the callers stopped reading early
+        if self.upstream is not None and hasattr(self.upstream, "close"):
+            self.upstream.close()
+
+# shared by all generators in the process
+_FLIGHTS = SingleFlight()
+_STREAMS = StreamFlight()
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(api_key: str, base_url: str = None):
+    """
+    The process-wide Cerebras client for this key and endpoint. Its HTTP
+    pool keeps connections alive between calls, so generators sharing it
+    skip the TCP/TLS set-up a fresh client would pay.
+    """
+    key = (api_key, base_url)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            # imported here: the SDK is only needed once a generator is built
+            from cerebras.cloud.sdk import Cerebras
+            client = _CLIENTS[key] = Cerebras(api_key=api_key, base_url=base_url)
+    return client
+
 class Generator:
-    def __init__(self, model_name: str = "llama3.1-8b"):
+    def __init__(self, model_name: str = "llama3.1-8b", base_url: str = None):
         api_key = os.environ.get("CEREBRAS_API_KEY")
         if not api_key:
             raise ValueError("❌ CEREBRAS_API_KEY environment variable not set.")
-        
-        self.client = Cerebras(api_key=api_key)
+
+        self.base_url   = base_url or os.environ.get("CEREBRAS_BASE_URL")
+        self.client     = get_client(api_key, self.base_url)
         self.model_name = model_name
 
         # self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         # self.model     = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
     def generate(self, prompt: str, max_length: int = 128) -> str:
+        return self.complete(prompt, max_length)[0]
+
+    def complete(self, prompt: str, max_length: int = 128):
+        """
+        Returns (answer, tokens) where tokens holds the API's usage counts.
+        Identical requests already in flight (same model, prompt and
+        max_length) are joined rather than sent again; the joining callers
+        get empty tokens, since only one request was billed.
+        """
+        key = (self.base_url, self.model_name, prompt, max_length)
+        (answer, tokens), shared = _FLIGHTS.do(key, lambda: self._request(prompt, max_length))
+        if shared:
+            REGISTRY.inc("rag_coalesced_requests_total")
+            return answer, {}
+        return answer, tokens
+
+    def _request(self, prompt: str, max_length: int):
         # inputs = self.tokenizer(prompt, return_tensors='pt')
         # outputs = self.model.generate(
         #     **inputs,
@@ -30,4 +214,55 @@ class Generator:
             model=self.model_name,
             max_tokens=max_length
         )
-        return response.choices[0].message.content
+        return response.choices[0].message.content, usage_tokens(response.usage)
+
+    def generate_stream(self, prompt: str, max_length: int = 128, tokens: dict = None):
+        """
+        Like generate(), but yields the answer in pieces as the tokens arrive.
+        If a `tokens` dict is given it receives the usage counts at the end.
+        Identical streams already in flight are joined as complete() joins
+        requests; the joining callers get every piece but no usage counts.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        key = (self.base_url, self.model_name, prompt, max_length)
+        chunks, shared = _STREAMS.join(key, lambda: self.client.chat.completions.create(
+            messages=messages,
+            model=self.model_name,
+            max_tokens=max_length,
+            stream=True
+        ))
+        if shared:
+            REGISTRY.inc("rag_coalesced_requests_total")
+        try:
+            for chunk in chunks:
+                if tokens is not None and not shared and getattr(chunk, "usage", None) is not None:
+                    tokens.update(usage_tokens(chunk.usage))
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    yield piece
+        finally:
+            # the upstream stream is closed once no caller is reading it
+            chunks.close()
+
+    def generate_batch(self, prompts: list, max_lengths=128, max_workers: int = 8) -> list:
+        """
+        Generates answers for several prompts, keeping up to `max_workers`
+        requests in flight. `max_lengths` is an int or one value per prompt.
+        Answers are returned in prompt order.
+        """
+        return [answer for answer, _ in self.complete_batch(prompts, max_lengths, max_workers)]
+
+    def complete_batch(self, prompts: list, max_lengths=128, max_workers: int = 8) -> list:
+        """
+        generate_batch() returning (answer, tokens) pairs.
+        """
+        if isinstance(max_lengths, int):
+            max_lengths = [max_lengths] * len(prompts)
+        if not prompts:
+            return []
+        if len(prompts) == 1:
+            return [self.complete(prompts[0], max_lengths[0])]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as pool:
+            return list(pool.map(self.complete, prompts, max_lengths))
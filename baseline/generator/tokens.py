@@ -0,0 +1,97 @@
+# baseline/generator/tokens.py
+
+import os
+import re
+import math
+import threading
+
+# Hugging Face tokenizer used for exact counts (e.g. "meta-llama/Llama-3.1-8B");
+# unset = a regex estimate close to Llama-3-style BPE, with no extra dependency
+PROMPT_TOKENIZER = os.environ.get("PROMPT_TOKENIZER", "")
+
+# letter runs, digit groups of up to 3 (how Llama 3 splits numbers), single symbols
+_PIECE    = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+_SENTENCE = re.compile(r"[.!?](?=\s)")
+# letters per token in the estimate: common words are one token, longer ones split
+_CHARS_PER_TOKEN = 6
+
+class TokenCounter:
+    """
+    Counts and truncates text in prompt tokens. With a tokenizer name it uses
+    that Hugging Face tokenizer (transformers is imported on first use);
+    otherwise counts are estimated from word pieces.
+    """
+    def __init__(self, name: str = PROMPT_TOKENIZER):
+        self.name = name or "estimate"
+        self._tok = None
+        if name:
+            from transformers import AutoTokenizer
+            self._tok = AutoTokenizer.from_pretrained(name)
+
+    @staticmethod
+    def _piece_tokens(piece: str) -> int:
+        if piece[0].isalpha():
+            return math.ceil(len(piece) / _CHARS_PER_TOKEN)
+        return 1
+
+    def count(self, text: str) -> int:
+        if self._tok is not None:
+            return len(self._tok.encode(text, add_special_tokens=False))
+        return sum(self._piece_tokens(m.group()) for m in _PIECE.finditer(text))
+
+    def _prefix(self, text: str, max_tokens: int) -> str:
+        """
+        The longest prefix of `text` that fits in `max_tokens`.
+        """
+        if self._tok is not None:
+            ids = self._tok.encode(text, add_special_tokens=False)
+            return self._tok.decode(ids[:max_tokens])
+        used, end = 0, 0
+        for m in _PIECE.finditer(text):
+            used += self._piece_tokens(m.group())
+            if used > max_tokens:
+                break
+            end = m.end()
+        return text[:end]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cuts `text` to at most `max_tokens` tokens (plus a trailing ellipsis),
+        at the last sentence end if that keeps at least half of the budget,
+        otherwise at a word boundary.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        # one token is kept back for the ellipsis
+        prefix = self._prefix(text, max_tokens - 1)
+        ends = [m.end() for m in _SENTENCE.finditer(prefix + " ")]
+        if ends and self.count(prefix[:ends[-1]]) * 2 >= max_tokens:
+            return prefix[:ends[-1]]
+        if prefix[-1:].isalnum() and text[len(prefix):len(prefix) + 1].isalnum() and " " in prefix.strip():
+            # drop a word that was cut in half
+            prefix = prefix.rsplit(None, 1)[0]
+        return prefix.rstrip() + " …"
+
+_COUNTER = None
+_COUNTER_LOCK = threading.Lock()
+
+def get_counter() -> TokenCounter:
+    """
+    The process-wide TokenCounter for PROMPT_TOKENIZER.
+    """
+    global _COUNTER
+    with _COUNTER_LOCK:
+        if _COUNTER is None:
+            _COUNTER = TokenCounter(PROMPT_TOKENIZER)
+    return _COUNTER
+
+def counter_name() -> str:
+    """
+    get_counter().name, without loading the tokenizer.
+    """
+    return PROMPT_TOKENIZER or "estimate"
+
+def count_tokens(text: str) -> int:
+    return get_counter().count(text)
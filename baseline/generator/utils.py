@@ -1,35 +1,71 @@
 import re
 
-def _truncate_txt(txt: str, max_words: int = 50) -> str:
+from baseline.generator.tokens import get_counter
+
+# Context tokens per question type (prompt scaffolding and question excluded).
+# Chunks are ~170 tokens (up to ~350): lookups get two chunks plus a cut
+# third, lists three, explanations two.
+CONTEXT_BUDGETS = {
+    "numeric":     384,
+    "definition":  384,
+    "general":     384,
+    "list":        544,
+    "explanation": 384
+}
+# Contexts per prompt before budgets (three, two for explanations); long
+# chunks are cut so that at least this many sources still fit
+MIN_CONTEXTS = {"explanation": 2}
+DEFAULT_MIN_CONTEXTS = 3
+# a partly fitting chunk is cut to the remaining budget only if at least this much is left
+MIN_CONTEXT_TOKENS = 32
+# separator and "[i] " numbering added around each context
+CONTEXT_OVERHEAD   = 4
+
+def pack_contexts(texts: list, budget: int, n_tokens: list = None, counter=None, min_contexts: int = 1) -> list:
     """
-    Truncate a long context string to at most `max_words` words,
-    appending an ellipsis if truncated.
+    Fills `budget` tokens with contexts in the given (retrieval-score) order.
+    Contexts that fit are kept whole; the first one that does not is cut to
+    what is left (if that is at least MIN_CONTEXT_TOKENS) and packing stops.
+    Until `min_contexts` are packed, MIN_CONTEXT_TOKENS are held back for
+    each one still to come, cutting a long context rather than stopping.
+    `n_tokens` are precomputed counts per text (None entries are counted here).
+    Returns the packed texts, a prefix of `texts`.
     """
-    words = txt.split()
-    if len(words) <= max_words:
-        return txt
-    return " ".join(words[:max_words]) + " …"
+    counter = counter or get_counter()
+    packed, left = [], budget
+    for i, txt in enumerate(texts):
+        owed = max(0, min(min_contexts, len(texts)) - len(packed) - 1)
+        room = left - owed * (MIN_CONTEXT_TOKENS + CONTEXT_OVERHEAD)
+        n = n_tokens[i] if n_tokens is not None and n_tokens[i] is not None else counter.count(txt)
+        if n + CONTEXT_OVERHEAD <= room:
+            packed.append(txt)
+            left -= n + CONTEXT_OVERHEAD
+            continue
+        if room - CONTEXT_OVERHEAD >= MIN_CONTEXT_TOKENS:
+            packed.append(counter.truncate(txt, room - CONTEXT_OVERHEAD))
+            if owed:
+                left -= counter.count(packed[-1]) + CONTEXT_OVERHEAD
+                continue
+        break
+    return packed
 
 def build_prompt(question: str, contexts: list) -> str:
     """
-    Simple Q→A prompt: list each truncated context, then ask for the answer.
+    Simple Q→A prompt: list each context (already packed to the budget),
+    then ask for the answer.
     """
-    # Truncate each context to 50 words
-    truncated = [_truncate_txt(ctx, max_words=50) for ctx in contexts]
-    ctx_text  = "\n\n".join(truncated)
+    ctx_text = "\n\n".join(contexts)
     return f"Answer the question: {question}\n\n{ctx_text}\n\nAnswer:"
 
 def build_explanation_prompt(question: str, contexts: list) -> str:
     """
     Paragraph‐style prompt for descriptive/explanatory questions.
-    Each context is truncated to 50 words to avoid token‐overflow.
+    Contexts are expected to be packed to the token budget beforehand.
     """
-    # Truncate and then number each context snippet
-    max_words = 50
+    # Number each context snippet
     pieces = []
     for i, txt in enumerate(contexts):
-        t = _truncate_txt(txt, max_words=max_words)
-        pieces.append(f"[{i+1}] {t}")
+        pieces.append(f"[{i+1}] {txt}")
     ctx_block = "\n\n".join(pieces)
 
     return (
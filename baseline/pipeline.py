@@ -1,16 +1,67 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import time
+import asyncio
 import argparse
-from baseline.retriever.retriever import Retriever
+import threading
+from baseline.retriever.retriever import Retriever, DEFAULT_EMBED_MODEL
+from baseline.retriever.embedding_cache import EmbeddingCache
+from baseline.retriever.sentence_store import compress_hits
+from baseline.retriever.layout import is_sharded, index_dir, MANIFEST_NAME, SHARD_MANIFEST, SENTENCES_NAME
 from baseline.generator.generator import Generator
+from baseline.generator.async_generator import AsyncGenerator
+from baseline.generator.answer_cache import SemanticAnswerCache
 from baseline.generator.utils import (
     build_prompt,
     classify_qtype,
-    build_explanation_prompt
+    build_explanation_prompt,
+    pack_contexts,
+    CONTEXT_BUDGETS,
+    MIN_CONTEXTS,
+    DEFAULT_MIN_CONTEXTS
 )
 # from utils.logger import log_query
 from utils.logger import log_query
+from utils.metrics import StageTimer, record_request, start_metrics_server
+
+# INDEX_PATH may also name a directory of shards (create_indexes.py --shards)
+DEFAULT_INDEX_PATH   = os.environ.get("INDEX_PATH", "models/faiss_index.idx")
+DEFAULT_RECORDS_PATH = "models/chunk_store"
+# Sentence embeddings for extractive compression (create_indexes.py --sentences)
+# are read from the index's directory; set COMPRESS_CONTEXTS=0 to send whole
+# chunks even when the store exists
+COMPRESS_CONTEXTS       = os.environ.get("COMPRESS_CONTEXTS", "1") not in ("", "0", "false")
+COMPRESS_MIN_SIMILARITY = float(os.environ.get("COMPRESS_MIN_SIMILARITY", "0.25"))
+# Query-embedding cache file; set EMBED_CACHE_PATH="" to keep it in memory only
+EMBED_CACHE_PATH     = os.environ.get("EMBED_CACHE_PATH", "models/embedding_cache.pkl")
+EMBED_CACHE_SIZE     = int(os.environ.get("EMBED_CACHE_SIZE", "10000"))
+# Semantic answer cache; ANSWER_CACHE_SIZE=0 disables it
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE      = int(os.environ.get("ANSWER_CACHE_SIZE", "1000"))
+# Async generation: max requests in flight and request starts per second (0 = no limit)
+GEN_CONCURRENCY        = int(os.environ.get("GEN_CONCURRENCY", "8"))
+GEN_RATE_LIMIT         = float(os.environ.get("GEN_RATE_LIMIT", "0"))
+# Candidates re-scored exactly by quantized (sq8 / binary) indexes; 0 = value stored with the index
+SEARCH_SHORTLIST       = int(os.environ.get("SEARCH_SHORTLIST", "0"))
+# Context tokens per prompt; 0 = the per-question-type CONTEXT_BUDGETS
+CONTEXT_TOKEN_BUDGET   = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "0"))
+# Serve Prometheus metrics on this local port (0 = off)
+METRICS_PORT           = int(os.environ.get("METRICS_PORT", "0"))
+
+_EMBED_CACHE = None
+_EMBED_CACHE_LOCK = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    The process-wide query-embedding cache (entries are keyed by model name,
+    so it is shared by every pipeline and survives index reloads).
+    """
+    global _EMBED_CACHE
+    with _EMBED_CACHE_LOCK:
+        if _EMBED_CACHE is None:
+            _EMBED_CACHE = EmbeddingCache(EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH or None)
+    return _EMBED_CACHE
 
 def _get_text(r):
     if isinstance(r, dict):
@@ -20,57 +71,443 @@ def _get_text(r):
     else:
         return str(r).strip()
 
+def _n_tokens(r):
+    # token count stored with the chunk at index time (None for older stores)
+    return r.get("n_tokens") if isinstance(r, dict) else None
+
+def _context_id(r):
+    if isinstance(r, dict):
+        return (r.get("doc_id"), r.get("chunk_id"))
+    return _get_text(r)
+
+def _file_stamp(path: str):
+    """
+    (mtime, size) of a file; changes whenever the file is rewritten.
+    A chunk store directory is stamped by its meta.json.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "meta.json")
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+class RAGPipeline:
+    """
+    Keeps a Retriever (FAISS index, records, embedder) and a Generator
+    loaded so that repeated questions do not pay the cold-load cost.
+    The retriever is rebuilt when the index or records file changes on disk.
+    """
+    def __init__(
+        self,
+        index_path:   str = DEFAULT_INDEX_PATH,
+        records_path: str = DEFAULT_RECORDS_PATH,
+        model_name:   str = DEFAULT_EMBED_MODEL,
+        answer_cache_threshold: float = ANSWER_CACHE_THRESHOLD,
+        answer_cache_size:      int = ANSWER_CACHE_SIZE,
+        mmap:         bool = False,
+        sentences_path: str = None
+    ):
+        self.index_path   = index_path
+        self.records_path = records_path
+        self.model_name   = model_name
+        self.mmap         = mmap
+        self.sentences_path = (sentences_path or os.path.join(index_dir(index_path), SENTENCES_NAME)
+                               if COMPRESS_CONTEXTS else None)
+        self._lock        = threading.Lock()
+        self._retriever   = None
+        self._stamp       = None
+        self._generator   = None
+        self._async_generator = None
+        self.answer_cache = None
+        if answer_cache_size > 0:
+            self.answer_cache = SemanticAnswerCache(answer_cache_threshold, answer_cache_size)
+
+    def _files_stamp(self):
+        # the build manifest is written after the sentence store, so a
+        # finished build is picked up together with its sentences
+        manifest = os.path.join(index_dir(self.index_path), MANIFEST_NAME)
+        built = _file_stamp(manifest) if os.path.isfile(manifest) else None
+        if is_sharded(self.index_path):
+            # shards carry their own chunk stores; the manifest is written last
+            return (_file_stamp(os.path.join(self.index_path, SHARD_MANIFEST)), built)
+        return (_file_stamp(self.index_path), _file_stamp(self.records_path), built)
+
+    def _acquire(self):
+        """
+        Returns (retriever, version), reloading first if the files on disk changed.
+        Callers keep the instance they got, so a reload never swaps
+        the index out from under a request that is already running; the
+        replaced retriever closes its pools and files once the last of
+        them lets go of it.
+        """
+        stamp = self._files_stamp()
+        with self._lock:
+            if self._retriever is None or stamp != self._stamp:
+                self._retriever = Retriever(
+                    self.index_path,
+                    self.records_path,
+                    model_name=self.model_name,
+                    cache=get_embedding_cache(),
+                    mmap=self.mmap,
+                    shortlist=SEARCH_SHORTLIST or None,
+                    sentences_path=self.sentences_path
+                )
+                self._stamp = stamp
+            return self._retriever, self._stamp
+
+    @property
+    def retriever(self) -> Retriever:
+        return self._acquire()[0]
+
+    @property
+    def generator(self) -> Generator:
+        if self._generator is None:
+            with self._lock:
+                if self._generator is None:
+                    self._generator = Generator()
+        return self._generator
+
+    @property
+    def async_generator(self) -> AsyncGenerator:
+        if self._async_generator is None:
+            with self._lock:
+                if self._async_generator is None:
+                    self._async_generator = AsyncGenerator(
+                        max_concurrency=GEN_CONCURRENCY,
+                        rate_limit=GEN_RATE_LIMIT
+                    )
+        return self._async_generator
+
+    def version(self) -> dict:
+        """
+        What answers depend on besides the question: the index files on disk
+        (including the build manifest) and the embedding and generator models.
+        """
+        _, stamp = self._acquire()
+        return {"index": stamp, "embed_model": self.model_name, "generator": self.generator.model_name}
+
+    def reload(self):
+        """
+        Drop the loaded retriever so the next call reads the files again.
+        """
+        with self._lock:
+            self._retriever = None
+            self._stamp     = None
+
+    @staticmethod
+    def _build(question: str, qtype: str, hits: list, qvec=None, sentences=None):
+        """
+        Picks the contexts for this question type and builds its prompt.
+        With a sentence store, the budget is filled with the sentences most
+        similar to `qvec`; otherwise with whole chunks.
+        Returns (candidates, contexts, prompt, max_length).
+        """
+        budget     = CONTEXT_TOKEN_BUDGET or CONTEXT_BUDGETS.get(qtype, CONTEXT_BUDGETS["general"])
+        compressed = None
+        if sentences is not None and qvec is not None:
+            compressed = compress_hits(sentences, qvec, hits, budget, COMPRESS_MIN_SIMILARITY)
+        if compressed is not None:
+            candidates, contexts = compressed
+        else:
+            # Fill the question type's token budget in retrieval-score order
+            contexts   = pack_contexts([_get_text(r) for r,_ in hits], budget,
+                                       n_tokens=[_n_tokens(r) for r,_ in hits],
+                                       min_contexts=MIN_CONTEXTS.get(qtype, DEFAULT_MIN_CONTEXTS))
+            candidates = hits[:len(contexts)]
+
+        if qtype == "explanation":
+            prompt = build_explanation_prompt(question, contexts)
+        else:
+            prompt = build_prompt(question, contexts)
+            if qtype == "list":
+                prompt += "\n\nPlease list *all* the items asked for, exactly as they appear above."
+
+        # Give explanations more room
+        max_length = 200 if qtype == "explanation" else 128
+        return candidates, contexts, prompt, max_length
+
+    def _cached_answer(self, qvec, qtype, candidates, version):
+        if self.answer_cache is None:
+            return None, None
+        key = (qtype, tuple(_context_id(r) for r,_ in candidates))
+        return key, self.answer_cache.lookup(qvec, key, version)
+
+    def _prepare(self, questions: list, threshold: float, doc_ids=None, sections=None):
+        """
+        Everything before generation, for a batch of questions: classify,
+        embed once, search once (within `doc_ids` / `sections` if given),
+        build prompts and consult the answer cache.
+        Returns (items, version); items without an "answer" still need generating.
+        Each item carries a StageTimer; batch-wide stages are charged to every item.
+        """
+        started = time.perf_counter()
+        shared  = StageTimer()
+        with shared.stage("load"):
+            retriever, version = self._acquire()
+        with shared.stage("embed"):
+            qvecs = retriever.embed_batch(questions)
+        with shared.stage("search"):
+            batches = retriever.search(qvecs, k=10, threshold=threshold, doc_ids=doc_ids, sections=sections)
+
+        items = []
+        for question, qvec, hits in zip(questions, qvecs, batches):
+            timer = StageTimer()
+            for name, secs in shared.stages.items():
+                timer.add(name, secs)
+            with timer.stage("classify"):
+                qtype = classify_qtype(question)
+            with timer.stage("prompt"):
+                candidates, contexts, prompt, max_length = self._build(
+                    question, qtype, hits, qvec, retriever.sentences)
+            with timer.stage("cache"):
+                key, cached = self._cached_answer(qvec, qtype, candidates, version)
+            items.append({
+                "question":   question,
+                "qvec":       qvec,
+                "candidates": candidates,
+                "contexts":   contexts,
+                "prompt":     prompt,
+                "max_length": max_length,
+                "key":        key,
+                "cached":     cached is not None,
+                "answer":     cached,
+                "timer":      timer,
+                "tokens":     {},
+                "started":    started
+            })
+        return items, version
+
+    @staticmethod
+    def _generated(todo: list, results: list, seconds: float):
+        # results are (answer, tokens) pairs; the batch's wall time is charged to each item
+        for item, (ans, tokens) in zip(todo, results):
+            item["answer"] = ans
+            item["tokens"] = tokens
+            item["timer"].add("generate", seconds)
+
+    def _finish(self, items: list, version) -> list:
+        """
+        Caches newly generated answers, logs every question with its stage
+        timings and returns the answers. The log write itself is only
+        visible in the metrics, since it cannot time its own entry.
+        """
+        for item in items:
+            timer = item["timer"]
+            if not item["cached"] and item["key"] is not None:
+                with timer.stage("cache"):
+                    self.answer_cache.store(item["qvec"], item["key"], item["answer"], version)
+            timer.add("total", time.perf_counter() - item["started"])
+            with timer.stage("log"):
+                log_query(
+                    item["question"],
+                    list(zip(item["contexts"], [float(s) for _,s in item["candidates"]])),
+                    item["prompt"],
+                    item["answer"],
+                    timings={k: v for k, v in timer.as_dict().items() if k != "log"},
+                    tokens=item["tokens"],
+                    cached=item["cached"]
+                )
+            record_request(timer.stages, item["tokens"], item["cached"])
+        return [item["answer"] for item in items]
+
+    def answer(self, question: str, threshold: float = 0.2, doc_ids=None, sections=None) -> str:
+        return self.answer_batch([question], threshold=threshold, doc_ids=doc_ids, sections=sections)[0]
+
+    def answer_batch(self, questions: list, threshold: float = 0.2, doc_ids=None, sections=None) -> list:
+        """
+        Answers several questions with one embed call and one FAISS search,
+        then sends all uncached prompts to the generator together.
+        Answers are returned in question order.
+        """
+        questions = list(questions)
+        if not questions:
+            return []
+        items, version = self._prepare(questions, threshold, doc_ids, sections)
+        todo = [item for item in items if item["answer"] is None]
+        t0 = time.perf_counter()
+        generated = self.generator.complete_batch(
+            [item["prompt"] for item in todo],
+            max_lengths=[item["max_length"] for item in todo]
+        )
+        self._generated(todo, generated, time.perf_counter() - t0)
+        return self._finish(items, version)
+
+    def answer_stream(self, question: str, threshold: float = 0.2, doc_ids=None, sections=None):
+        """
+        Yields the answer in pieces as the generator produces them (a cached
+        answer arrives as a single piece). The question is cached and logged
+        once the stream is complete; an abandoned stream is not logged.
+        """
+        items, version = self._prepare([question], threshold, doc_ids, sections)
+        item = items[0]
+        if item["answer"] is None:
+            parts = []
+            t0 = time.perf_counter()
+            stream = self.generator.generate_stream(item["prompt"], item["max_length"], tokens=item["tokens"])
+            for piece in stream:
+                if not parts:
+                    item["timer"].add("first_token", time.perf_counter() - t0)
+                parts.append(piece)
+                yield piece
+            item["timer"].add("generate", time.perf_counter() - t0)
+            item["answer"] = "".join(parts)
+        else:
+            yield item["answer"]
+        self._finish(items, version)
+
+    async def answer_async(self, question: str, threshold: float = 0.2, doc_ids=None, sections=None) -> str:
+        return (await self.answer_batch_async([question], threshold=threshold,
+                                              doc_ids=doc_ids, sections=sections))[0]
+
+    async def answer_batch_async(self, questions: list, threshold: float = 0.2,
+                                 doc_ids=None, sections=None) -> list:
+        """
+        Async answer_batch: retrieval runs in a worker thread, generation goes
+        through the AsyncGenerator so many questions can be in flight at once.
+        """
+        questions = list(questions)
+        if not questions:
+            return []
+        items, version = await asyncio.to_thread(self._prepare, questions, threshold, doc_ids, sections)
+        todo = [item for item in items if item["answer"] is None]
+        t0 = time.perf_counter()
+        generated = await self.async_generator.complete_batch(
+            [item["prompt"] for item in todo],
+            max_lengths=[item["max_length"] for item in todo]
+        )
+        self._generated(todo, generated, time.perf_counter() - t0)
+        return self._finish(items, version)
+
+    async def answer_each_async(self, questions: list, threshold: float = 0.2,
+                                doc_ids=None, sections=None) -> list:
+        """
+        Retrieval for all questions with one embed and one search call, then
+        one task per question that resolves to its answer as soon as its own
+        generation is done, so a slow completion does not hold back the rest.
+        Returns the tasks in question order.
+        """
+        items, version = await asyncio.to_thread(self._prepare, list(questions), threshold, doc_ids, sections)
+        return [asyncio.ensure_future(self._complete_async(item, version)) for item in items]
+
+    async def _complete_async(self, item: dict, version) -> str:
+        if item["answer"] is None:
+            t0 = time.perf_counter()
+            result = await self.async_generator.complete(item["prompt"], item["max_length"])
+            self._generated([item], [result], time.perf_counter() - t0)
+        return self._finish([item], version)[0]
+
+# Process-wide registry: one pipeline per (index, records, embedding model)
+_PIPELINES = {}
+_PIPELINES_LOCK = threading.Lock()
+
+def get_pipeline(
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    mmap:         bool = False
+) -> RAGPipeline:
+    """
+    Returns the shared RAGPipeline for these files and model, creating it on first use.
+    """
+    key = (os.path.abspath(index_path), os.path.abspath(records_path), model_name, mmap)
+    with _PIPELINES_LOCK:
+        pipeline = _PIPELINES.get(key)
+        if pipeline is None:
+            pipeline = _PIPELINES[key] = RAGPipeline(*key[:3], mmap=mmap)
+            if METRICS_PORT:
+                start_metrics_server(METRICS_PORT)
+    return pipeline
+
 def answer_question(
     question: str,
-    index_path:   str = "models/faiss_index.idx",
-    records_path: str = "models/corpus_records.pkl",
-    threshold:    float = 0.2
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    threshold:    float = 0.2,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    mmap:         bool = False,
+    doc_ids:      list = None,
+    sections:     list = None
 ) -> str:
-    # 1) Determine question type
-    qtype = classify_qtype(question)
-
-    # 2) Retrieve just 2 contexts for explanations, else 3
-    retriever = Retriever(index_path, records_path, threshold=threshold)
-    desired_k = 2 if qtype == "explanation" else 3
-    candidates = retriever.get_top_k(question, k=10)[:desired_k]
-    contexts   = [_get_text(r) for r,_ in candidates]
-
-    # 3) Build prompt
-    if qtype == "explanation":
-        prompt = build_explanation_prompt(question, contexts)
-    else:
-        prompt = build_prompt(question, contexts)
-        if qtype == "list":
-            prompt += "\n\nPlease list *all* the items asked for, exactly as they appear above."
-
-    # 4) Generate (give explanations more room)
-    generator = Generator()
-    if qtype == "explanation":
-        raw_ans = generator.generate(prompt, max_length=200)
-    else:
-        raw_ans = generator.generate(prompt)
+    pipeline = get_pipeline(index_path, records_path, model_name, mmap)
+    return pipeline.answer(question, threshold=threshold, doc_ids=doc_ids, sections=sections)
+
+def answer_questions(
+    questions:    list,
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    threshold:    float = 0.2,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    mmap:         bool = False,
+    doc_ids:      list = None,
+    sections:     list = None
+) -> list:
+    """
+    Batched answer_question: returns one answer per question, in order.
+    """
+    pipeline = get_pipeline(index_path, records_path, model_name, mmap)
+    return pipeline.answer_batch(questions, threshold=threshold, doc_ids=doc_ids, sections=sections)
+
+def answer_question_stream(
+    question: str,
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    threshold:    float = 0.2,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    mmap:         bool = False,
+    doc_ids:      list = None,
+    sections:     list = None
+):
+    """
+    Streaming answer_question: yields the answer text piece by piece.
+    """
+    pipeline = get_pipeline(index_path, records_path, model_name, mmap)
+    yield from pipeline.answer_stream(question, threshold=threshold, doc_ids=doc_ids, sections=sections)
 
-    # 5) Log and return
-    log_query(
-        question,
-        list(zip(contexts, [float(s) for _,s in candidates])),
-        prompt,
-        raw_ans
-    )
-    return raw_ans
+async def answer_question_async(
+    question: str,
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    threshold:    float = 0.2,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    doc_ids:      list = None,
+    sections:     list = None
+) -> str:
+    """
+    Async answer_question; many calls can be awaited concurrently.
+    """
+    pipeline = get_pipeline(index_path, records_path, model_name)
+    return await pipeline.answer_async(question, threshold=threshold, doc_ids=doc_ids, sections=sections)
+
+async def answer_questions_async(
+    questions:    list,
+    index_path:   str = DEFAULT_INDEX_PATH,
+    records_path: str = DEFAULT_RECORDS_PATH,
+    threshold:    float = 0.2,
+    model_name:   str = DEFAULT_EMBED_MODEL,
+    doc_ids:      list = None,
+    sections:     list = None
+) -> list:
+    pipeline = get_pipeline(index_path, records_path, model_name)
+    return await pipeline.answer_batch_async(questions, threshold=threshold, doc_ids=doc_ids, sections=sections)
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-q",         "--question", required=True, help="Your query")
     parser.add_argument("--threshold", type=float, default=0.2,                  help="Min FAISS similarity to keep a chunk")
+    parser.add_argument("--mmap",      action="store_true",                      help="Memory-map the FAISS index instead of reading it into RAM")
+    parser.add_argument("--doc",       action="append", dest="doc_ids",          help="Only search this document (repeatable)")
+    parser.add_argument("--section",   action="append", dest="sections",         help="Only search this section (repeatable)")
     args = parser.parse_args()
 
-    answer = answer_question(
-        question=args.question,
-        threshold=args.threshold
-    )
     print("\nAnswer:")
-    print(answer)
+    for piece in answer_question_stream(
+        question=args.question,
+        threshold=args.threshold,
+        mmap=args.mmap,
+        doc_ids=args.doc_ids,
+        sections=args.sections
+    ):
+        print(piece, end="", flush=True)
+    print()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+# baseline/retriever/chunk_store.py
+
+import os
+import sys
+import json
+import mmap
+import pickle
+import shutil
+import numpy as np
+from baseline.generator.tokens import counter_name
+
+META_NAME = "meta.json"
+
+# string columns are interned into a table + int32 index per row
+_STRING_COLUMNS = ("doc_id", "section")
+
+def write_chunk_store(records, path: str, tokenizer: str = None):
+    """
+    Writes (faiss_id, record) pairs as a columnar store directory:
+      ids.npy              sorted FAISS ids (int64)
+      offsets.npy          n+1 byte offsets into text.bin (int64)
+      text.bin             UTF-8 chunk texts, back to back
+      <col>.json/.idx.npy  interned doc_id / section tables and per-row indexes
+      <col>.postings.npy   ids of each doc_id / section value, grouped by value
+      <col>.starts.npy     offsets of each value's group in <col>.postings.npy
+      <col>.npy            integer columns (chunk_id, ...)
+    `tokenizer` names the TokenCounter behind an n_tokens column.
+    The directory is built next to `path` and swapped in with a rename, so a
+    reader never sees a half-written store.
+    """
+    rows = sorted(((int(i), r) for i, r in records), key=lambda x: x[0])
+    tmp = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    offsets = np.zeros(len(rows) + 1, dtype="int64")
+    tables  = {c: {} for c in _STRING_COLUMNS}
+    indexes = {c: np.zeros(len(rows), dtype="int32") for c in _STRING_COLUMNS}
+    int_columns = sorted({
+        k for _, r in rows for k, v in r.items()
+        if k not in _STRING_COLUMNS and k != "text" and isinstance(v, int) and not isinstance(v, bool)
+    })
+    ints = {c: np.zeros(len(rows), dtype="int64") for c in int_columns}
+
+    with open(os.path.join(tmp, "text.bin"), "wb") as blob:
+        for row, (_, r) in enumerate(rows):
+            data = r.get("text", "").encode("utf-8")
+            blob.write(data)
+            offsets[row + 1] = offsets[row] + len(data)
+            for c in _STRING_COLUMNS:
+                indexes[c][row] = tables[c].setdefault(r.get(c), len(tables[c]))
+            for c in int_columns:
+                ints[c][row] = r.get(c, -1)
+
+    ids = np.array([i for i, _ in rows], dtype="int64")
+    np.save(os.path.join(tmp, "ids.npy"), ids)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    for c in _STRING_COLUMNS:
+        with open(os.path.join(tmp, f"{c}.json"), "w", encoding="utf-8") as f:
+            json.dump(list(tables[c]), f, ensure_ascii=False)
+        np.save(os.path.join(tmp, f"{c}.idx.npy"), indexes[c])
+        postings, starts = _postings(ids, indexes[c], len(tables[c]))
+        np.save(os.path.join(tmp, f"{c}.postings.npy"), postings)
+        np.save(os.path.join(tmp, f"{c}.starts.npy"), starts)
+    for c in int_columns:
+        np.save(os.path.join(tmp, f"{c}.npy"), ints[c])
+
+    contiguous = bool(len(ids) == 0 or (ids[0] == 0 and ids[-1] == len(ids) - 1))
+    with open(os.path.join(tmp, META_NAME), "w", encoding="utf-8") as f:
+        json.dump({"count": len(rows), "contiguous": contiguous, "int_columns": int_columns,
+                   "tokenizer": tokenizer}, f)
+
+    old = path.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+def _postings(ids, index, n_values: int):
+    """
+    Inverted lists of an interned column: ids grouped by value (sorted within
+    each group, as rows are in id order) and n_values+1 group offsets.
+    """
+    order  = np.argsort(index, kind="stable")
+    starts = np.searchsorted(np.asarray(index)[order], np.arange(n_values + 1)).astype("int64")
+    return np.asarray(ids, dtype="int64")[order], starts
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a store written by write_chunk_store().
+    Indexing by FAISS id materializes just that record as a dict, so only
+    the retrieved hits are ever decoded; pages are shared between processes.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_NAME), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.ids     = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.tables  = {}
+        self.indexes = {}
+        for c in _STRING_COLUMNS:
+            with open(os.path.join(path, f"{c}.json"), "r", encoding="utf-8") as f:
+                self.tables[c] = json.load(f)
+            self.indexes[c] = np.load(os.path.join(path, f"{c}.idx.npy"), mmap_mode="r")
+        self.ints = {
+            c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r")
+            for c in self.meta["int_columns"]
+        }
+        # counts made with another PROMPT_TOKENIZER would mis-pack contexts;
+        # without them, records are counted at query time
+        if self.meta.get("tokenizer") != counter_name():
+            self.ints.pop("n_tokens", None)
+        self._postings = {}
+        self._values   = {}
+        self._blob = None
+        self._file = open(os.path.join(path, "text.bin"), "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def __contains__(self, faiss_id):
+        return self._row(faiss_id) is not None
+
+    def _row(self, faiss_id):
+        faiss_id = int(faiss_id)
+        if self.meta["contiguous"]:
+            return faiss_id if 0 <= faiss_id < len(self) else None
+        row = int(np.searchsorted(self.ids, faiss_id))
+        if row < len(self) and self.ids[row] == faiss_id:
+            return row
+        return None
+
+    def text(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self._blob[start:end].decode("utf-8") if self._blob is not None else ""
+
+    def record(self, row: int) -> dict:
+        rec = {c: self.tables[c][self.indexes[c][row]] for c in _STRING_COLUMNS}
+        for c, col in self.ints.items():
+            rec[c] = int(col[row])
+        rec["text"] = self.text(row)
+        return rec
+
+    def __getitem__(self, faiss_id) -> dict:
+        row = self._row(faiss_id)
+        if row is None:
+            raise KeyError(faiss_id)
+        return self.record(row)
+
+    def get(self, faiss_id, default=None):
+        row = self._row(faiss_id)
+        return default if row is None else self.record(row)
+
+    def values(self, column: str) -> list:
+        """
+        Distinct values of a doc_id / section column.
+        """
+        return list(self.tables[column])
+
+    def ids_where(self, column: str, values) -> np.ndarray:
+        """
+        Sorted FAISS ids of the chunks whose `column` (doc_id or section) is
+        one of `values`, read from the postings written with the store.
+        """
+        if column not in self._postings:
+            path = os.path.join(self.path, f"{column}.postings.npy")
+            if os.path.isfile(path):
+                self._postings[column] = (np.load(path, mmap_mode="r"),
+                                          np.load(os.path.join(self.path, f"{column}.starts.npy")))
+            else:
+                # stores written before postings existed
+                self._postings[column] = _postings(self.ids, self.indexes[column], len(self.tables[column]))
+            self._values[column] = {v: i for i, v in enumerate(self.tables[column])}
+        postings, starts = self._postings[column]
+        lookup = self._values[column]
+        groups = [postings[starts[v]:starts[v + 1]] for v in (lookup.get(x) for x in values) if v is not None]
+        if not groups:
+            return np.empty(0, dtype="int64")
+        return groups[0].copy() if len(groups) == 1 else np.unique(np.concatenate(groups))
+
+    def items(self):
+        """
+        Yields (faiss_id, record) for every row, in id order.
+        """
+        for row in range(len(self)):
+            yield int(self.ids[row]), self.record(row)
+
+    def close(self):
+        if self._blob is not None:
+            self._blob.close()
+        self._file.close()
+
+def load_records(records_path: str):
+    """
+    Opens a chunk store directory, or unpickles a legacy corpus_records.pkl
+    (a list indexed by position or a {faiss_id: record} dict).
+    """
+    if os.path.isdir(records_path):
+        return ChunkStore(records_path)
+    with open(records_path, "rb") as f:
+        return pickle.load(f)
+
+if __name__ == "__main__":
+    # Convert a legacy pickle: python -m baseline.retriever.chunk_store <records.pkl> <store_dir>
+    if len(sys.argv) != 3:
+        print("Usage: python -m baseline.retriever.chunk_store <records.pkl> <store_dir>", file=sys.stderr)
+        sys.exit(1)
+    with open(sys.argv[1], "rb") as f:
+        legacy = pickle.load(f)
+    pairs = legacy.items() if isinstance(legacy, dict) else enumerate(legacy)
+    write_chunk_store(pairs, sys.argv[2])
+    print(f"[✓] Wrote {len(legacy)} records to {sys.argv[2]}")
@@ -0,0 +1,232 @@
+# baseline/retriever/embedder.py
+"""
+Embedding backends for queries and corpus chunks.
+
+  torch  SentenceTransformer on PyTorch (default)
+  onnx   the same model exported to ONNX with dynamic int8 quantization, run
+         with onnxruntime + tokenizers (no torch import at query time)
+
+Export once (needs torch, sentence-transformers, onnx and onnxruntime), then
+select the backend with EMBED_BACKEND=onnx:
+
+    python -m baseline.retriever.embedder export --check-jsonl corpus/chunks.jsonl
+    python -m baseline.retriever.embedder verify   # ONNX vs. vectors in the FAISS index
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+EMBED_BACKEND  = os.environ.get("EMBED_BACKEND", "torch")
+# exported models live in ONNX_MODEL_DIR/<model name>
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "models/onnx")
+META_NAME      = "onnx_meta.json"
+# an exported model is only used if every check text embeds at least this
+# close (cosine) to the PyTorch vector, so existing indexes stay valid
+MIN_COSINE     = 0.99
+
+def onnx_dir(model_name: str) -> str:
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+def mean_pool(hidden, mask) -> np.ndarray:
+    """
+    Attention-masked mean of token embeddings, L2-normalized (the Pooling +
+    Normalize modules of sentence-transformers models such as all-MiniLM-L6-v2).
+    """
+    mask   = mask[..., None].astype("float32")
+    summed = (hidden * mask).sum(axis=1)
+    vecs   = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    return vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+
+class OnnxEmbedder:
+    """
+    Runs an exported model with onnxruntime. encode() accepts the arguments
+    the pipeline passes to SentenceTransformer.encode, so it is a drop-in
+    replacement; vectors are always normalized.
+    """
+    def __init__(self, model_dir: str, threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, META_NAME), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, self.meta["file"]), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta.get("pad_id", 0), pad_token=self.meta.get("pad_token", "[PAD]"))
+
+    @property
+    def model_name(self) -> str:
+        return self.meta["model"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def encode(self, texts, batch_size: int = 64, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts  = [texts] if single else list(texts)
+        out = np.zeros((len(texts), self.meta["dim"]), dtype="float32")
+        # sorting by length keeps padding within a batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            enc  = self.tokenizer.encode_batch([texts[i] for i in rows])
+            feed = {
+                "input_ids":      np.array([e.ids for e in enc], dtype="int64"),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype="int64"),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype="int64")
+            }
+            hidden = self.session.run(["last_hidden_state"], {k: v for k, v in feed.items() if k in self.inputs})[0]
+            out[rows] = mean_pool(hidden, feed["attention_mask"])
+        return out[0] if single else out
+
+def load_embedder(model_name: str, backend: str = None):
+    """
+    The embedder for `model_name` on `backend` ("torch" or "onnx"); the
+    heavy libraries are imported here, on first use.
+    """
+    backend = backend or EMBED_BACKEND
+    if backend == "onnx":
+        model_dir = onnx_dir(model_name)
+        if not os.path.isfile(os.path.join(model_dir, META_NAME)):
+            raise FileNotFoundError(
+                f"No ONNX export of {model_name} in {model_dir}; run `python -m baseline.retriever.embedder export`")
+        return OnnxEmbedder(model_dir)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    raise ValueError(f"Unknown embedding backend '{backend}'")
+
+def cosine_agreement(reference, candidate) -> dict:
+    """
+    Row-wise cosine between two sets of normalized embeddings of the same texts.
+    """
+    cos = np.sum(np.asarray(reference, dtype="float32") * np.asarray(candidate, dtype="float32"), axis=1)
+    return {"n": int(cos.size), "min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+def export_onnx(model_name: str, out_dir: str, check_texts: list, min_cosine: float = MIN_COSINE,
+                quantize: bool = True) -> dict:
+    """
+    Exports the transformer of a sentence-transformers model to ONNX, adds a
+    dynamically int8-quantized copy, and keeps the int8 model only if it
+    matches PyTorch on `check_texts` (min cosine >= `min_cosine`); otherwise
+    the float32 export is used, and if that fails too a ValueError is raised.
+    Returns the written meta data.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    modules = list(st)
+    pooling = modules[1] if len(modules) > 1 else None
+    if pooling is None or getattr(pooling, "get_pooling_mode_str", lambda: None)() != "mean":
+        raise ValueError(f"{model_name}: only mean-pooled sentence-transformers models can be exported")
+    transformer = modules[0]
+    model, tokenizer = transformer.auto_model.eval(), transformer.tokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    dummy = tokenizer(["a short sample sentence"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    axes  = {n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(dummy[n] for n in names), fp32_path,
+                          input_names=names, output_names=["last_hidden_state"],
+                          dynamic_axes=axes, opset_version=14)
+    tokenizer.save_pretrained(out_dir)
+
+    files = ["model.onnx"]
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+        files.insert(0, "model.int8.onnx")
+
+    reference = st.encode(check_texts, convert_to_numpy=True, normalize_embeddings=True)
+    meta = {
+        "model":          model_name,
+        "max_seq_length": int(st.max_seq_length),
+        "dim":            int(reference.shape[1]),
+        "pad_id":         int(tokenizer.pad_token_id or 0),
+        "pad_token":      tokenizer.pad_token or "[PAD]"
+    }
+    checks = {}
+    for name in files:
+        meta["file"] = name
+        with open(os.path.join(out_dir, META_NAME), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        checks[name] = cosine_agreement(reference, OnnxEmbedder(out_dir).encode(check_texts))
+        print(f"[+] {name}: min cosine {checks[name]['min_cosine']:.5f}, "
+              f"mean {checks[name]['mean_cosine']:.5f} vs PyTorch on {len(check_texts)} texts")
+        if checks[name]["min_cosine"] >= min_cosine:
+            meta["check"] = dict(checks[name], threshold=min_cosine)
+            with open(os.path.join(out_dir, META_NAME), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            return meta
+    os.remove(os.path.join(out_dir, META_NAME))
+    raise ValueError(f"ONNX export of {model_name} does not match PyTorch (min cosine < {min_cosine}): {checks}")
+
+def verify_against_index(embedder, index_path: str, records_path: str, n: int = 200, seed: int = 0) -> dict:
+    """
+    Re-embeds a sample of indexed chunks and compares them with the vectors
+    stored in the FAISS index; needs no PyTorch, so it can run on the
+    serving nodes themselves.
+    """
+    from baseline.retriever.index_factory import read_index, index_vectors
+    from baseline.retriever.chunk_store import load_records
+    ids, vectors = index_vectors(read_index(index_path))
+    records = load_records(records_path)
+    rows = np.random.default_rng(seed).choice(len(ids), size=min(n, len(ids)), replace=False)
+    texts = [records[int(ids[r])]["text"] for r in rows]
+    return cosine_agreement(vectors[rows], embedder.encode(texts))
+
+def _check_texts(jsonl_path: str, tests_path: str, n: int) -> list:
+    texts = []
+    if jsonl_path:
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            chunks = [json.loads(line)["text"] for line in f]
+        step = max(1, len(chunks) // n)
+        texts += chunks[::step][:n]
+    if tests_path and os.path.isfile(tests_path):
+        with open(tests_path, "r", encoding="utf-8") as f:
+            texts += [t["question"] for t in json.load(f)]
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and verify the ONNX embedding backend.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="sentence-transformers model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    e = sub.add_parser("export", help="Export to ONNX (+ int8) and check against PyTorch")
+    e.add_argument("--out",         default=None, help=f"Output directory (default: {ONNX_MODEL_DIR}/<model>)")
+    e.add_argument("--check-jsonl", default="corpus/chunks.jsonl", help="Chunks to compare embeddings on")
+    e.add_argument("--check-tests", default="evaluation/test_inputs.json", help="Questions to compare embeddings on")
+    e.add_argument("--check-n",     type=int, default=256, help="Chunks sampled from --check-jsonl")
+    e.add_argument("--min-cosine",  type=float, default=MIN_COSINE)
+    e.add_argument("--no-quantize", action="store_true", help="Only export the float32 model")
+
+    v = sub.add_parser("verify", help="Compare the ONNX backend with the vectors in a FAISS index")
+    v.add_argument("--index",   default="models/faiss_index.idx")
+    v.add_argument("--records", default="models/chunk_store")
+    v.add_argument("-n",        type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        texts = _check_texts(args.check_jsonl, args.check_tests, args.check_n)
+        meta = export_onnx(args.model, args.out or onnx_dir(args.model), texts, args.min_cosine,
+                           quantize=not args.no_quantize)
+        print(f"[✓] Exported {args.model} as {meta['file']}; set EMBED_BACKEND=onnx to use it")
+    else:
+        stats = verify_against_index(load_embedder(args.model, "onnx"), args.index, args.records, args.n)
+        ok = stats["min_cosine"] >= MIN_COSINE
+        print(f"[{'✓' if ok else '!'}] ONNX vs index vectors on {stats['n']} chunks: "
+              f"min cosine {stats['min_cosine']:.5f}, mean {stats['mean_cosine']:.5f}")
+        raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# baseline/retriever/embedding_cache.py
+
+import os
+import atexit
+import pickle
+import string
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_STRIP_CHARS = string.punctuation + string.whitespace
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form used as cache key: NFKC, lower-case, single spaces,
+    no leading/trailing punctuation ("What is X?" == "what is  x").
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(text.split()).strip(_STRIP_CHARS)
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings keyed by (model name, normalized query).
+    With a `path` the cache is loaded from disk on start-up and written back
+    every `autosave_every` new entries and at interpreter exit.
+    """
+    def __init__(self, capacity: int = 10000, path: str = None, autosave_every: int = 100):
+        self.capacity       = capacity
+        self.path           = path
+        self.autosave_every = autosave_every
+        self.hits           = 0
+        self.misses         = 0
+        self._entries       = OrderedDict()
+        self._dirty         = 0
+        self._lock          = threading.Lock()
+        self._save_lock     = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, model_name: str, query: str):
+        """
+        Returns the cached vector or None, counting a hit or a miss.
+        """
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, model_name: str, query: str, vec):
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self._dirty += 1
+            flush = self.path and self._dirty >= self.autosave_every
+        if flush:
+            self.save()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "size":     len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def load(self):
+        """
+        Loads entries from `path` if it exists, keeping at most `capacity`.
+        """
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # A corrupt cache is only a cold cache
+            return
+        with self._lock:
+            self._entries = OrderedDict(list(entries.items())[-self.capacity:])
+
+    def save(self):
+        """
+        Writes the entries to `path` atomically (temp file + rename).
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = OrderedDict(self._entries)
+                self._dirty = 0
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
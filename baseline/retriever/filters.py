@@ -0,0 +1,135 @@
+# baseline/retriever/filters.py
+
+import weakref
+import threading
+import numpy as np
+
+# faiss is imported where first needed, like in the retriever
+
+# a bitmap selector (one bit per id up to the largest) is used once the
+# allowed ids fill at least 1/64 of that range; sparser sets use a hash set
+_BITMAP_DENSITY = 1 / 64
+
+def make_selector(ids):
+    """
+    FAISS IDSelector admitting exactly `ids` (sorted int64). The returned
+    selector keeps a reference to any buffer it points into.
+    """
+    import faiss
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    top = int(ids[-1]) + 1 if len(ids) else 0
+    if len(ids) and len(ids) >= top * _BITMAP_DENSITY:
+        bits = np.zeros(top, dtype=bool)
+        bits[ids] = True
+        bitmap = np.packbits(bits, bitorder="little")
+        sel = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        sel.bitmap_ref = bitmap
+        return sel
+    return faiss.IDSelectorBatch(ids)
+
+def search_parameters(index, params: dict, sel):
+    """
+    SearchParameters carrying `sel` plus the index's own nprobe / efSearch,
+    which would otherwise fall back to FAISS defaults for this call.
+    """
+    import faiss
+    index_type = (params or {}).get("index_type")
+    if index_type in ("ivf", "ivfpq"):
+        return faiss.SearchParametersIVF(sel=sel, nprobe=int(params.get("nprobe", 1)))
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=int(params.get("efSearch", 16)))
+    return faiss.SearchParameters(sel=sel)
+
+# sorted (ids, vectors) copies of indexes that cannot reconstruct by id
+_COPIES    = weakref.WeakKeyDictionary()
+_COPY_LOCK = threading.Lock()
+
+def _subset(index, ids):
+    """
+    (ids, vectors) of the allowed ids the index holds, for exact scoring.
+    Indexes that can reconstruct by id answer directly; others (IVF without
+    a direct map) get a sorted copy of their vectors, made once per index,
+    so the live index itself is never modified.
+    """
+    try:
+        return ids, index.reconstruct_batch(ids)
+    except RuntimeError:
+        pass
+    copy = _COPIES.get(index)
+    if copy is None:
+        from baseline.retriever.index_factory import index_vectors
+        with _COPY_LOCK:
+            copy = _COPIES.get(index)
+            if copy is None:
+                stored, vectors = index_vectors(index)
+                order = np.argsort(stored, kind="stable")
+                copy = _COPIES[index] = (stored[order], vectors[order])
+    stored, vectors = copy
+    rows = np.clip(np.searchsorted(stored, ids), 0, max(len(stored) - 1, 0))
+    held = stored[rows] == ids if len(stored) else np.zeros(len(ids), dtype=bool)
+    return ids[held], vectors[rows[held]]
+
+def exact_subset(vectors, ids, queries, k: int):
+    """
+    Exact inner-product top-k of `queries` over the `ids` whose vectors are given.
+    """
+    scores = np.asarray(queries, dtype="float32") @ np.asarray(vectors, dtype="float32").T
+    kk = min(k, len(ids))
+    D = np.full((len(queries), k), -np.finfo("float32").max, dtype="float32")
+    I = np.full((len(queries), k), -1, dtype="int64")
+    if kk == 0:
+        return D, I
+    top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable"), axis=1)
+    D[:, :kk] = np.take_along_axis(scores, top, axis=1)
+    I[:, :kk] = np.asarray(ids, dtype="int64")[top]
+    return D, I
+
+def filtered_search(index, queries, k: int, ids, params: dict = None):
+    """
+    Top-k restricted to `ids` (sorted int64), filtered inside FAISS with an
+    IDSelector rather than afterwards. Approximate indexes can run out of
+    matches when few ids are allowed (the IVF probes or the HNSW beam hold
+    fewer than k of them); those queries are answered exactly over the
+    allowed vectors, so min(k, len(ids)) results always come back.
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids     = np.asarray(ids, dtype="int64")
+    if not len(ids):
+        return exact_subset(np.empty((0, queries.shape[1]), dtype="float32"), ids, queries, k)
+    if hasattr(index, "search_filtered"):
+        # two-stage and sharded indexes filter on their own
+        return index.search_filtered(queries, k, ids)
+
+    sel  = make_selector(ids)   # must outlive the search call
+    D, I = index.search(queries, k, params=search_parameters(index, params, sel))
+    wanted = min(k, len(ids))
+    short  = np.flatnonzero((I >= 0).sum(axis=1) < wanted)
+    if len(short):
+        held, vectors = _subset(index, ids)
+        Ds, Is = exact_subset(vectors, held, queries[short], k)
+        D[short], I[short] = Ds, Is
+    return D, I
+
+def allowed_ids(records, doc_ids=None, sections=None):
+    """
+    Sorted FAISS ids of the records matching every given filter (doc_ids
+    and/or sections, each a value or a list of values), or None when no
+    filter is set. Chunk stores answer from their precomputed postings;
+    legacy pickled records are scanned.
+    """
+    filters = [(c, [v] if isinstance(v, str) else list(v))
+               for c, v in (("doc_id", doc_ids), ("section", sections)) if v is not None]
+    if not filters:
+        return None
+    ids = None
+    for column, values in filters:
+        if hasattr(records, "ids_where"):
+            match = records.ids_where(column, values)
+        else:
+            wanted = set(values)
+            pairs  = records.items() if isinstance(records, dict) else enumerate(records)
+            match  = np.array(sorted(i for i, r in pairs if isinstance(r, dict) and r.get(column) in wanted),
+                              dtype="int64")
+        ids = match if ids is None else np.intersect1d(ids, match, assume_unique=True)
+    return np.asarray(ids, dtype="int64")
@@ -0,0 +1,238 @@
+# baseline/retriever/index_factory.py
+
+import os
+import json
+import math
+import numpy as np
+from baseline.retriever.quantized import (
+    QUANTIZED_TYPES,
+    DEFAULT_SHORTLIST,
+    TwoStageIndex,
+    build_two_stage,
+    write_two_stage,
+    read_two_stage
+)
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw") + QUANTIZED_TYPES
+
+# FAISS wants ~39 training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+def params_path(index_path: str) -> str:
+    """
+    Sidecar file holding the build/search parameters of an index:
+    models/faiss_index.idx -> models/faiss_index.params.json
+    """
+    return os.path.splitext(index_path)[0] + ".params.json"
+
+def choose_params(index_type: str, n: int, dim: int) -> dict:
+    """
+    Picks training and search parameters for `index_type` from the corpus size.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    params = {"index_type": index_type, "dim": dim, "ntotal": n}
+
+    if index_type in ("ivf", "ivfpq"):
+        # ~4*sqrt(n) lists, but never more than the data can train
+        nlist = int(4 * math.sqrt(n))
+        nlist = max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID or 1))
+        params["nlist"]  = nlist
+        params["nprobe"] = min(nlist, max(8, nlist // 16))
+
+    if index_type == "ivfpq":
+        # sub-quantizers of ~8 dims each; m must divide dim
+        m = max(d for d in range(1, max(1, dim // 8) + 1) if dim % d == 0)
+        # 8-bit codes need 256 centroids per sub-quantizer to train
+        nbits = int(math.log2(max(2, n // _MIN_POINTS_PER_CENTROID)))
+        params["m"]     = m
+        params["nbits"] = max(4, min(8, nbits))
+
+    if index_type == "hnsw":
+        params["M"]              = 32
+        params["efConstruction"] = 200
+        params["efSearch"]       = 128
+
+    if index_type in QUANTIZED_TYPES:
+        # candidates taken from the compressed scan for exact re-scoring;
+        # 1-bit codes rank coarsely and need a longer list for the same recall
+        # (~0.5 recall@10 at 100 vs ~1.0 at 400 on a 200k synthetic corpus)
+        params["shortlist"] = DEFAULT_SHORTLIST if index_type == "sq8" else 4 * DEFAULT_SHORTLIST
+
+    return params
+
+def build_index(vectors, params: dict, ids=None):
+    """
+    Builds (and trains, if needed) an inner-product index over `vectors`
+    according to `params` from choose_params(). With `ids` vectors can later
+    be added/removed by id: IVF indexes store the ids in their inverted lists
+    (with a hash-table direct map for reconstruct), the others are wrapped
+    in an IndexIDMap2. Quantized types return a TwoStageIndex (ids default
+    to row numbers).
+    """
+    import faiss
+    index_type = params["index_type"]
+    dim        = vectors.shape[1]
+    metric     = faiss.METRIC_INNER_PRODUCT
+
+    if index_type in QUANTIZED_TYPES:
+        return build_two_stage(vectors, index_type, ids, params.get("shortlist", DEFAULT_SHORTLIST))
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, params["nlist"], metric)
+    elif index_type == "ivfpq":
+        index = faiss.IndexIVFPQ(
+            faiss.IndexFlatIP(dim), dim, params["nlist"], params["m"], params["nbits"], metric
+        )
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"], metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'")
+
+    if not index.is_trained:
+        index.train(vectors)
+    if ids is None:
+        index.add(vectors)
+    elif index_type in ("ivf", "ivfpq"):
+        # an IndexIDMap2 maps ids to list positions, which IVF remove_ids
+        # does not keep in step: removals would return the wrong chunks
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    else:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    apply_search_params(index, params)
+    return index
+
+def apply_search_params(index, params: dict):
+    """
+    Applies the stored search-time knobs (nprobe, efSearch, shortlist) to a loaded index.
+    """
+    import faiss
+    if isinstance(index, TwoStageIndex):
+        if "shortlist" in params:
+            index.shortlist = int(params["shortlist"])
+        return
+    space = faiss.ParameterSpace()
+    for name in ("nprobe", "efSearch"):
+        if name in params:
+            space.set_index_parameter(index, name, params[name])
+
+def read_index(index_path: str, params: dict = None, mmap: bool = False):
+    """
+    Reads an index written by write_index(). With mmap=True the file is
+    memory-mapped read-only instead of copied into RAM (falls back to a
+    normal read for index types that cannot be mapped).
+    """
+    import faiss
+    params = load_params(index_path) if params is None else params
+    index_type = params.get("index_type")
+    if index_type in QUANTIZED_TYPES:
+        return read_two_stage(index_path, index_type, params.get("shortlist", DEFAULT_SHORTLIST), mmap)
+    if mmap:
+        try:
+            return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(index_path)
+
+def write_index(index, index_path: str):
+    import faiss
+    if isinstance(index, TwoStageIndex):
+        write_two_stage(index, index_path)
+    else:
+        faiss.write_index(index, index_path)
+
+def save_params(index_path: str, params: dict):
+    with open(params_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+
+def load_params(index_path: str) -> dict:
+    """
+    Returns the sidecar parameters, or {} for indexes built without one.
+    """
+    path = params_path(index_path)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def recall_at_k(index, vectors, queries, k: int = 10, ids=None) -> float:
+    """
+    recall@k of `index` against exact inner-product search over `vectors`
+    for the given query matrix. `ids` maps vector rows to index ids.
+    """
+    import faiss
+    k = min(k, vectors.shape[0])
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    if ids is not None:
+        truth = np.asarray(ids, dtype="int64")[truth]
+
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / float(truth.size)
+
+def sample_recall(index, vectors, k: int = 10, n_queries: int = 1000, seed: int = 0, ids=None) -> float:
+    """
+    recall@k of `index` against exact inner-product search, using a sample of
+    the indexed vectors as queries. `ids` maps vector rows to index ids.
+    """
+    rng = np.random.default_rng(seed)
+    n   = vectors.shape[0]
+    qs  = vectors[rng.choice(n, size=min(n_queries, n), replace=False)]
+    return recall_at_k(index, vectors, qs, k, ids)
+
+def is_legacy_ivf(index) -> bool:
+    """
+    True for IVF indexes wrapped in an IndexIDMap2 (built before ids were
+    stored in the inverted lists); removing ids from them corrupts the id map.
+    """
+    import faiss
+    return isinstance(index, faiss.IndexIDMap2) and faiss.try_extract_index_ivf(index.index) is not None
+
+def _ivf_contents(ivf):
+    """
+    (ids, vectors) read list by list from an IVF index, without adding a
+    direct map to it (which would change how it can be updated).
+    """
+    import faiss
+    invlists = ivf.invlists
+    ids, vectors = [], []
+    for l in range(ivf.nlist):
+        n = invlists.list_size(l)
+        if not n:
+            continue
+        ids.append(faiss.rev_swig_ptr(invlists.get_ids(l), n).copy())
+        block = np.empty((n, ivf.d), dtype="float32")
+        for o in range(n):
+            ivf.reconstruct_from_offset(l, o, faiss.swig_ptr(block[o]))
+        vectors.append(block)
+    if not ids:
+        return np.empty(0, dtype="int64"), np.empty((0, ivf.d), dtype="float32")
+    return np.concatenate(ids).astype("int64"), np.vstack(vectors).astype("float32")
+
+def index_vectors(index):
+    """
+    Returns (ids, vectors) stored in an index built by build_index(),
+    e.g. to benchmark other index types on the same embeddings.
+    """
+    import faiss
+    if hasattr(index, "stored_vectors"):
+        # two-stage and sharded indexes keep their own full-precision copies
+        return index.stored_vectors()
+    if isinstance(index, faiss.IndexIDMap2):
+        id_map = faiss.vector_to_array(index.id_map).astype("int64")
+        inner  = index.index
+    else:
+        id_map = None
+        inner  = index
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ids, vectors = _ivf_contents(ivf)
+    else:
+        ids, vectors = np.arange(inner.ntotal, dtype="int64"), inner.reconstruct_n(0, inner.ntotal)
+    return (ids if id_map is None else id_map[ids]), vectors
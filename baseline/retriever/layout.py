@@ -0,0 +1,77 @@
+# baseline/retriever/layout.py
+"""
+File layout of a built index: names, the build and shard manifests and
+shard assignment. Kept free of faiss so the pipeline can inspect an index
+directory without importing it.
+"""
+import os
+import json
+import zlib
+
+SHARD_MANIFEST = "shards.json"
+INDEX_NAME     = "faiss_index.idx"
+RECORDS_NAME   = "chunk_store"
+SHARD_BY       = ("doc", "hash")
+# written by scripts/create_indexes.py next to the index (or in the shard directory)
+MANIFEST_NAME  = "index_manifest.json"
+SENTENCES_NAME = "sentence_store"
+
+def shard_name(i: int) -> str:
+    return f"shard_{i:03d}"
+
+def assign_shard(record: dict, key: str, n_shards: int, by: str = "doc") -> int:
+    """
+    Shard of a chunk: by document (all chunks of a file stay together) or by
+    its content key (even spread). CRC32 keeps the choice stable across runs.
+    """
+    if by == "doc":
+        value = str(record.get("doc_id"))
+    elif by == "hash":
+        value = key
+    else:
+        raise ValueError(f"Unknown shard key '{by}'")
+    return zlib.crc32(value.encode("utf-8")) % n_shards
+
+def is_sharded(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SHARD_MANIFEST))
+
+def write_shard_manifest(shards_dir: str, shards: list, shard_by: str):
+    """
+    shards: [{"name", "count", "index_type"}, ...]. Written last by a build,
+    so its mtime marks a complete set of shards.
+    """
+    path = os.path.join(shards_dir, SHARD_MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"shard_by": shard_by, "shards": shards}, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def load_shard_manifest(shards_dir: str) -> dict:
+    with open(os.path.join(shards_dir, SHARD_MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def index_dir(index_path: str) -> str:
+    """
+    Directory holding an index's build manifest and sentence store: the
+    shard directory itself, or the directory of the index file.
+    """
+    return index_path if is_sharded(index_path) else (os.path.dirname(index_path) or ".")
+
+def load_manifest(index_dir: str) -> dict:
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(index_dir: str, manifest: dict):
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+def build_id(index_dir: str):
+    """
+    Id of the full build the index in `index_dir` descends from (None for
+    indexes built without one). Incremental updates keep it, since they
+    never renumber chunks; every full rebuild draws a new one.
+    """
+    return load_manifest(index_dir).get("build_id")
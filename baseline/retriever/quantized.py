@@ -0,0 +1,179 @@
+# baseline/retriever/quantized.py
+
+import os
+import numpy as np
+
+# index types whose FAISS index only holds compressed codes; full-precision
+# vectors live in a memory-mapped sidecar and re-score a shortlist
+QUANTIZED_TYPES = ("sq8", "binary")
+
+DEFAULT_SHORTLIST = 100
+
+def vectors_path(index_path: str) -> str:
+    """
+    models/faiss_index.idx -> models/faiss_index.vectors.npy (rows sorted by id)
+    """
+    return os.path.splitext(index_path)[0] + ".vectors.npy"
+
+def vector_ids_path(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + ".vector_ids.npy"
+
+def binarize(vectors) -> np.ndarray:
+    """
+    One sign bit per dimension, packed 8 per byte (the IndexBinary layout).
+    """
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+def build_coarse(vectors, index_type: str):
+    """
+    First-pass index over the compressed codes (trained here for sq8),
+    wrapped in an id map so it shares ids with the chunk store.
+    """
+    import faiss
+    dim = vectors.shape[1]
+    if index_type == "sq8":
+        inner = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        inner.train(vectors)
+        return faiss.IndexIDMap2(inner)
+    if index_type == "binary":
+        return faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(dim))
+    raise ValueError(f"Unknown quantized index type '{index_type}'")
+
+class TwoStageIndex:
+    """
+    Searches compressed codes (int8 or 1-bit) for a shortlist of candidates,
+    then re-scores them exactly against float32 vectors that are usually a
+    read-only memmap. Returns (D, I) like a FAISS inner-product index, so
+    callers can use it in place of one.
+    """
+    def __init__(self, coarse, ids, vectors, binary: bool, shortlist: int = DEFAULT_SHORTLIST):
+        self.coarse    = coarse
+        self.ids       = ids
+        self.vectors   = vectors
+        self.binary    = binary
+        self.shortlist = shortlist
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.coarse.ntotal)
+
+    @property
+    def d(self) -> int:
+        return self.vectors.shape[1]
+
+    def _codes(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        return binarize(vectors) if self.binary else vectors
+
+    def _rows(self, ids) -> np.ndarray:
+        if len(self.ids) and self.ids[0] == 0 and self.ids[-1] == len(self.ids) - 1:
+            return ids
+        return np.searchsorted(self.ids, ids)
+
+    def search(self, queries, k: int):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        n_short = min(max(k, self.shortlist), self.ntotal)
+        if n_short == 0:
+            return self.rescore(queries, np.full((len(queries), 0), -1, dtype="int64"), k)
+        _, cands = self.coarse.search(self._codes(queries), n_short)
+        return self.rescore(queries, cands, k)
+
+    def search_filtered(self, queries, k: int, ids):
+        """
+        Top-k among `ids` (sorted): few allowed ids are re-scored exactly
+        right away, otherwise the code index is searched with an IDSelector
+        and its shortlist re-scored as usual.
+        """
+        import faiss
+        from baseline.retriever.filters import make_selector, exact_subset
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        ids     = np.asarray(ids, dtype="int64")
+        if len(ids) <= 4 * max(self.shortlist, k):
+            return exact_subset(self.vectors[self._rows(ids)], ids, queries, k)
+        sel    = make_selector(ids)
+        params = faiss.SearchParameters(sel=sel)
+        _, cands = self.coarse.search(self._codes(queries), min(max(k, self.shortlist), len(ids)), params=params)
+        return self.rescore(queries, cands, k)
+
+    def rescore(self, queries, cands, k: int):
+        """
+        Exact scores of each query's candidate ids; (D, I) of the best k.
+        """
+        D = np.full((len(queries), k), -np.finfo("float32").max, dtype="float32")
+        I = np.full((len(queries), k), -1, dtype="int64")
+        for qi, (q, cand) in enumerate(zip(queries, cands)):
+            cand = np.sort(cand[cand >= 0])
+            if not len(cand):
+                continue
+            # sorted rows keep the memmap reads in file order
+            scores = self.vectors[self._rows(cand)] @ q
+            top    = np.argsort(-scores, kind="stable")[:k]
+            D[qi, :len(top)] = scores[top]
+            I[qi, :len(top)] = cand[top]
+        return D, I
+
+    def add_with_ids(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        ids     = np.asarray(ids, dtype="int64")
+        self.coarse.add_with_ids(self._codes(vectors), ids)
+        all_ids = np.concatenate([np.asarray(self.ids), ids])
+        order   = np.argsort(all_ids, kind="stable")
+        self.ids     = all_ids[order]
+        self.vectors = np.concatenate([np.asarray(self.vectors), vectors])[order]
+
+    def remove_ids(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        self.coarse.remove_ids(ids)
+        keep = ~np.isin(self.ids, ids)
+        self.ids     = np.asarray(self.ids)[keep]
+        self.vectors = np.asarray(self.vectors)[keep]
+
+    def stored_vectors(self):
+        """
+        (ids, vectors) in id order, for recall checks against exact search.
+        """
+        return np.asarray(self.ids), np.asarray(self.vectors)
+
+def build_two_stage(vectors, index_type: str, ids=None, shortlist: int = DEFAULT_SHORTLIST) -> TwoStageIndex:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ids     = np.arange(len(vectors), dtype="int64") if ids is None else np.asarray(ids, dtype="int64")
+    coarse  = build_coarse(vectors, index_type)
+    index   = TwoStageIndex(coarse, np.empty(0, dtype="int64"), np.empty((0, vectors.shape[1]), dtype="float32"),
+                            binary=(index_type == "binary"), shortlist=shortlist)
+    index.add_with_ids(vectors, ids)
+    return index
+
+def write_two_stage(index: TwoStageIndex, index_path: str):
+    """
+    Writes the code index to `index_path` and the float32 vectors (plus their
+    ids) to the .vectors.npy / .vector_ids.npy sidecars.
+    """
+    import faiss
+    if index.binary:
+        faiss.write_index_binary(index.coarse, index_path)
+    else:
+        faiss.write_index(index.coarse, index_path)
+    for path, array in ((vectors_path(index_path), index.vectors), (vector_ids_path(index_path), index.ids)):
+        tmp = path + ".tmp.npy"
+        np.save(tmp, np.asarray(array))
+        os.replace(tmp, path)
+
+def read_two_stage(index_path: str, index_type: str, shortlist: int = DEFAULT_SHORTLIST, mmap: bool = False) -> TwoStageIndex:
+    """
+    Opens a two-stage index; the float32 vectors are always memory-mapped,
+    the code index too when mmap=True.
+    """
+    import faiss
+    binary = index_type == "binary"
+    reader = faiss.read_index_binary if binary else faiss.read_index
+    coarse = None
+    if mmap:
+        try:
+            coarse = reader(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    if coarse is None:
+        coarse = reader(index_path)
+    ids     = np.load(vector_ids_path(index_path), mmap_mode="r")
+    vectors = np.load(vectors_path(index_path), mmap_mode="r")
+    return TwoStageIndex(coarse, ids, vectors, binary=binary, shortlist=shortlist)
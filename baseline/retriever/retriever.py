@@ -1,45 +1,203 @@
 # baseline/retriever/retriever.py
 
-import pickle
-import faiss
-from sentence_transformers import SentenceTransformer
+import os
+import weakref
+import threading
+import numpy as np
+from baseline.retriever.embedding_cache import normalize_query
+from baseline.retriever.chunk_store import load_records
+from baseline.retriever.sentence_store import SentenceStore
+from baseline.retriever.embedder import EMBED_BACKEND, load_embedder
+from baseline.retriever.layout import is_sharded, index_dir, build_id
+from baseline.retriever.sharded import ShardedIndex
+from baseline.retriever.filters import allowed_ids, filtered_search
+
+# faiss and the embedding backend are imported where first needed so that
+# importing the pipeline stays cheap
+
+DEFAULT_EMBED_MODEL = "all-MiniLM-L6-v2"
+
+def read_index(index_path: str, mmap: bool = False):
+    """
+    Reads a FAISS index (or a two-stage quantized one, or a directory of
+    shards); with mmap=True the file is memory-mapped read-only instead of
+    copied into RAM.
+    """
+    if is_sharded(index_path):
+        return ShardedIndex(index_path, mmap=mmap)
+    from baseline.retriever import index_factory
+    return index_factory.read_index(index_path, mmap=mmap)
+
+def _release(index, records):
+    if isinstance(index, ShardedIndex):
+        # shuts down its pools and closes the shards' chunk stores
+        index.close()
+    elif hasattr(records, "close"):
+        records.close()
 
 class Retriever:
     """
     Encapsulates FAISS‐based retrieval of text chunks.
     """
-    def __init__(self, index_path: str, records_path: str, threshold: float = 0.2):
-        # load FAISS index
-        self.index = faiss.read_index(index_path)
-        # load the serialized records list
-        with open(records_path, 'rb') as f:
-            self.records = pickle.load(f)
-        # embedder for queries
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(
+        self,
+        index_path: str,
+        records_path: str,
+        threshold: float = 0.2,
+        model_name: str = DEFAULT_EMBED_MODEL,
+        cache=None,
+        mmap: bool = False,
+        shortlist: int = None,
+        sentences_path: str = None,
+        backend: str = None
+    ):
+        from baseline.retriever import index_factory
+        if is_sharded(index_path):
+            # a directory of shards, each with its own index and chunk store;
+            # searched in parallel and merged (records_path is not used)
+            self.index = ShardedIndex(index_path, mmap=mmap, shortlist=shortlist)
+            self.index_params = {"sharded": self.index.names}
+            self.records = self.index.records
+        else:
+            # load FAISS index and apply its stored search knobs (nprobe, efSearch,
+            # shortlist); `shortlist` overrides the stored re-scoring shortlist of
+            # quantized (sq8 / binary) indexes
+            self.index_params = index_factory.load_params(index_path)
+            if shortlist:
+                self.index_params = dict(self.index_params, shortlist=shortlist)
+            self.index = index_factory.read_index(index_path, self.index_params, mmap=mmap)
+            index_factory.apply_search_params(self.index, self.index_params)
+            # records by FAISS id: a memory-mapped chunk store (or a legacy pickle)
+            self.records = load_records(records_path)
+        # optional per-sentence embeddings for extractive context compression;
+        # only usable if they come from the same model as the queries and the
+        # same build as the index (a full rebuild renumbers the FAISS ids)
+        self.sentences = None
+        if sentences_path and os.path.isdir(sentences_path):
+            store = SentenceStore(sentences_path)
+            index_build = build_id(index_dir(index_path))
+            if store.model != model_name:
+                print(f"[!] Ignoring sentence store {sentences_path}: built with {store.model}, not {model_name}")
+            elif store.build_id is None or store.build_id != index_build:
+                print(f"[!] Ignoring sentence store {sentences_path}: it does not belong to this index build")
+            else:
+                self.sentences = store
+        # embedder for queries ("torch" or "onnx" backend), loaded on first cache miss
+        self.model_name = model_name
+        self.backend    = backend or EMBED_BACKEND
+        # ONNX vectors are close to, not identical with, PyTorch ones: cache them apart
+        self.cache_key  = model_name if self.backend == "torch" else f"{model_name}@{self.backend}"
+        self._embedder = None
+        self._embedder_lock = threading.Lock()
+        # optional EmbeddingCache shared across retrievers
+        self.cache = cache
         # score cutoff
         self.threshold = threshold
+        # pools and memory maps are released by close(), or once the last
+        # reference to this retriever is dropped
+        self._finalizer = weakref.finalize(self, _release, self.index, self.records)
+
+    def close(self):
+        """
+        Releases the shard pools and memory-mapped stores now.
+        """
+        self._finalizer()
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            with self._embedder_lock:
+                if self._embedder is None:
+                    self._embedder = load_embedder(self.model_name, self.backend)
+        return self._embedder
 
     def embed(self, query: str):
         """
         Embed a single string query into a normalized vector.
         """
-        vec = self.embedder.encode(
-            [query],
+        return self.embed_batch([query])
+
+    def embed_batch(self, queries: list):
+        """
+        Embed several queries with one encoder call; one normalized row per query.
+        Cached queries are served from the cache and only misses are encoded.
+        """
+        queries = list(queries)
+        if self.cache is None:
+            return self._encode(queries)
+
+        vecs   = [self.cache.get(self.cache_key, q) for q in queries]
+        # group misses by cache key so repeats in one batch are encoded once
+        missed = {}
+        for i, v in enumerate(vecs):
+            if v is None:
+                missed.setdefault(normalize_query(queries[i]), []).append(i)
+        if missed:
+            groups  = list(missed.values())
+            encoded = self._encode([queries[g[0]] for g in groups])
+            for g, vec in zip(groups, encoded):
+                self.cache.put(self.cache_key, queries[g[0]], vec)
+                for i in g:
+                    vecs[i] = vec
+        return np.vstack(vecs).astype('float32')
+
+    def _encode(self, texts: list):
+        vecs = self.embedder.encode(
+            texts,
             convert_to_numpy=True,
             normalize_embeddings=True
         )
-        return vec.astype('float32')
+        return vecs.astype('float32')
+
+    def search(self, query_vecs, k: int = 10, threshold: float = None, doc_ids=None, sections=None):
+        """
+        Runs one FAISS search over a matrix of query vectors.
+        Returns one list of (record, score) tuples per row, filtered by threshold.
+        With a sentence store, dict records also carry their "faiss_id".
+        `doc_ids` / `sections` (a value or a list) restrict the search to
+        matching chunks inside FAISS, so up to k of them still come back.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        ids = allowed_ids(self.records, doc_ids, sections)
+        if ids is None:
+            dists, idxs = self.index.search(query_vecs, k)
+        else:
+            dists, idxs = filtered_search(self.index, query_vecs, k, ids, self.index_params)
+        results = []
+        for row_dists, row_idxs in zip(dists, idxs):
+            out = []
+            for dist, idx in zip(row_dists, row_idxs):
+                if idx < 0:
+                    # FAISS pads with -1 when fewer than k vectors exist
+                    continue
+                score = 1.0 / (1.0 + dist)
+                if score >= threshold:
+                    try:
+                        rec = self.records[idx]
+                    except KeyError:
+                        # its shard was unloaded while this search ran
+                        continue
+                    if self.sentences is not None and isinstance(rec, dict):
+                        rec = dict(rec, faiss_id=int(idx))
+                    out.append((rec, score))
+            results.append(out)
+        return results
 
-    def get_top_k(self, query: str, k: int = 10):
+    def get_top_k(self, query: str, k: int = 10, threshold: float = None, doc_ids=None, sections=None):
         """
         Returns up to k records whose FAISS score >= threshold,
         as a list of (record, score) tuples.
+        `threshold` overrides the instance cutoff for this call only;
+        `doc_ids` / `sections` restrict it to those documents / sections.
+        """
+        return self.search(self.embed(query), k, threshold, doc_ids, sections)[0]
+
+    def get_top_k_batch(self, queries: list, k: int = 10, threshold: float = None, doc_ids=None, sections=None):
+        """
+        Batched get_top_k: one embed call and one FAISS search for all queries
+        (the filters apply to all of them).
         """
-        qv = self.embed(query)
-        dists, idxs = self.index.search(qv, k)
-        out = []
-        for dist, idx in zip(dists[0], idxs[0]):
-            score = 1.0 / (1.0 + dist)
-            if score >= self.threshold:
-                out.append((self.records[idx], score))
-        return out
+        if not queries:
+            return []
+        return self.search(self.embed_batch(queries), k, threshold, doc_ids, sections)
@@ -0,0 +1,205 @@
+# baseline/retriever/sentence_store.py
+
+import os
+import re
+import json
+import shutil
+import numpy as np
+from baseline.generator.tokens import get_counter, counter_name
+from baseline.generator.utils import pack_contexts
+
+META_NAME = "meta.json"
+
+# a sentence ends at . ! or ? followed by whitespace and an upper-case letter, digit or bracket
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[])")
+# shorter pieces (abbreviations, "et al.", window edges) are merged into the previous sentence
+MIN_SENTENCE_WORDS = 4
+
+def split_sentences(text: str) -> list:
+    """
+    (start, end) character spans of the sentences in `text`.
+    """
+    spans, start = [], 0
+    for m in _BOUNDARY.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    if start < len(text.rstrip()):
+        spans.append((start, len(text.rstrip())))
+    merged = []
+    for s, e in spans:
+        if merged and len(text[s:e].split()) < MIN_SENTENCE_WORDS:
+            merged[-1] = (merged[-1][0], e)
+        elif merged and len(text[merged[-1][0]:merged[-1][1]].split()) < MIN_SENTENCE_WORDS:
+            merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+def write_sentence_store(chunks, path: str, model: str, build_id: str = None, tokenizer: str = None):
+    """
+    Writes a store of sentence embeddings from (faiss_id, spans, vectors,
+    n_tokens) tuples, one per chunk; spans index into the chunk's text in
+    the chunk store, vectors are the normalized sentence embeddings.
+    `build_id` is the index build the FAISS ids belong to, `tokenizer` the
+    TokenCounter behind n_tokens:
+      chunk_ids.npy   sorted FAISS ids of the chunks (int64)
+      starts.npy      n+1 row offsets: chunk i owns sentence rows starts[i]:starts[i+1]
+      spans.npy       (start, end) character offsets per sentence (int32)
+      n_tokens.npy    prompt tokens per sentence (int32)
+      vectors.npy     sentence embeddings (float16)
+    Swapped in with a rename like the chunk store.
+    """
+    chunks = sorted(chunks, key=lambda c: int(c[0]))
+    tmp = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    starts = np.zeros(len(chunks) + 1, dtype="int64")
+    for i, (_, spans, _, _) in enumerate(chunks):
+        starts[i + 1] = starts[i] + len(spans)
+    dim = next((np.asarray(v).shape[1] for _, s, v, _ in chunks if len(s)), 0)
+
+    np.save(os.path.join(tmp, "chunk_ids.npy"), np.array([int(c[0]) for c in chunks], dtype="int64"))
+    np.save(os.path.join(tmp, "starts.npy"), starts)
+    np.save(os.path.join(tmp, "spans.npy"),
+            np.array([sp for _, s, _, _ in chunks for sp in s], dtype="int32").reshape(-1, 2))
+    np.save(os.path.join(tmp, "n_tokens.npy"),
+            np.array([n for _, _, _, t in chunks for n in t], dtype="int32"))
+    vectors = np.lib.format.open_memmap(os.path.join(tmp, "vectors.npy"), mode="w+",
+                                        dtype="float16", shape=(int(starts[-1]), dim))
+    for i, (_, _, v, _) in enumerate(chunks):
+        vectors[starts[i]:starts[i + 1]] = v
+    vectors.flush()
+    del vectors
+    with open(os.path.join(tmp, META_NAME), "w", encoding="utf-8") as f:
+        json.dump({"model": model, "build_id": build_id, "tokenizer": tokenizer,
+                   "chunks": len(chunks), "sentences": int(starts[-1])}, f)
+
+    old = path.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+class SentenceStore:
+    """
+    Read-only, memory-mapped sentence embeddings per chunk (FAISS id).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_NAME), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.chunk_ids = np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode="r")
+        self.starts    = np.load(os.path.join(path, "starts.npy"), mmap_mode="r")
+        self.spans     = np.load(os.path.join(path, "spans.npy"), mmap_mode="r")
+        self.n_tokens  = np.load(os.path.join(path, "n_tokens.npy"), mmap_mode="r")
+        self.vectors   = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+
+    @property
+    def model(self) -> str:
+        return self.meta["model"]
+
+    @property
+    def build_id(self):
+        return self.meta.get("build_id")
+
+    @property
+    def tokenizer(self):
+        return self.meta.get("tokenizer")
+
+    def __len__(self):
+        return self.meta["chunks"]
+
+    def rows(self, faiss_id):
+        """
+        The sentence rows of a chunk as a slice, or None if it is not stored.
+        """
+        i = int(np.searchsorted(self.chunk_ids, int(faiss_id)))
+        if i < len(self.chunk_ids) and self.chunk_ids[i] == int(faiss_id):
+            return slice(int(self.starts[i]), int(self.starts[i + 1]))
+        return None
+
+    def get(self, faiss_id):
+        """
+        (spans, n_tokens, vectors) of a chunk's sentences, or None.
+        """
+        rows = self.rows(faiss_id)
+        if rows is None:
+            return None
+        return np.asarray(self.spans[rows]), np.asarray(self.n_tokens[rows]), np.asarray(self.vectors[rows])
+
+def compress_hits(store: SentenceStore, qvec, hits: list, budget: int, min_similarity: float = 0.2,
+                  overhead: int = 4):
+    """
+    Extractive compression of retrieved chunks: the sentences of all `hits`
+    ((record, score) pairs whose records carry a "faiss_id") are ranked by
+    cosine similarity to `qvec`, and the best ones are taken until `budget`
+    tokens are used. Each chunk keeps its selected sentences in text order,
+    and chunks stay in retrieval order; chunks with none selected are dropped.
+    Hits the store does not hold (e.g. added by an update built without
+    sentences) cannot be ranked by sentence, so they are packed whole first.
+    Returns (candidates, contexts), or None if no hit is in the store.
+    """
+    qvec    = np.asarray(qvec, dtype="float32").ravel()
+    found   = []   # (hit index, sentence index, similarity, tokens)
+    spans   = {}
+    missing = []   # hit indexes not in the store
+    # counts made with another PROMPT_TOKENIZER are redone from the text
+    recount = store.tokenizer != counter_name()
+    for h, (rec, _) in enumerate(hits):
+        fid = rec.get("faiss_id") if isinstance(rec, dict) else None
+        entry = store.get(fid) if fid is not None else None
+        if entry is None:
+            missing.append(h)
+            continue
+        if not len(entry[0]):
+            continue
+        sp, ntok, vecs = entry
+        spans[h] = sp
+        if recount:
+            ntok = [get_counter().count(rec["text"][a:b]) for a, b in sp]
+        sims = vecs.astype("float32") @ qvec
+        found.extend((h, s, float(sims[s]), int(ntok[s])) for s in range(len(sp)))
+    if not found:
+        return None
+
+    whole, left = {}, budget
+    if missing:
+        texts  = [_text(hits[h][0]) for h in missing]
+        packed = pack_contexts(texts, budget, n_tokens=[_n_tokens(hits[h][0]) for h in missing])
+        for i, txt in enumerate(packed):
+            h = missing[i]
+            whole[h] = txt
+            # the stored count only holds for a chunk packed untruncated
+            n = _n_tokens(hits[h][0]) if txt is texts[i] else None
+            left -= (n if n is not None else get_counter().count(txt)) + overhead
+
+    # best sentences first; each chunk pays the separator overhead once
+    picked = {}
+    for h, s, sim, ntok in sorted(found, key=lambda x: -x[2]):
+        if sim < min_similarity and (picked or whole):
+            break
+        cost = ntok + 1 + (0 if h in picked else overhead)
+        if cost > left:
+            continue
+        picked.setdefault(h, []).append(s)
+        left -= cost
+    if not picked and not whole:
+        return None
+
+    candidates, contexts = [], []
+    for h in sorted(set(picked) | set(whole)):
+        candidates.append(hits[h])
+        if h in whole:
+            contexts.append(whole[h])
+            continue
+        text = hits[h][0].get("text", "")
+        contexts.append(" ".join(text[a:b].strip() for a, b in (spans[h][s] for s in sorted(picked[h]))))
+    return candidates, contexts
+
+def _text(rec) -> str:
+    return rec.get("text", "").strip() if isinstance(rec, dict) else str(rec).strip()
+
+def _n_tokens(rec):
+    return rec.get("n_tokens") if isinstance(rec, dict) else None
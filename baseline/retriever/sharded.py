@@ -0,0 +1,219 @@
+# baseline/retriever/sharded.py
+
+import os
+import numpy as np
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from baseline.retriever.chunk_store import ChunkStore
+from baseline.retriever.filters import filtered_search
+from baseline.retriever.layout import (  # noqa: F401 (re-exported)
+    SHARD_MANIFEST,
+    INDEX_NAME,
+    RECORDS_NAME,
+    SHARD_BY,
+    shard_name,
+    assign_shard,
+    is_sharded,
+    write_shard_manifest,
+    load_shard_manifest
+)
+
+# index_factory (and with it faiss) is imported where first needed
+
+# threads searching shards concurrently (0 = one per loaded shard); FAISS
+# releases the GIL while searching, so threads scale with cores
+SHARD_WORKERS   = int(os.environ.get("SHARD_WORKERS", "0"))
+# search each shard in its own process instead (for shards too big to share one heap)
+SHARD_PROCESSES = os.environ.get("SHARD_PROCESSES", "") not in ("", "0", "false")
+
+def _read_shard(shard_dir: str, mmap: bool, shortlist: int):
+    """
+    (index, params) of one shard, with its search knobs applied.
+    """
+    from baseline.retriever import index_factory
+    index_path = os.path.join(shard_dir, INDEX_NAME)
+    params = index_factory.load_params(index_path)
+    if shortlist:
+        params = dict(params, shortlist=shortlist)
+    index = index_factory.read_index(index_path, params, mmap=mmap)
+    index_factory.apply_search_params(index, params)
+    return index, params
+
+# the shard owned by a worker process (process mode)
+_WORKER_SHARD = None
+
+def _init_worker(shard_dir: str, mmap: bool, shortlist: int):
+    global _WORKER_SHARD
+    _WORKER_SHARD = _read_shard(shard_dir, mmap, shortlist)
+
+def _worker_search(queries, k: int, ids=None):
+    index, params = _WORKER_SHARD
+    if ids is None:
+        return index.search(queries, k)
+    return filtered_search(index, queries, k, ids, params)
+
+class Shard:
+    """
+    One loaded shard: its index (or the process that holds it) and its chunk store.
+    """
+    def __init__(self, shard_dir: str, mmap: bool = False, shortlist: int = None, process: bool = False):
+        self.dir     = shard_dir
+        self.name    = os.path.basename(shard_dir.rstrip(os.sep))
+        self.records = ChunkStore(os.path.join(shard_dir, RECORDS_NAME))
+        self.index   = None
+        self.params  = None
+        self.process = None
+        if process:
+            # spawn: forking after FAISS has started its OpenMP threads can deadlock
+            self.process = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                               initializer=_init_worker, initargs=(shard_dir, mmap, shortlist))
+        else:
+            self.index, self.params = _read_shard(shard_dir, mmap, shortlist)
+
+    def search(self, queries, k: int, ids=None):
+        """
+        Top-k of this shard, restricted to `ids` (sorted) when given.
+        """
+        if ids is not None:
+            # the exact fallback of filtered_search needs ids the shard really holds
+            ids = np.intersect1d(ids, self.records.ids, assume_unique=True)
+        if self.process is not None:
+            return self.process.submit(_worker_search, queries, k, ids).result()
+        if ids is None:
+            return self.index.search(queries, k)
+        return filtered_search(self.index, queries, k, ids, self.params)
+
+    def close(self):
+        if self.process is not None:
+            self.process.shutdown(wait=True)
+        self.records.close()
+
+class ShardedRecords:
+    """
+    Records by FAISS id across the loaded shards (ids are global).
+    """
+    def __init__(self, sharded):
+        self._sharded = sharded
+
+    def get(self, faiss_id, default=None):
+        for shard in self._sharded.shards.values():
+            rec = shard.records.get(faiss_id)
+            if rec is not None:
+                return rec
+        return default
+
+    def __getitem__(self, faiss_id) -> dict:
+        rec = self.get(faiss_id)
+        if rec is None:
+            raise KeyError(faiss_id)
+        return rec
+
+    def __contains__(self, faiss_id):
+        return self.get(faiss_id) is not None
+
+    def __len__(self):
+        return sum(len(s.records) for s in self._sharded.shards.values())
+
+    def items(self):
+        for shard in self._sharded.shards.values():
+            yield from shard.records.items()
+
+    def ids_where(self, column: str, values) -> np.ndarray:
+        parts = [s.records.ids_where(column, values) for s in self._sharded.shards.values()]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype="int64")
+
+class ShardedIndex:
+    """
+    Searches every loaded shard in parallel and merges the per-shard top-k by
+    score, returning (D, I) like a single FAISS inner-product index. Shards
+    can be loaded and unloaded one at a time; only loaded shards are searched.
+    """
+    def __init__(self, shards_dir: str, mmap: bool = False, shortlist: int = None,
+                 workers: int = SHARD_WORKERS, processes: bool = SHARD_PROCESSES, only: list = None):
+        self.dir       = shards_dir
+        self.manifest  = load_shard_manifest(shards_dir)
+        self.mmap      = mmap
+        self.shortlist = shortlist
+        self.processes = processes
+        self.shards    = {}
+        self.records   = ShardedRecords(self)
+        for entry in self.manifest["shards"]:
+            if only is None or entry["name"] in only:
+                self.load_shard(entry["name"])
+        self._pool = ThreadPoolExecutor(max_workers=workers or max(1, len(self.manifest["shards"])))
+
+    @property
+    def names(self) -> list:
+        return [entry["name"] for entry in self.manifest["shards"]]
+
+    @property
+    def ntotal(self) -> int:
+        return sum(len(s.records) for s in self.shards.values())
+
+    @property
+    def d(self) -> int:
+        shard = next(iter(self.shards.values()), None)
+        if shard is None or shard.index is None:
+            from baseline.retriever import index_factory
+            return index_factory.load_params(os.path.join(self.dir, self.names[0], INDEX_NAME)).get("dim", 0)
+        return shard.index.d
+
+    def load_shard(self, name: str):
+        if name not in self.names:
+            raise KeyError(f"No shard '{name}' in {self.dir}")
+        if name not in self.shards:
+            self.shards[name] = Shard(os.path.join(self.dir, name), self.mmap, self.shortlist, self.processes)
+
+    def unload_shard(self, name: str):
+        shard = self.shards.pop(name, None)
+        if shard is not None:
+            shard.close()
+
+    def search(self, queries, k: int, ids=None):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        shards  = list(self.shards.values())
+        if not shards:
+            return (np.full((len(queries), k), -np.finfo("float32").max, dtype="float32"),
+                    np.full((len(queries), k), -1, dtype="int64"))
+        if len(shards) == 1:
+            results = [shards[0].search(queries, k, ids)]
+        else:
+            results = list(self._pool.map(lambda s: s.search(queries, k, ids), shards))
+        return merge_topk(results, k)
+
+    def search_filtered(self, queries, k: int, ids):
+        """
+        Top-k among `ids` (sorted): every shard filters its own part.
+        """
+        return self.search(queries, k, np.asarray(ids, dtype="int64"))
+
+    def stored_vectors(self):
+        """
+        (ids, vectors) of all loaded shards, e.g. for recall checks.
+        """
+        from baseline.retriever import index_factory
+        parts = [index_factory.index_vectors(s.index if s.index is not None else _read_shard(s.dir, False, None)[0])
+                 for s in self.shards.values()]
+        return (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+
+    def close(self):
+        for name in list(self.shards):
+            self.unload_shard(name)
+        self._pool.shutdown(wait=False)
+
+def merge_topk(results: list, k: int):
+    """
+    Merges per-shard (D, I) inner-product results into the overall top-k,
+    highest similarity first; -1 padding sorts last.
+    """
+    D = np.concatenate([np.asarray(d, dtype="float32") for d, _ in results], axis=1)
+    I = np.concatenate([np.asarray(i, dtype="int64") for _, i in results], axis=1)
+    D = np.where(I < 0, -np.inf, D)
+    order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+    D, I = np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+    if D.shape[1] < k:
+        pad = k - D.shape[1]
+        D = np.pad(D, ((0, 0), (0, pad)), constant_values=-np.inf)
+        I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+    D[I < 0] = -np.finfo("float32").max
+    return D.astype("float32"), I
@@ -0,0 +1,308 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import math
+import asyncio
+import argparse
+from baseline.pipeline import get_pipeline, DEFAULT_INDEX_PATH, DEFAULT_RECORDS_PATH
+from utils.metrics import REGISTRY
+
+# Questions that arrive within MAX_WAIT_MS of the first one share an embed
+# and a search call, up to MAX_BATCH per call
+MAX_BATCH   = int(os.environ.get("SERVER_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.environ.get("SERVER_MAX_WAIT_MS", "10"))
+# request bodies larger than this are rejected
+MAX_BODY    = 1 << 20
+
+REGISTRY.describe("rag_batches_total", "Retrieval batches run by the query server")
+REGISTRY.describe("rag_batched_questions_total", "Questions retrieved in server batches")
+
+class QueryBatcher:
+    """
+    Dynamic micro-batching in front of a pipeline. submit() queues a
+    question; a scheduler task collects queued questions until MAX_BATCH is
+    reached or MAX_WAIT_MS has passed since the first, then retrieves them
+    with one pipeline.answer_each_async() call (one encode, one FAISS
+    search). Each caller is woken as soon as its own answer is ready.
+    """
+    def __init__(self, pipeline, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.pipeline  = pipeline
+        self.max_batch = max_batch
+        self.max_wait  = max_wait_ms / 1000.0
+        self._queue    = None
+        self._task     = None
+        # the event loop only holds weak references to tasks
+        self._dispatches = set()
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task  = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        dispatches = list(self._dispatches)
+        for task in dispatches:
+            task.cancel()
+        await asyncio.gather(*dispatches, return_exceptions=True)
+
+    async def submit(self, question: str, threshold: float = 0.2, doc_ids=None, sections=None) -> str:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        scope  = (_as_tuple(doc_ids), _as_tuple(sections))
+        await self._queue.put((question, threshold, scope, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # take what is already queued without waiting
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # a search call uses one threshold and one doc / section filter;
+            # mixed requests are split up
+            groups = {}
+            for question, threshold, scope, future in batch:
+                groups.setdefault((threshold, scope), []).append((question, future))
+            for (threshold, scope), group in groups.items():
+                task = asyncio.ensure_future(self._dispatch(group, threshold, scope))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, group: list, threshold: float, scope: tuple = (None, None)):
+        REGISTRY.inc("rag_batches_total")
+        REGISTRY.inc("rag_batched_questions_total", len(group))
+        doc_ids, sections = scope
+        try:
+            tasks = await self.pipeline.answer_each_async([q for q, _ in group], threshold,
+                                                          doc_ids=doc_ids, sections=sections)
+        except asyncio.CancelledError:
+            for _, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), task in zip(group, tasks):
+            task.add_done_callback(lambda t, f=future: _resolve(f, t))
+        try:
+            # keeps the answer tasks referenced until they finish
+            await asyncio.wait(tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+def _as_tuple(values):
+    if values is None:
+        return None
+    return (values,) if isinstance(values, str) else tuple(values)
+
+def _resolve(future, task):
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+class QueryServer:
+    """
+    Minimal asyncio HTTP/1.1 server (keep-alive supported) exposing the pipeline:
+      POST /query    {"question": "...", "threshold": 0.2} -> {"answer": "..."}
+                     {"questions": [...]}                  -> {"answers": [...]}
+                     optional "doc_ids" / "sections" lists restrict retrieval
+      GET  /health   -> {"status": "ok"}
+      GET  /metrics  -> Prometheus text format
+    """
+    def __init__(self, batcher: QueryBatcher, host: str = "127.0.0.1", port: int = 8000):
+        self.batcher = batcher
+        self.host    = host
+        self.port    = port
+        self.server  = None
+
+    async def start(self):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, ctype, payload = await self._route(method, path, body)
+                except HTTPError as e:
+                    status, ctype, payload = e.status, "application/json", json.dumps({"error": str(e)})
+                except Exception as e:
+                    status, ctype, payload = 500, "application/json", json.dumps({"error": repr(e)})
+                data = payload.encode("utf-8")
+                writer.write((
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {ctype}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            # malformed request line or headers: answer once and hang up
+            data = json.dumps({"error": str(e)}).encode("utf-8")
+            writer.write(f"HTTP/1.1 {e.status} {_REASONS.get(e.status, '')}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + data)
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?")[0]
+        if path == "/health":
+            return 200, "application/json", json.dumps({"status": "ok"})
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4; charset=utf-8", REGISTRY.render()
+        if path != "/query":
+            raise HTTPError(404, f"no route for {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(req, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        try:
+            threshold = req.get("threshold", 0.2)
+            # bool is an int subclass, and json.loads() accepts NaN and Infinity
+            if isinstance(threshold, bool):
+                raise TypeError(threshold)
+            threshold = float(threshold)
+            if not math.isfinite(threshold):
+                raise ValueError(threshold)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "\"threshold\" must be a number")
+        scope = {}
+        for name in ("doc_ids", "sections"):
+            values = req.get(name)
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise HTTPError(400, f"\"{name}\" must be a list of strings")
+            scope[name] = values
+        if isinstance(req.get("questions"), list) and all(isinstance(q, str) for q in req["questions"]):
+            answers = await asyncio.gather(*(self.batcher.submit(q, threshold, **scope) for q in req["questions"]))
+            return 200, "application/json", json.dumps({"answers": list(answers)})
+        if isinstance(req.get("question"), str) and req["question"].strip():
+            answer = await self.batcher.submit(req["question"], threshold, **scope)
+            return 200, "application/json", json.dumps({"answer": answer})
+        raise HTTPError(400, "expected a non-empty \"question\" string or a \"questions\" list")
+
+async def _read_request(reader):
+    """
+    (method, path, headers, body) of the next request, or None at end of stream.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise HTTPError(400, "malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "malformed header")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "malformed Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+async def serve(host: str, port: int, max_batch: int, max_wait_ms: float, mmap: bool = False):
+    pipeline = get_pipeline(DEFAULT_INDEX_PATH, DEFAULT_RECORDS_PATH, mmap=mmap)
+    # load index, records and embedder before accepting requests
+    await asyncio.to_thread(lambda: pipeline.retriever.embed("warm up"))
+    server = await QueryServer(QueryBatcher(pipeline, max_batch, max_wait_ms), host, port).start()
+    print(f"[+] Serving on http://{host}:{server.port} (batches of up to {max_batch}, {max_wait_ms} ms window)")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP query service with micro-batched retrieval.")
+    parser.add_argument("--host",        default="127.0.0.1")
+    parser.add_argument("--port",        type=int, default=8000)
+    parser.add_argument("--max-batch",   type=int, default=MAX_BATCH, help="Most questions per embed/search call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="How long the first queued question waits for others")
+    parser.add_argument("--mmap",        action="store_true", help="Memory-map the FAISS index")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.mmap))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
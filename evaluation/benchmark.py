@@ -0,0 +1,247 @@
+# evaluation/benchmark.py
+"""
+Retrieval benchmarks.
+
+  retriever  latency percentiles and QPS of the real Retriever, per stage
+             (embed, search, record lookup, end to end) on the test questions
+  scale      synthetic corpora grown from the indexed chunk embeddings, built
+             with each index type and compared against exact IndexFlatIP
+
+    python -m evaluation.benchmark retriever --repeats 5
+    python -m evaluation.benchmark scale --sizes 100000 1000000 --index-types flat sq8 binary
+"""
+import os
+import json
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from baseline.pipeline import DEFAULT_INDEX_PATH, DEFAULT_RECORDS_PATH
+from evaluation.engine import DEFAULT_TESTS_PATH, load_tests
+
+def latency_stats(samples: list) -> dict:
+    """
+    p50/p95/p99/mean in milliseconds and calls per second for per-call timings (seconds).
+    """
+    s = np.asarray(samples, dtype="float64")
+    if not s.size:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(s, [50, 95, 99]) * 1000
+    return {
+        "n":       int(s.size),
+        "mean_ms": float(s.mean() * 1000),
+        "p50_ms":  float(p50),
+        "p95_ms":  float(p95),
+        "p99_ms":  float(p99),
+        "qps":     float(s.size / s.sum()) if s.sum() else float("inf")
+    }
+
+def timed(fn, items, repeats: int = 1, warmup: int = 1) -> list:
+    """
+    Calls fn(item) for every item, `repeats` times; returns per-call seconds.
+    The first `warmup` items are called once beforehand and not timed.
+    """
+    for item in items[:warmup]:
+        fn(item)
+    samples = []
+    for _ in range(repeats):
+        for item in items:
+            t0 = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+def bench_retriever(retriever, questions: list, k: int = 10, repeats: int = 5) -> dict:
+    """
+    Stage latencies of `retriever` on `questions`. Embedding is measured
+    without the query cache, so it reflects the encoder itself.
+    """
+    qvecs = retriever._encode(questions)
+    ids   = [row for row in retriever.index.search(qvecs, k)[1]]
+
+    def lookup(row):
+        return [retriever.records[i] for i in row if i >= 0]
+
+    def end_to_end(q):
+        return retriever.search(retriever._encode([q]), k)
+
+    results = {
+        "embed":      timed(lambda q: retriever._encode([q]), questions, repeats),
+        "search":     timed(lambda v: retriever.index.search(v[None, :], k), list(qvecs), repeats),
+        "lookup":     timed(lookup, ids, repeats),
+        "end_to_end": timed(end_to_end, questions, repeats)
+    }
+    out = {stage: latency_stats(s) for stage, s in results.items()}
+
+    # one search call for the whole batch: throughput rather than latency
+    batch = timed(lambda v: retriever.index.search(v, k), [qvecs], repeats)
+    out["search_batch"] = {"batch": len(questions), "qps": len(questions) * len(batch) / sum(batch)}
+
+    # recall of the index as built (exact for flat) against IndexFlatIP
+    from baseline.retriever.index_factory import index_vectors, recall_at_k
+    try:
+        vec_ids, vectors = index_vectors(retriever.index)
+        out["recall_at_k"] = {"k": k, "recall": recall_at_k(retriever.index, vectors, qvecs, k, vec_ids)}
+    except RuntimeError as e:
+        print(f"[!] recall@k skipped: vectors cannot be read back from this index ({e})")
+    return out
+
+def synthetic_vectors(base, n: int, noise: float = 0.25, seed: int = 0, path: str = None,
+                      block: int = 65536):
+    """
+    Grows `base` (L2-normalized rows) to n vectors: each row is a random base
+    vector plus Gaussian noise of expected norm `noise`, re-normalized.
+    Written block by block into a .npy memmap at `path` when given, so corpora
+    larger than RAM can be generated. Returns (vectors, base_rows).
+    """
+    rng  = np.random.default_rng(seed)
+    dim  = base.shape[1]
+    rows = rng.integers(0, base.shape[0], size=n)
+    if path:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(n, dim))
+    else:
+        out = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        v = base[rows[start:stop]] + rng.normal(0, noise / np.sqrt(dim), (stop - start, dim))
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        out[start:stop] = v
+    if path:
+        out.flush()
+    return out, rows
+
+def synthetic_records(records, base_ids, base_rows):
+    """
+    (faiss_id, record) pairs for a synthetic corpus: row i copies the record
+    of the base chunk it was grown from.
+    """
+    for i, row in enumerate(base_rows):
+        yield i, records[int(base_ids[row])]
+
+def bench_scale(base, sizes: list, index_types: list, k: int = 10, n_queries: int = 200,
+                noise: float = 0.25, workdir: str = None, records=None, base_ids=None) -> list:
+    """
+    For every corpus size: builds each index type over a synthetic corpus and
+    reports build time, on-disk size, single-query latency, batch QPS and
+    recall@k against exact search. With `records`, also the lookup latency of
+    a chunk store holding the synthetic corpus.
+    """
+    import faiss
+    from baseline.retriever.index_factory import choose_params, build_index, write_index
+    from baseline.retriever.chunk_store import write_chunk_store, ChunkStore
+
+    workdir = workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    rows = []
+    for n in sizes:
+        vectors, base_rows = synthetic_vectors(base, n, noise, seed=n,
+                                               path=os.path.join(workdir, f"vectors_{n}.npy"))
+        # fresh jittered queries that are not themselves in the corpus
+        queries, _ = synthetic_vectors(base, n_queries, noise, seed=n + 1)
+
+        exact = faiss.IndexFlatIP(base.shape[1])
+        exact.add(vectors)
+        _, truth = exact.search(queries, k)
+        del exact
+
+        for index_type in index_types:
+            params = choose_params(index_type, n, base.shape[1])
+            t0 = time.perf_counter()
+            index = build_index(vectors, params)
+            build_s = time.perf_counter() - t0
+
+            path = os.path.join(workdir, f"{index_type}_{n}.idx")
+            # resident part only: the vectors of two-stage indexes stay on disk
+            write_index(index, path)
+            size = os.path.getsize(path)
+            for leftover in glob.glob(os.path.splitext(path)[0] + ".*"):
+                os.remove(leftover)
+
+            single = latency_stats(timed(lambda v: index.search(v[None, :], k), list(queries)))
+            batch  = timed(lambda q: index.search(q, k), [queries], repeats=3)
+            _, found = index.search(queries, k)
+            recall = sum(len(set(t) & set(f)) for t, f in zip(truth, found)) / float(truth.size)
+
+            rows.append({
+                "n": n, "index_type": index_type, "params": params,
+                "build_s": build_s, "size_mb": size / 2**20,
+                "search": single, "batch_qps": n_queries * len(batch) / sum(batch),
+                "recall_at_k": recall, "k": k
+            })
+            print(f"  n={n:<9} {index_type:<6} build={build_s:7.2f}s  size={size / 2**20:8.1f}MB  "
+                  f"p50={single['p50_ms']:.3f}ms p95={single['p95_ms']:.3f}ms p99={single['p99_ms']:.3f}ms  "
+                  f"batch={rows[-1]['batch_qps']:.0f}qps  recall@{k}={recall:.3f}", flush=True)
+            del index
+
+        if records is not None:
+            store_path = os.path.join(workdir, f"store_{n}")
+            write_chunk_store(synthetic_records(records, base_ids, base_rows), store_path)
+            store = ChunkStore(store_path)
+            ids = np.random.default_rng(n).integers(0, n, size=(n_queries, k))
+            lookup = latency_stats(timed(lambda row: [store[i] for i in row], list(ids)))
+            store.close()
+            shutil.rmtree(store_path)
+            rows.append({"n": n, "index_type": "chunk_store", "lookup": lookup})
+            print(f"  n={n:<9} lookup of {k} records: p50={lookup['p50_ms']:.3f}ms "
+                  f"p95={lookup['p95_ms']:.3f}ms p99={lookup['p99_ms']:.3f}ms", flush=True)
+
+        del vectors
+        os.remove(os.path.join(workdir, f"vectors_{n}.npy"))
+    return rows
+
+def _print_stages(stats: dict):
+    for stage, s in stats.items():
+        if stage == "recall_at_k":
+            print(f"  {'recall@' + str(s['k']):<12} {s['recall']:.3f} vs exact IndexFlatIP")
+        elif "p50_ms" in s:
+            print(f"  {stage:<12} p50={s['p50_ms']:8.3f}ms  p95={s['p95_ms']:8.3f}ms  "
+                  f"p99={s['p99_ms']:8.3f}ms  {s['qps']:9.1f} qps")
+        else:
+            print(f"  {stage:<12} {s['qps']:9.1f} qps (batch of {s['batch']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval latency, throughput and recall.")
+    parser.add_argument("--index",   default=DEFAULT_INDEX_PATH,   help="FAISS index file")
+    parser.add_argument("--records", default=DEFAULT_RECORDS_PATH, help="Chunk store")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("retriever", help="Stage latencies of the real Retriever")
+    r.add_argument("--tests",   default=DEFAULT_TESTS_PATH, help="Questions to time")
+    r.add_argument("--repeats", type=int, default=5)
+    r.add_argument("--mmap",    action="store_true", help="Memory-map the FAISS index")
+
+    s = sub.add_parser("scale", help="Synthetic scale-up of the indexed embeddings")
+    s.add_argument("--sizes",       type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    s.add_argument("--index-types", nargs="+", default=["flat", "ivf", "hnsw", "sq8", "binary"])
+    s.add_argument("--queries",     type=int, default=200, help="Queries per corpus size")
+    s.add_argument("--noise",       type=float, default=0.25, help="Norm of the jitter added to base vectors")
+    s.add_argument("--with-records", action="store_true", help="Also build a chunk store and time lookups")
+    s.add_argument("--workdir",     default=None, help="Scratch directory for memmaps (default: a temp dir)")
+    args = parser.parse_args()
+
+    if args.command == "retriever":
+        from baseline.retriever.retriever import Retriever
+        retriever = Retriever(args.index, args.records, mmap=args.mmap)
+        questions = [t["question"] for t in load_tests(args.tests)]
+        print(f"[+] Retriever on {len(questions)} questions, k={args.k}")
+        out = bench_retriever(retriever, questions, args.k, args.repeats)
+        _print_stages(out)
+    else:
+        from baseline.retriever.retriever import read_index
+        from baseline.retriever.index_factory import index_vectors
+        from baseline.retriever.chunk_store import load_records
+        base_ids, base = index_vectors(read_index(args.index))
+        records = load_records(args.records) if args.with_records else None
+        print(f"[+] Synthetic scale-up from {len(base)} base vectors, k={args.k}")
+        out = bench_scale(base, args.sizes, args.index_types, args.k, args.queries,
+                          args.noise, args.workdir, records, base_ids)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# evaluation/engine.py
+
+import os
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from baseline.pipeline import get_pipeline
+from baseline.generator.utils import classify_qtype
+
+DEFAULT_TESTS_PATH = "evaluation/test_inputs.json"
+
+def case_key(test: dict, version=None) -> str:
+    """
+    Identifies a test case in a checkpoint: same question and keywords, asked
+    of the same pipeline version (index build and models), same key.
+    """
+    data = json.dumps([test["question"], test["expected_keywords"], version], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def load_tests(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def score_answer(test: dict, answer: str, scorer) -> dict:
+    """
+    Per-test result as shown by app.py: ROUGE-L recall for explanations,
+    keyword hits for every other question type.
+    """
+    q        = test["question"]
+    expected = test["expected_keywords"]
+    qtype    = classify_qtype(q)
+
+    result = {
+        "question": q,
+        "answer": answer,
+        "expected": expected,
+        "qtype": qtype,
+        "hits": [],
+        "rougeL": None
+    }
+
+    if qtype == "explanation":
+        ref_scores = scorer.score(" ".join(expected), answer)
+        result["rougeL"] = ref_scores['rougeL'].recall
+    else:
+        ans_lower = answer.lower()
+        result["hits"] = [(kw, kw.lower() in ans_lower) for kw in expected]
+    return result
+
+def aggregate(results: list) -> dict:
+    """
+    Precision/recall/F1 over keyword hits of the non-explanation questions;
+    every expected keyword is a positive instance.
+    """
+    from sklearn.metrics import precision_score, recall_score, f1_score
+
+    y_pred = [int(hit) for r in results for _, hit in r["hits"]]
+    y_true = [1] * len(y_pred)
+    if not y_true:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+    return {
+        "precision": precision_score(y_true, y_pred),
+        "recall":    recall_score(y_true, y_pred),
+        "f1":        f1_score(y_true, y_pred)
+    }
+
+def load_checkpoint(path: str) -> dict:
+    """
+    {test key: answer} from a checkpoint file. A line cut short by an
+    interrupted write is ignored, so that question is simply asked again.
+    """
+    done = {}
+    if not path or not os.path.isfile(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[row["key"]] = row["answer"]
+        torn = bool(f.tell()) and not line.endswith("\n")
+    if torn:
+        # end the partial line so new records start on a line of their own
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n")
+    return done
+
+class EvaluationEngine:
+    """
+    Runs a test set through one shared RAGPipeline. Pending questions are
+    split into batches of `batch_size` and answered by `workers` threads;
+    each answer is appended to `checkpoint` (JSONL) as soon as it arrives, so
+    a rerun with the same checkpoint only asks what is still missing. Answers
+    recorded against another index build or model are asked again.
+    """
+    def __init__(self, pipeline=None, workers: int = 4, batch_size: int = 4,
+                 checkpoint: str = None, threshold: float = 0.2):
+        self.pipeline   = pipeline or get_pipeline()
+        self.workers    = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = checkpoint
+        self.threshold  = threshold
+        self._lock      = threading.Lock()
+
+    def _record(self, key: str, question: str, answer: str):
+        if not self.checkpoint:
+            return
+        with self._lock:
+            with open(self.checkpoint, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "question": question, "answer": answer},
+                                   ensure_ascii=False) + "\n")
+
+    def answer_all(self, tests: list, progress=None) -> list:
+        """
+        Returns one answer per test, in test order, reusing checkpointed ones.
+        `progress(done, total)` is called after every finished batch.
+        """
+        if self.checkpoint:
+            os.makedirs(os.path.dirname(self.checkpoint) or ".", exist_ok=True)
+        version = self.pipeline.version()
+        keys    = [case_key(t, version) for t in tests]
+        done    = load_checkpoint(self.checkpoint)
+        answers = [done.get(k) for k in keys]
+        pending = [i for i, a in enumerate(answers) if a is None]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        def run(batch):
+            got = self.pipeline.answer_batch([tests[i]["question"] for i in batch], threshold=self.threshold)
+            for i, ans in zip(batch, got):
+                self._record(keys[i], tests[i]["question"], ans)
+            return batch, got
+
+        finished = len(tests) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for future in as_completed([pool.submit(run, b) for b in batches]):
+                batch, got = future.result()
+                for i, ans in zip(batch, got):
+                    answers[i] = ans
+                finished += len(batch)
+                if progress is not None:
+                    progress(finished, len(tests))
+        return answers
+
+    def run(self, tests: list, progress=None) -> dict:
+        """
+        Answers and scores `tests`; returns {"results": [...], "metrics": {...}}
+        in the shape app.py displays.
+        """
+        from rouge_score import rouge_scorer
+
+        answers = self.answer_all(tests, progress)
+        scorer  = rouge_scorer.RougeScorer(['rougeL'], use_stemmer=True)
+        results = [score_answer(t, a, scorer) for t, a in zip(tests, answers)]
+        return {"results": results, "metrics": aggregate(results)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the RAG pipeline on a test set.")
+    parser.add_argument("tests", nargs="?", default=DEFAULT_TESTS_PATH, help="Test inputs JSON")
+    parser.add_argument("--workers",    type=int, default=4, help="Concurrent answer batches")
+    parser.add_argument("--batch-size", type=int, default=4, help="Questions per pipeline call")
+    parser.add_argument("--checkpoint", default=None,        help="JSONL file of answers to resume from")
+    parser.add_argument("--fresh",      action="store_true", help="Discard the checkpoint before running")
+    args = parser.parse_args()
+
+    if args.fresh and args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    engine = EvaluationEngine(workers=args.workers, batch_size=args.batch_size, checkpoint=args.checkpoint)
+    out = engine.run(
+        load_tests(args.tests),
+        progress=lambda done, total: print(f"[+] {done}/{total} answered", flush=True)
+    )
+    print("Aggregate metrics (non-explanation):")
+    print(f"  Precision: {out['metrics']['precision']:.2f}")
+    print(f"  Recall:    {out['metrics']['recall']:.2f}")
+    print(f"  F1 Score:  {out['metrics']['f1']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# evaluation/helpers.py
+"""
+Shared fixtures for the test modules.
+"""
+import numpy as np
+
+def clustered(n, dim=32, centers=20, seed=0):
+    """
+    n L2-normalized float32 vectors scattered around `centers` random centers,
+    so that approximate indexes have neighbourhoods worth finding.
+    """
+    rng = np.random.default_rng(seed)
+    c = rng.normal(size=(centers, dim))
+    v = c[rng.integers(0, centers, n)] + rng.normal(scale=0.3, size=(n, dim))
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v.astype("float32")
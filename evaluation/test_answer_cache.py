@@ -0,0 +1,36 @@
+# evaluation/test_answer_cache.py
+
+import unittest
+import numpy as np
+from baseline.generator.answer_cache import SemanticAnswerCache
+
+def _unit(v):
+    v = np.asarray(v, dtype="float32")
+    return v / np.linalg.norm(v)
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticAnswerCache(threshold=0.9, capacity=2)
+        self.key   = ("definition", (("doc.pdf", 1), ("doc.pdf", 2)))
+        self.cache.store(_unit([1, 0, 0]), self.key, "stored answer", version="v1")
+
+    def test_similar_question_with_same_contexts_hits(self):
+        self.assertEqual(self.cache.lookup(_unit([1, 0.1, 0]), self.key, "v1"), "stored answer")
+
+    def test_different_contexts_or_dissimilar_question_miss(self):
+        other = ("definition", (("doc.pdf", 3),))
+        self.assertIsNone(self.cache.lookup(_unit([1, 0.1, 0]), other, "v1"))
+        self.assertIsNone(self.cache.lookup(_unit([0, 1, 0]), self.key, "v1"))
+
+    def test_index_version_change_invalidates(self):
+        self.assertIsNone(self.cache.lookup(_unit([1, 0, 0]), self.key, "v2"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_capacity_evicts_oldest(self):
+        self.cache.store(_unit([0, 1, 0]), self.key, "b", version="v1")
+        self.cache.store(_unit([0, 0, 1]), self.key, "c", version="v1")
+        self.assertIsNone(self.cache.lookup(_unit([1, 0, 0]), self.key, "v1"))
+        self.assertEqual(self.cache.lookup(_unit([0, 0, 1]), self.key, "v1"), "c")
+
+if __name__ == '__main__':
+    unittest.main()
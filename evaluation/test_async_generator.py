@@ -0,0 +1,136 @@
+# evaluation/test_async_generator.py
+
+import json
+import time
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import cerebras.cloud.sdk  # noqa: F401
+    HAS_SDK = True
+except ImportError:
+    HAS_SDK = False
+
+class StubCompletions(BaseHTTPRequestHandler):
+    """
+    Minimal /v1/chat/completions: echoes the prompt, optionally failing the
+    first `server.failures` requests with 503, and records peak concurrency.
+    """
+    def do_POST(self):
+        srv = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with srv.lock:
+            srv.requests += 1
+            srv.in_flight += 1
+            srv.peak = max(srv.peak, srv.in_flight)
+            fail = srv.failures > 0
+            if fail:
+                srv.failures -= 1
+        time.sleep(0.05)
+        with srv.lock:
+            srv.in_flight -= 1
+
+        if fail:
+            payload, status = {"error": {"message": "overloaded"}}, 503
+        else:
+            prompt = body["messages"][0]["content"]
+            payload, status = {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": f"echo: {prompt}"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }, 200
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@unittest.skipUnless(HAS_SDK, "cerebras_cloud_sdk not installed")
+class TestAsyncGenerator(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubCompletions)
+        self.server.lock, self.server.requests = threading.Lock(), 0
+        self.server.in_flight, self.server.peak, self.server.failures = 0, 0, 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _generator(self, **kwargs):
+        from baseline.generator.async_generator import AsyncGenerator
+        return AsyncGenerator(api_key="test", base_url=self.base_url, base_delay=0.01, **kwargs)
+
+    def test_batch_respects_concurrency_limit_and_order(self):
+        gen = self._generator(max_concurrency=3)
+        prompts = [f"q{i}" for i in range(12)]
+        answers = asyncio.run(gen.generate_batch(prompts))
+        self.assertEqual(answers, [f"echo: {p}" for p in prompts])
+        self.assertLessEqual(self.server.peak, 3)
+        self.assertGreater(self.server.peak, 1)
+
+    def test_transient_failures_are_retried(self):
+        self.server.failures = 2
+        gen = self._generator(max_retries=3)
+        self.assertEqual(asyncio.run(gen.generate("hello")), "echo: hello")
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_max_retries(self):
+        from cerebras.cloud.sdk import APIStatusError
+        self.server.failures = 5
+        gen = self._generator(max_retries=1)
+        with self.assertRaises(APIStatusError):
+            asyncio.run(gen.generate("hello"))
+        self.assertEqual(self.server.requests, 2)
+
+    def test_rate_limit_spaces_out_requests(self):
+        gen = self._generator(max_concurrency=8, rate_limit=20)
+        t0 = time.monotonic()
+        asyncio.run(gen.generate_batch([str(i) for i in range(25)]))
+        # burst of 20, then 5 more at 20/s
+        self.assertGreaterEqual(time.monotonic() - t0, 0.2)
+
+    def test_identical_requests_in_flight_are_coalesced(self):
+        gen = self._generator()
+        results = asyncio.run(gen.complete_batch(["same", "same", "other", "same"]))
+        self.assertEqual([a for a, _ in results], ["echo: same", "echo: same", "echo: other", "echo: same"])
+        self.assertEqual(self.server.requests, 2)
+        # usage is reported once, by the caller whose request was sent
+        self.assertEqual(sum(t.get("completion", 0) for _, t in results), 2)
+        # a different max_length is a different request
+        asyncio.run(gen.complete_batch(["same", "same"], max_lengths=[64, 32]))
+        self.assertEqual(self.server.requests, 4)
+
+    def test_async_generators_share_client_and_flights(self):
+        async def run():
+            a, b = self._generator(), self._generator()
+            self.assertIs(a._state().client, b._state().client)
+            answers = await asyncio.gather(a.generate("same"), b.generate("same"), b.generate("same"))
+            await a.aclose()
+            return answers
+        self.assertEqual(asyncio.run(run()), ["echo: same"] * 3)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_sync_generators_share_client_and_flights(self):
+        import os
+        from unittest import mock
+        from concurrent.futures import ThreadPoolExecutor
+        from baseline.generator.generator import Generator
+        with mock.patch.dict(os.environ, {"CEREBRAS_API_KEY": "test"}):
+            a, b = Generator(base_url=self.base_url), Generator(base_url=self.base_url)
+        self.assertIs(a.client, b.client)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            answers = list(pool.map(lambda g: g.generate("same"), [a, b, a, b]))
+        self.assertEqual(answers, ["echo: same"] * 4)
+        self.assertEqual(self.server.requests, 1)
+
+if __name__ == '__main__':
+    unittest.main()
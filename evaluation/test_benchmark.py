@@ -0,0 +1,25 @@
+# evaluation/test_benchmark.py
+
+import unittest
+import numpy as np
+from evaluation.benchmark import latency_stats, synthetic_vectors
+
+class TestBenchmarkHelpers(unittest.TestCase):
+    def test_latency_stats(self):
+        stats = latency_stats([0.001] * 98 + [0.010, 0.100])
+        self.assertAlmostEqual(stats["p50_ms"], 1.0)
+        self.assertGreater(stats["p99_ms"], stats["p95_ms"])
+        self.assertAlmostEqual(stats["qps"], 100 / 0.208)
+
+    def test_synthetic_vectors_stay_near_their_base(self):
+        rng  = np.random.default_rng(0)
+        base = rng.normal(size=(20, 64)).astype("float32")
+        base /= np.linalg.norm(base, axis=1, keepdims=True)
+        vecs, rows = synthetic_vectors(base, 1000, noise=0.2, block=128)
+        self.assertEqual(vecs.shape, (1000, 64))
+        np.testing.assert_allclose(np.linalg.norm(vecs, axis=1), 1.0, rtol=1e-5)
+        sims = np.einsum("ij,ij->i", vecs, base[rows])
+        self.assertGreater(sims.min(), 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
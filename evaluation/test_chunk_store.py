@@ -0,0 +1,57 @@
+# evaluation/test_chunk_store.py
+
+import os
+import tempfile
+import unittest
+from baseline.retriever.chunk_store import ChunkStore, write_chunk_store, load_records
+from baseline.generator.tokens import get_counter
+
+RECORDS = {
+    0:  {"doc_id": "a.pdf", "section": "INTRO", "chunk_id": 0, "text": "Sea levels rose 21–24 cm."},
+    5:  {"doc_id": "a.pdf", "section": "INTRO", "chunk_id": 1, "text": ""},
+    42: {"doc_id": "b.pdf", "section": "FULL_DOCUMENT", "chunk_id": 0, "text": "CO₂ removal"},
+}
+
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "chunk_store")
+        write_chunk_store(RECORDS.items(), self.path)
+        self.store = ChunkStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_records_round_trip_by_faiss_id(self):
+        self.assertEqual(len(self.store), 3)
+        for fid, rec in RECORDS.items():
+            self.assertEqual(self.store[fid], rec)
+        self.assertEqual(dict(self.store.items()), RECORDS)
+
+    def test_missing_ids(self):
+        self.assertNotIn(6, self.store)
+        self.assertIsNone(self.store.get(6))
+        with self.assertRaises(KeyError):
+            self.store[-1]
+
+    def test_rewrite_replaces_store(self):
+        write_chunk_store(enumerate([RECORDS[0]]), self.path)
+        fresh = load_records(self.path)
+        self.assertEqual(len(fresh), 1)
+        self.assertEqual(fresh[0], RECORDS[0])
+        fresh.close()
+
+    def test_shipped_store_keeps_its_token_counts(self):
+        shipped = os.path.join(os.path.dirname(__file__), "..", "models", "chunk_store")
+        if not os.path.isdir(shipped):
+            self.skipTest("no chunk store in models/")
+        store = ChunkStore(shipped)
+        try:
+            rec = store.get(0)
+            self.assertEqual(rec["n_tokens"], get_counter().count(rec["text"].strip()))
+        finally:
+            store.close()
+
+if __name__ == '__main__':
+    unittest.main()
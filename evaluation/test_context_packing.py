@@ -0,0 +1,59 @@
+# evaluation/test_context_packing.py
+
+import unittest
+from baseline.generator.tokens import TokenCounter
+from baseline.generator.utils import pack_contexts, CONTEXT_OVERHEAD, MIN_CONTEXT_TOKENS
+
+class TestContextPacking(unittest.TestCase):
+    def setUp(self):
+        self.counter = TokenCounter("")
+
+    def test_estimate_counts_pieces(self):
+        # 4 words, "2007" as 200|7, 4 symbols
+        self.assertEqual(self.counter.count("Sea level rise (Stern, 2007)."), 10)
+        self.assertEqual(self.counter.count("intergovernmental"), 3)
+
+    def test_truncate_prefers_sentence_end(self):
+        text = ("Glaciers are retreating across the Alps. " * 3) + "The rest of this sentence is long " * 5
+        cut = self.counter.truncate(text, 30)
+        self.assertLessEqual(self.counter.count(cut), 30)
+        self.assertTrue(cut.endswith("Alps."))
+        self.assertTrue(text.startswith(cut))
+
+    def test_truncate_at_word_boundary(self):
+        text = " ".join(["warming"] * 100)
+        cut = self.counter.truncate(text, 20)
+        self.assertTrue(cut.endswith("warming …"))
+        self.assertLessEqual(self.counter.count(cut), 20)
+
+    def test_pack_fills_budget_in_order(self):
+        chunks = [" ".join([f"word{i}"] * 40) for i in range(4)]
+        sizes  = [self.counter.count(c) for c in chunks]
+        budget = sizes[0] + sizes[1] + 2 * CONTEXT_OVERHEAD + MIN_CONTEXT_TOKENS + CONTEXT_OVERHEAD + 5
+        packed = pack_contexts(chunks, budget, counter=self.counter)
+        self.assertEqual(packed[:2], chunks[:2])
+        self.assertEqual(len(packed), 3)
+        self.assertTrue(chunks[2].startswith(packed[2][:-2]))
+        used = sum(self.counter.count(p) + CONTEXT_OVERHEAD for p in packed)
+        self.assertLessEqual(used, budget)
+
+    def test_pack_uses_stored_counts_and_skips_tiny_remainders(self):
+        chunks = ["alpha beta", " ".join(["gamma"] * 20)]
+        # stored counts say the first chunk nearly fills the budget
+        packed = pack_contexts(chunks, 100, n_tokens=[90, None], counter=self.counter)
+        self.assertEqual(packed, ["alpha beta"])
+
+    def test_min_contexts_cuts_long_chunks_to_fit(self):
+        chunks = [" ".join([f"word{i}"] * 100) for i in range(4)]
+        budget = self.counter.count(chunks[0]) + CONTEXT_OVERHEAD + 10
+        packed = pack_contexts(chunks, budget, counter=self.counter, min_contexts=3)
+        self.assertEqual(len(packed), 3)
+        for chunk, text in zip(chunks, packed):
+            self.assertTrue(chunk.startswith(text[:-2]))
+        used = sum(self.counter.count(p) + CONTEXT_OVERHEAD for p in packed)
+        self.assertLessEqual(used, budget)
+        # never more than there are
+        self.assertEqual(len(pack_contexts(chunks[:2], budget, counter=self.counter, min_contexts=3)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# evaluation/test_create_indexes.py
+
+import os
+import json
+import shutil
+import zlib
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from scripts import create_indexes
+from baseline.retriever.layout import SENTENCES_NAME, build_id
+from baseline.retriever.sentence_store import SentenceStore, write_sentence_store
+from baseline.retriever.retriever import Retriever
+from baseline.retriever.chunk_store import ChunkStore
+from baseline.generator.tokens import get_counter
+
+def fake_encode(model_name, texts, backend=None):
+    # bag of hashed words: deterministic and close for texts sharing words
+    vecs = np.zeros((len(texts), 16), dtype="float32")
+    for i, text in enumerate(texts):
+        for word in text.lower().split():
+            vecs[i, zlib.crc32(word.encode()) % 16] += 1
+    return vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-9, None)
+
+class TestCreateIndexes(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.jsonl = os.path.join(self.dir, "chunks.jsonl")
+        self.index_dir = os.path.join(self.dir, "models")
+        self.chunks = [{"doc_id": f"doc{i % 3}.pdf", "section": "FULL_DOCUMENT", "chunk_id": i,
+                        "text": f"Chunk {i} is about glaciers. Sea ice number {i} keeps thinning every year."}
+                       for i in range(12)]
+        patcher = mock.patch.object(create_indexes, "encode", fake_encode)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def build(self, chunks, **kwargs):
+        with open(self.jsonl, "w", encoding="utf-8") as f:
+            for rec in chunks:
+                f.write(json.dumps(rec) + "\n")
+        with mock.patch("builtins.print"):
+            create_indexes.main(self.jsonl, self.index_dir, "test-model", **kwargs)
+
+    def retriever(self):
+        return Retriever(os.path.join(self.index_dir, "faiss_index.idx"), os.path.join(self.index_dir, "chunk_store"),
+                         model_name="test-model", sentences_path=os.path.join(self.index_dir, SENTENCES_NAME))
+
+    def test_sentence_store_follows_the_index_build(self):
+        sentences = os.path.join(self.index_dir, SENTENCES_NAME)
+        self.build(self.chunks, sentences=True)
+        first = build_id(self.index_dir)
+        self.assertEqual(SentenceStore(sentences).build_id, first)
+        self.assertIsNotNone(self.retriever().sentences)
+
+        # an incremental update keeps the ids, the build id and the store
+        self.build(self.chunks + [dict(self.chunks[0], chunk_id=99, text="A new chunk on permafrost thaw.")])
+        self.assertEqual(build_id(self.index_dir), first)
+        self.assertIsNotNone(self.retriever().sentences)
+
+        # a full rebuild renumbers the ids, so a store it does not refresh is removed
+        self.build(self.chunks[::-1], full=True)
+        self.assertNotEqual(build_id(self.index_dir), first)
+        self.assertFalse(os.path.exists(sentences))
+
+    def test_store_of_another_build_is_ignored(self):
+        self.build(self.chunks)
+        write_sentence_store([], os.path.join(self.index_dir, SENTENCES_NAME), "test-model", "some-other-build")
+        self.assertIsNone(self.retriever().sentences)
+
+    def test_token_counts_follow_the_tokenizer(self):
+        self.build(self.chunks)
+        store_path = os.path.join(self.index_dir, "chunk_store")
+        store = ChunkStore(store_path)
+        self.assertEqual(store.meta["tokenizer"], get_counter().name)
+        self.assertIn("n_tokens", store[0])
+        store.close()
+
+        counted = []
+        counter = get_counter()
+        count = lambda text: counted.append(text) or 7
+        added = self.chunks + [dict(self.chunks[0], chunk_id=99, text="A new chunk on permafrost thaw.")]
+        # an incremental update only counts the new chunk
+        with mock.patch.object(counter, "count", side_effect=count):
+            self.build(added)
+        self.assertEqual(counted, ["A new chunk on permafrost thaw."])
+
+        # counts from another tokenizer are not used, and the next build redoes them all
+        with mock.patch("baseline.retriever.chunk_store.counter_name", return_value="other/tokenizer"):
+            store = ChunkStore(store_path)
+            self.assertNotIn("n_tokens", store[0])
+            store.close()
+            with mock.patch.object(counter, "count", side_effect=count), \
+                    mock.patch.object(counter, "name", "other/tokenizer"):
+                self.build(added)
+            store = ChunkStore(store_path)
+            self.assertEqual(store.meta["tokenizer"], "other/tokenizer")
+            self.assertEqual(store[0]["n_tokens"], 7)
+            store.close()
+        self.assertEqual(len(counted), 1 + len(added))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# evaluation/test_dedup.py
+
+import random
+import unittest
+from specialization.dedup import MinHasher, NearDuplicateFilter, shingles
+from specialization.specialization import strip_boilerplate
+
+def words(n, seed):
+    rng = random.Random(seed)
+    return [rng.choice(["ice", "sea", "heat", "carbon", "ocean", "risk", "policy", "model",
+                        "forest", "storm", "water", "emission", "coast", "energy"]) + str(rng.randint(0, 50))
+            for _ in range(n)]
+
+class TestNearDuplicates(unittest.TestCase):
+    def test_signature_estimates_jaccard(self):
+        a = words(200, 1)
+        b = a[:150] + words(50, 2)
+        sa, sb = shingles(" ".join(a)), shingles(" ".join(b))
+        true = len(sa & sb) / len(sa | sb)
+        hasher = MinHasher(num_perm=256)
+        est = (hasher.signature(sa) == hasher.signature(sb)).mean()
+        self.assertAlmostEqual(est, true, delta=0.08)
+
+    def test_drops_near_copies_but_keeps_overlapping_windows(self):
+        text = words(300, 3)
+        near = NearDuplicateFilter(threshold=0.8)
+        # sliding windows of 100 words, stride 50: ~0.3 Jaccard between neighbours
+        for i, start in enumerate(range(0, 201, 50)):
+            self.assertIsNone(near.check(("doc", i), " ".join(text[start:start + 100])))
+        # the same window with a couple of words changed, e.g. a page number
+        edited = text[50:150]
+        edited[40] = "page17"
+        dup = near.check(("copy", 0), " ".join(edited))
+        self.assertIsNotNone(dup)
+        self.assertEqual(dup[0], ("doc", 1))
+        self.assertGreaterEqual(dup[1], 0.8)
+
+class TestStripBoilerplate(unittest.TestCase):
+    def test_running_headers_and_page_numbers_are_removed(self):
+        topics = ["sea ice", "glaciers", "coral reefs", "heat waves", "wildfires", "sea level"]
+        pages = [
+            f"Global Environmental Change {2010} xxx\nBody text about {topic}.\n{2015 + i} {40 + i} {i}.5\n"
+            + f"Page {i + 1} of 6"
+            for i, topic in enumerate(topics)
+        ]
+        stats = {}
+        out = list(strip_boilerplate(pages, min_pages=3, sample=2, stats=stats))
+        self.assertEqual(len(out), 6)
+        # counted online after the 2-page sample: kept until seen on 3 pages
+        self.assertIn("Global Environmental Change", out[1])
+        for page in out[2:]:
+            self.assertNotIn("Global Environmental Change", page)
+            self.assertIn("Body text about", page)
+        # numeric table rows of the same shape are content, not headers
+        for i, page in enumerate(out):
+            self.assertIn(f"{2015 + i} {40 + i} {i}.5", page)
+        # header and page number on pages 3-6
+        self.assertEqual(stats["boilerplate"], 4 * 2)
+
+    def test_bare_page_numbers_match_across_pages(self):
+        pages = [f"Body {word}\n- {i} -" for i, word in enumerate(["one", "two", "three", "four"], 1)]
+        self.assertEqual(list(strip_boilerplate(pages, min_pages=3, sample=4)),
+                         ["Body one", "Body two", "Body three", "Body four"])
+
+    def test_short_documents_are_untouched(self):
+        pages = ["Header\nOne", "Header\nTwo"]
+        self.assertEqual(list(strip_boilerplate(pages)), pages)
+
+if __name__ == '__main__':
+    unittest.main()
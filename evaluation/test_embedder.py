@@ -0,0 +1,42 @@
+# evaluation/test_embedder.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from baseline.retriever import embedder
+from baseline.retriever.embedder import mean_pool, cosine_agreement, load_embedder
+
+class TestEmbedder(unittest.TestCase):
+    def test_mean_pool_ignores_padding(self):
+        hidden = np.array([[[1, 0], [3, 0], [100, 100]],
+                           [[0, 2], [0, 2], [0, 2]]], dtype="float32")
+        mask = np.array([[1, 1, 0], [1, 1, 1]])
+        vecs = mean_pool(hidden, mask)
+        np.testing.assert_allclose(vecs, [[1, 0], [0, 1]], atol=1e-6)
+
+    def test_cosine_agreement(self):
+        rng = np.random.default_rng(0)
+        a = rng.normal(size=(20, 8)).astype("float32")
+        a /= np.linalg.norm(a, axis=1, keepdims=True)
+        b = a + rng.normal(scale=0.01, size=a.shape).astype("float32")
+        b /= np.linalg.norm(b, axis=1, keepdims=True)
+        stats = cosine_agreement(a, b)
+        self.assertEqual(stats["n"], 20)
+        self.assertGreater(stats["min_cosine"], 0.99)
+        self.assertLess(cosine_agreement(a, -a)["mean_cosine"], -0.99)
+
+    def test_load_embedder_errors(self):
+        with self.assertRaises(ValueError):
+            load_embedder("all-MiniLM-L6-v2", "tensorflow")
+        old = embedder.ONNX_MODEL_DIR
+        embedder.ONNX_MODEL_DIR = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(FileNotFoundError):
+                load_embedder("all-MiniLM-L6-v2", "onnx")
+        finally:
+            os.rmdir(embedder.ONNX_MODEL_DIR)
+            embedder.ONNX_MODEL_DIR = old
+
+if __name__ == '__main__':
+    unittest.main()
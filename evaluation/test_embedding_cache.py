@@ -0,0 +1,41 @@
+# evaluation/test_embedding_cache.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from baseline.retriever.embedding_cache import EmbeddingCache, normalize_query
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_normalized_queries_share_an_entry(self):
+        cache = EmbeddingCache(capacity=4)
+        cache.put("m", "What is ocean acidification?", np.ones(3, dtype="float32"))
+        self.assertEqual(normalize_query("  what IS ocean   acidification "),
+                         normalize_query("What is ocean acidification?"))
+        self.assertIsNotNone(cache.get("m", "what is ocean acidification"))
+        self.assertIsNone(cache.get("other-model", "what is ocean acidification"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(capacity=2)
+        cache.put("m", "a", np.zeros(1))
+        cache.put("m", "b", np.zeros(1))
+        cache.get("m", "a")              # 'a' is now most recent
+        cache.put("m", "c", np.zeros(1))
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertIsNotNone(cache.get("m", "a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.pkl")
+            cache = EmbeddingCache(path=path)
+            cache.put("m", "sea level rise", np.arange(3, dtype="float32"))
+            cache.save()
+            warm = EmbeddingCache(path=path)
+            np.testing.assert_array_equal(warm.get("m", "Sea level rise?"),
+                                          np.arange(3, dtype="float32"))
+
+if __name__ == '__main__':
+    unittest.main()
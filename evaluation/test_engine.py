@@ -0,0 +1,79 @@
+# evaluation/test_engine.py
+
+import os
+import tempfile
+import threading
+import unittest
+from evaluation.engine import EvaluationEngine, score_answer, load_checkpoint
+
+class FakePipeline:
+    """
+    Answers "A: <question>"; raises once `fail_after` questions were answered.
+    """
+    def __init__(self, fail_after=None):
+        self.asked      = []
+        self.fail_after = fail_after
+        self.index      = "build-1"
+        self._lock      = threading.Lock()
+
+    def version(self):
+        return {"index": self.index, "embed_model": "embed", "generator": "llm"}
+
+    def answer_batch(self, questions, threshold=0.2):
+        with self._lock:
+            if self.fail_after is not None and len(self.asked) >= self.fail_after:
+                raise RuntimeError("interrupted")
+            self.asked.extend(questions)
+        return [f"A: {q}" for q in questions]
+
+TESTS = [{"question": f"What is item {i}?", "expected_keywords": [f"item {i}"]} for i in range(10)]
+
+class TestEvaluationEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, "run.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_answers_in_test_order(self):
+        pipeline = FakePipeline()
+        engine = EvaluationEngine(pipeline, workers=4, batch_size=3)
+        answers = engine.answer_all(TESTS)
+        self.assertEqual(answers, [f"A: {t['question']}" for t in TESTS])
+        self.assertEqual(sorted(pipeline.asked), sorted(t["question"] for t in TESTS))
+
+    def test_resume_only_asks_missing_questions(self):
+        first = EvaluationEngine(FakePipeline(fail_after=4), workers=1, batch_size=2, checkpoint=self.checkpoint)
+        with self.assertRaises(RuntimeError):
+            first.answer_all(TESTS)
+        self.assertEqual(len(load_checkpoint(self.checkpoint)), 4)
+
+        # a torn final line from the interruption is skipped
+        with open(self.checkpoint, "a", encoding="utf-8") as f:
+            f.write('{"key": "trunc')
+
+        pipeline = FakePipeline()
+        answers = EvaluationEngine(pipeline, workers=2, batch_size=2, checkpoint=self.checkpoint).answer_all(TESTS)
+        self.assertEqual(len(pipeline.asked), 6)
+        self.assertEqual(answers, [f"A: {t['question']}" for t in TESTS])
+        self.assertEqual(len(load_checkpoint(self.checkpoint)), 10)
+
+    def test_answers_of_another_index_build_are_asked_again(self):
+        EvaluationEngine(FakePipeline(), workers=1, batch_size=4, checkpoint=self.checkpoint).answer_all(TESTS)
+        pipeline = FakePipeline()
+        pipeline.index = "build-2"
+        EvaluationEngine(pipeline, workers=1, batch_size=4, checkpoint=self.checkpoint).answer_all(TESTS)
+        self.assertEqual(len(pipeline.asked), len(TESTS))
+
+    def test_keyword_hits(self):
+        result = score_answer(
+            {"question": "Which gases trap heat?", "expected_keywords": ["CO2", "methane"]},
+            "Mostly co2 and water vapour.",
+            scorer=None
+        )
+        self.assertEqual(result["hits"], [("CO2", True), ("methane", False)])
+        self.assertIsNone(result["rougeL"])
+
+if __name__ == '__main__':
+    unittest.main()
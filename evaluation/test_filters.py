@@ -0,0 +1,98 @@
+# evaluation/test_filters.py
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import faiss
+from baseline.retriever.index_factory import choose_params, build_index, apply_search_params
+from baseline.retriever.chunk_store import ChunkStore, write_chunk_store
+from baseline.retriever.filters import allowed_ids, filtered_search, make_selector
+from evaluation.helpers import clustered
+
+class TestFilteredSearch(unittest.TestCase):
+    def setUp(self):
+        self.vectors = clustered(3000)
+        self.queries = clustered(20, seed=1)
+        self.ids     = np.arange(len(self.vectors), dtype="int64") * 2 + 1
+        # a small, scattered subset: too few for IVF probes / HNSW beams to hold k of them
+        self.allowed = np.sort(np.random.default_rng(2).choice(self.ids, 40, replace=False))
+
+    def exact(self, k):
+        rows = np.searchsorted(self.ids, self.allowed)
+        scores = self.queries @ self.vectors[rows].T
+        return self.allowed[np.argsort(-scores, axis=1, kind="stable")[:, :k]]
+
+    def test_every_index_type_returns_k_allowed_ids(self):
+        for index_type in ("flat", "ivf", "hnsw", "sq8"):
+            with self.subTest(index_type=index_type):
+                params = choose_params(index_type, len(self.vectors), self.vectors.shape[1])
+                index = build_index(self.vectors, params, ids=self.ids)
+                apply_search_params(index, params)
+                D, I = filtered_search(index, self.queries, 10, self.allowed, params)
+                self.assertTrue(np.isin(I, self.allowed).all())
+                self.assertTrue(np.all(np.diff(D, axis=1) <= 1e-6))
+                if index_type in ("flat", "sq8"):
+                    np.testing.assert_array_equal(I, self.exact(10))
+
+    def test_fewer_allowed_than_k(self):
+        params = choose_params("flat", len(self.vectors), self.vectors.shape[1])
+        index = build_index(self.vectors, params, ids=self.ids)
+        D, I = filtered_search(index, self.queries, 10, self.allowed[:3], params)
+        self.assertTrue((I[:, :3] >= 0).all())
+        self.assertTrue((I[:, 3:] == -1).all())
+        _, I = filtered_search(index, self.queries, 10, np.empty(0, dtype="int64"), params)
+        self.assertTrue((I == -1).all())
+
+    def test_fallback_after_removals_leaves_index_updatable(self):
+        for ids in (self.ids, None):
+            with self.subTest(ids="stored" if ids is not None else "positional"):
+                params = choose_params("ivf", len(self.vectors), self.vectors.shape[1])
+                index = build_index(self.vectors, params, ids=ids)
+                held = self.ids if ids is not None else np.arange(len(self.vectors), dtype="int64")
+                index.remove_ids(held[:100:2])
+                allowed = np.setdiff1d(held[:200:3], held[:100:2])
+                D, I = filtered_search(index, self.queries, 10, allowed, params)
+                self.assertTrue(np.isin(I, allowed).all())
+                self.assertTrue((I >= 0).all())
+                # the fallback must not have changed how the index can be updated
+                index.remove_ids(held[100:110])
+                self.assertEqual(index.ntotal, len(self.vectors) - 60)
+
+    def test_bitmap_and_batch_selectors_agree(self):
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.vectors.shape[1]))
+        index.add_with_ids(self.vectors, self.ids)
+        dense = self.ids[::3]
+        for sel in (make_selector(dense), faiss.IDSelectorBatch(dense)):
+            _, I = index.search(self.queries, 10, params=faiss.SearchParameters(sel=sel))
+            self.assertTrue(np.isin(I, dense).all())
+        self.assertIsInstance(make_selector(dense), faiss.IDSelectorBitmap)
+
+class TestAllowedIds(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.records = {i * 5: {"doc_id": f"doc{i % 4}.pdf", "section": "intro" if i % 3 == 0 else "body",
+                                "chunk_id": i, "text": f"chunk {i}"} for i in range(60)}
+        write_chunk_store(self.records.items(), self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def scan(self, docs, sections):
+        return [i for i, r in sorted(self.records.items())
+                if (docs is None or r["doc_id"] in docs) and (sections is None or r["section"] in sections)]
+
+    def test_postings_match_a_scan(self):
+        store = ChunkStore(self.dir)
+        for docs, sections in ((["doc1.pdf"], None), (["doc0.pdf", "doc3.pdf"], None),
+                               (None, ["intro"]), ("doc2.pdf", "intro"), (["missing.pdf"], None)):
+            expected = self.scan([docs] if isinstance(docs, str) else docs,
+                                 [sections] if isinstance(sections, str) else sections)
+            self.assertEqual(allowed_ids(store, docs, sections).tolist(), expected)
+            # legacy pickled records are scanned instead
+            self.assertEqual(allowed_ids(self.records, docs, sections).tolist(), expected)
+        self.assertIsNone(allowed_ids(store))
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# evaluation/test_generator_stream.py
+
+import os
+import json
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import cerebras.cloud.sdk  # noqa: F401
+    HAS_SDK = True
+except ImportError:
+    HAS_SDK = False
+
+PIECES = ["Green", "land lost ", "about 270 ", "Gt per year."]
+
+class StubStream(BaseHTTPRequestHandler):
+    """
+    /v1/chat/completions answering stream=True requests with server-sent events.
+    """
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.bodies.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in PIECES + [None]:
+            chunk = {
+                "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0,
+                             "delta": {"content": piece} if piece else {},
+                             "finish_reason": None if piece else "stop"}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+@unittest.skipUnless(HAS_SDK, "cerebras_cloud_sdk not installed")
+class TestGeneratorStream(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubStream)
+        self.server.bodies, self.server.delay = [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        os.environ.setdefault("CEREBRAS_API_KEY", "test")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_yields_pieces_in_order(self):
+        from baseline.generator.generator import Generator
+        gen = Generator(base_url=f"http://127.0.0.1:{self.server.server_address[1]}")
+        pieces = list(gen.generate_stream("How much ice did Greenland lose?", max_length=64))
+        self.assertEqual(pieces, PIECES)
+        self.assertTrue(self.server.bodies[0]["stream"])
+        self.assertEqual(self.server.bodies[0]["max_tokens"], 64)
+
+    def test_identical_streams_in_flight_share_one_request(self):
+        from baseline.generator.generator import Generator
+        self.server.delay = 0.05
+        gen = Generator(base_url=f"http://127.0.0.1:{self.server.server_address[1]}")
+        start = threading.Barrier(4)
+
+        def read(stop_after):
+            start.wait()
+            pieces = []
+            stream = gen.generate_stream("same question")
+            for piece in stream:
+                pieces.append(piece)
+                if len(pieces) == stop_after:
+                    stream.close()
+                    break
+            return pieces
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(read, [None, None, None, 1]))
+        # a caller stopping early does not cut the stream short for the others
+        self.assertEqual(results, [PIECES] * 3 + [PIECES[:1]])
+        self.assertEqual(len(self.server.bodies), 1)
+        # once it has ended, the same question is asked again
+        self.assertEqual(list(gen.generate_stream("same question")), PIECES)
+        self.assertEqual(len(self.server.bodies), 2)
+
+class TestStreamFlight(unittest.TestCase):
+    def test_errors_reach_every_reader_after_the_items(self):
+        from baseline.generator.generator import StreamFlight
+        opened = []
+
+        def upstream():
+            opened.append(1)
+            yield "a"
+            raise RuntimeError("dropped")
+
+        flight = StreamFlight()
+        first, shared_first = flight.join("k", upstream)
+        second, shared_second = flight.join("k", upstream)
+        self.assertEqual((shared_first, shared_second), (False, True))
+        for items in (first, second):
+            self.assertEqual(next(items), "a")
+            with self.assertRaises(RuntimeError):
+                next(items)
+        self.assertEqual(len(opened), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+# evaluation/test_imports.py
+
+import sys
+import subprocess
+import unittest
+
+HEAVY = ("faiss", "sentence_transformers", "torch", "onnxruntime", "cerebras.cloud.sdk")
+
+class TestDeferredImports(unittest.TestCase):
+    def test_pipeline_import_stays_light(self):
+        # a fresh interpreter, so modules other tests imported do not count
+        code = ("import sys, baseline.pipeline, baseline.server; "
+                f"print([m for m in {HEAVY!r} if m in sys.modules])")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "[]")
+
+if __name__ == '__main__':
+    unittest.main()
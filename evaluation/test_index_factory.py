@@ -0,0 +1,71 @@
+# evaluation/test_index_factory.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import faiss
+from baseline.retriever.index_factory import (
+    choose_params, build_index, read_index, write_index, save_params, apply_search_params,
+    index_vectors, is_legacy_ivf
+)
+from evaluation.helpers import clustered
+
+class TestIncrementalUpdates(unittest.TestCase):
+    def setUp(self):
+        self.vectors = clustered(2000)
+        self.ids     = np.arange(len(self.vectors), dtype="int64")
+        self.removed = np.arange(0, 1000, 2, dtype="int64")
+        self.kept    = np.setdiff1d(self.ids, self.removed)
+
+    def updated(self, index_type):
+        """
+        Builds, removes every other id below 1000, re-adds two removed
+        vectors under new ids, and round-trips through disk as an
+        incremental build does.
+        """
+        params = choose_params(index_type, len(self.vectors), self.vectors.shape[1])
+        index = build_index(self.vectors, params, ids=self.ids)
+        index.remove_ids(self.removed)
+        index.add_with_ids(self.vectors[[0, 2]], np.array([5000, 5001], dtype="int64"))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "faiss_index.idx")
+            write_index(index, path)
+            save_params(path, params)
+            index = read_index(path)
+        # probe every list, so only id bookkeeping can make a query miss
+        if "nlist" in params:
+            apply_search_params(index, dict(params, nprobe=params["nlist"]))
+        return index
+
+    def test_removed_ids_leave_the_others_addressable(self):
+        for index_type in ("flat", "ivf"):
+            with self.subTest(index_type=index_type):
+                index = self.updated(index_type)
+                self.assertFalse(is_legacy_ivf(index))
+                self.assertEqual(index.ntotal, len(self.kept) + 2)
+                _, I = index.search(self.vectors[self.kept], 1)
+                np.testing.assert_array_equal(I[:, 0], self.kept)
+                _, I = index.search(self.vectors[[0, 2]], 1)
+                self.assertEqual(I[:, 0].tolist(), [5000, 5001])
+
+                ids, vectors = index_vectors(index)
+                order = np.argsort(ids)
+                np.testing.assert_array_equal(ids[order], np.concatenate([self.kept, [5000, 5001]]))
+                np.testing.assert_allclose(vectors[order][:len(self.kept)], self.vectors[self.kept], atol=1e-6)
+
+    def test_ivfpq_never_returns_removed_ids(self):
+        index = self.updated("ivfpq")
+        _, I = index.search(self.vectors, 10)
+        self.assertFalse(np.isin(I, self.removed).any())
+        self.assertTrue(np.isin(I[I >= 0], np.concatenate([self.kept, [5000, 5001]])).all())
+
+    def test_legacy_id_map_layout_is_detected(self):
+        params = choose_params("ivf", len(self.vectors), self.vectors.shape[1])
+        inner = faiss.IndexIVFFlat(faiss.IndexFlatIP(32), 32, params["nlist"], faiss.METRIC_INNER_PRODUCT)
+        inner.train(self.vectors)
+        self.assertTrue(is_legacy_ivf(faiss.IndexIDMap2(inner)))
+        self.assertFalse(is_legacy_ivf(build_index(self.vectors, choose_params("flat", 2000, 32), ids=self.ids)))
+
+if __name__ == '__main__':
+    unittest.main()
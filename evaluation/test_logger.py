@@ -0,0 +1,70 @@
+# evaluation/test_logger.py
+
+import os
+import gzip
+import json
+import tempfile
+import unittest
+from utils.logger import QueryLogger
+
+def entry(i, prompt="Context: ...\nQuestion: q"):
+    return {"question": f"q{i}", "prompt": prompt, "generated_answer": "x" * 200}
+
+class TestQueryLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "logs", "log.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_entries_written_in_order_after_flush(self):
+        logger = QueryLogger(self.path, flush_every=8, flush_interval=60)
+        for i in range(20):
+            logger.log(entry(i))
+        logger.flush()
+        self.assertEqual([e["question"] for e in self._read(self.path)], [f"q{i}" for i in range(20)])
+        logger.close()
+
+    def test_interval_flush_without_explicit_flush(self):
+        logger = QueryLogger(self.path, flush_every=1000, flush_interval=0.05)
+        logger.log(entry(0))
+        logger._thread.join(0.5)
+        self.assertEqual(len(self._read(self.path)), 1)
+        logger.close()
+
+    def test_rotation_bounds_disk_usage(self):
+        logger = QueryLogger(self.path, max_bytes=2000, backups=2, flush_every=4, flush_interval=60)
+        for i in range(60):
+            logger.log(entry(i))
+        logger.close()
+        names = sorted(os.listdir(os.path.dirname(self.path)))
+        self.assertEqual(names, ["log.jsonl", "log.jsonl.1.gz", "log.jsonl.2.gz"])
+        kept = self._read(self.path + ".2.gz") + self._read(self.path + ".1.gz") + self._read(self.path)
+        questions = [e["question"] for e in kept]
+        # oldest segments were dropped; what is left is the most recent tail, in order
+        self.assertEqual(questions, [f"q{i}" for i in range(60 - len(questions), 60)])
+
+    def test_hash_prompts(self):
+        logger = QueryLogger(self.path, hash_prompts=True)
+        logger.log(entry(0, prompt="secret prompt"))
+        logger.close()
+        (row,) = self._read(self.path)
+        self.assertNotIn("prompt", row)
+        self.assertEqual(len(row["prompt_sha256"]), 64)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        logger = QueryLogger(self.path, queue_size=1, flush_interval=60)
+        logger._queue.put(entry(-1))   # fill it before the writer can drain
+        for i in range(100):
+            logger.log(entry(i))
+        self.assertGreater(logger.dropped, 0)
+        logger.close()
+
+if __name__ == '__main__':
+    unittest.main()
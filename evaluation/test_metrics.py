@@ -0,0 +1,59 @@
+# evaluation/test_metrics.py
+
+import os
+import json
+import tempfile
+import unittest
+import urllib.request
+from utils.metrics import MetricsRegistry, StageTimer, record_request, registry_from_log, start_metrics_server
+
+class TestMetrics(unittest.TestCase):
+    def test_stage_timer_accumulates(self):
+        timer = StageTimer()
+        with timer.stage("embed"):
+            pass
+        timer.add("embed", 0.5)
+        timer.add("search", 0.25)
+        self.assertGreaterEqual(timer.stages["embed"], 0.5)
+        self.assertEqual(timer.as_dict()["search"], 0.25)
+
+    def test_histogram_buckets_are_cumulative(self):
+        reg = MetricsRegistry()
+        for secs in (0.002, 0.002, 0.3, 60.0):
+            reg.observe("rag_stage_seconds", secs, stage="generate")
+        text = reg.render()
+        self.assertIn('rag_stage_seconds_bucket{stage="generate",le="0.0025"} 2', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="generate",le="0.5"} 3', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="generate",le="+Inf"} 4', text)
+        self.assertIn('rag_stage_seconds_count{stage="generate"} 4', text)
+
+    def test_record_request_and_replay_from_log(self):
+        entry = {"timings": {"embed": 0.01, "generate": 0.4}, "tokens": {"prompt": 120, "completion": 30}, "cached": False}
+        reg = MetricsRegistry()
+        record_request(entry["timings"], entry["tokens"], entry["cached"], reg)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "log.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.write(json.dumps({"question": "entry without timings"}) + "\n")
+            self.assertEqual(registry_from_log(path).snapshot(), reg.snapshot())
+
+        snap = reg.snapshot()
+        self.assertEqual(snap["counters"]["rag_tokens_total"]['{kind="prompt"}'], 120)
+        self.assertEqual(snap["counters"]["rag_requests_total"]['{cached="false"}'], 1)
+
+    def test_metrics_endpoint(self):
+        reg = MetricsRegistry()
+        reg.inc("rag_requests_total", cached="true")
+        server = start_metrics_server(0, registry=reg)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            body = urllib.request.urlopen(url).read().decode("utf-8")
+            self.assertIn('rag_requests_total{cached="true"} 1', body)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
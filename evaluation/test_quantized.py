@@ -0,0 +1,68 @@
+# evaluation/test_quantized.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import faiss
+from baseline.retriever.index_factory import (
+    choose_params, build_index, read_index, write_index, save_params, recall_at_k
+)
+from baseline.retriever.quantized import TwoStageIndex, vectors_path
+from evaluation.helpers import clustered
+
+class TestTwoStageIndex(unittest.TestCase):
+    def setUp(self):
+        self.vectors = clustered(3000, dim=384)
+        self.queries = clustered(50, dim=384, seed=1)
+
+    def test_sq8_recall_against_exact_search(self):
+        index = build_index(self.vectors, choose_params("sq8", len(self.vectors), 384))
+        self.assertIsInstance(index, TwoStageIndex)
+        self.assertGreaterEqual(recall_at_k(index, self.vectors, self.queries, k=10), 0.95)
+
+    def test_binary_recall_grows_with_shortlist(self):
+        index = build_index(self.vectors, choose_params("binary", len(self.vectors), 384))
+        recalls = []
+        for shortlist in (20, 400, len(self.vectors)):
+            index.shortlist = shortlist
+            recalls.append(recall_at_k(index, self.vectors, self.queries, k=10))
+        self.assertLess(recalls[0], recalls[1])
+        # re-scoring everything is exact search
+        self.assertEqual(recalls[2], 1.0)
+
+    def test_scores_are_exact_inner_products(self):
+        index = build_index(self.vectors, choose_params("binary", len(self.vectors), 384))
+        D, I = index.search(self.queries[:3], 5)
+        np.testing.assert_allclose(D, np.einsum("qd,qkd->qk", self.queries[:3], self.vectors[I]), rtol=1e-5)
+        self.assertTrue(np.all(np.diff(D, axis=1) <= 0))
+
+    def test_round_trip_with_ids_and_updates(self):
+        ids = np.arange(len(self.vectors), dtype="int64") * 3 + 7
+        params = choose_params("sq8", len(self.vectors), 384)
+        index = build_index(self.vectors, params, ids=ids)
+        index.remove_ids(ids[:100])
+        index.add_with_ids(self.vectors[:10], np.arange(10, dtype="int64") + 100000)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "faiss_index.idx")
+            write_index(index, path)
+            save_params(path, params)
+            loaded = read_index(path, mmap=True)
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            self.assertEqual(loaded.ntotal, len(self.vectors) - 100 + 10)
+            self.assertLess(os.path.getsize(path), os.path.getsize(vectors_path(path)) / 3)
+
+            _, I = loaded.search(self.vectors[:10], 1)
+            self.assertEqual(list(I[:, 0]), list(range(100000, 100010)))
+            _, I = loaded.search(self.vectors[100:110], 1)
+            self.assertEqual(list(I[:, 0]), list(ids[100:110]))
+
+    def test_fewer_vectors_than_k_pads_like_faiss(self):
+        index = build_index(self.vectors[:3], {"index_type": "binary", "shortlist": 100})
+        D, I = index.search(self.queries[:1], 5)
+        self.assertEqual(list(I[0, 3:]), [-1, -1])
+        self.assertEqual(sorted(I[0, :3]), [0, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,29 +1,82 @@
 # evaluation/test_retriever.py
 
+import os
+import gc
+import shutil
+import tempfile
 import unittest
-from baseline.retriever.retriever import Retriever
-from specialization.specialization import load_and_chunk_environmental_data
+import numpy as np
 
+try:
+    import sentence_transformers  # noqa: F401
+    HAS_EMBEDDER = True
+except ImportError:
+    HAS_EMBEDDER = False
+
+INDEX_PATH   = "models/faiss_index.idx"
+RECORDS_PATH = "models/chunk_store"
+
+@unittest.skipUnless(HAS_EMBEDDER and os.path.exists(INDEX_PATH), "needs sentence_transformers and a built index")
 class TestRetriever(unittest.TestCase):
-    def setUp(self):
-        # Initialize Retriever with a stricter similarity threshold
-        self.retriever = Retriever(similarity_threshold=0.5)
-        # Add a simple baseline chunk
-        baseline_chunks = ["This is a sample baseline chunk about environment and ecosystems."]
-        self.retriever.add_documents(baseline_chunks)
-        # Load and add all environmental PDF chunks
-        env_chunks = load_and_chunk_environmental_data("specialization/data")
-        self.retriever.add_documents(env_chunks)
+    @classmethod
+    def setUpClass(cls):
+        from baseline.retriever.retriever import Retriever
+        # stricter similarity threshold than the pipeline default
+        cls.retriever = Retriever(INDEX_PATH, RECORDS_PATH, threshold=0.5)
 
     def test_environmental_query_returns_something(self):
         """
         For an environmental query, ensure we get at least one retrieved chunk.
         """
-        results = self.retriever.query("climate change", top_k=30, final_k=5)
+        results = self.retriever.get_top_k("climate change", k=5)
         self.assertTrue(
             len(results) > 0,
             "Retriever returned no chunks for an environmental query."
         )
+        for record, score in results:
+            self.assertIn("text", record)
+            self.assertGreaterEqual(score, 0.5)
+
+    def test_batch_matches_single_queries(self):
+        queries = ["climate change", "ocean acidification"]
+        batch = self.retriever.get_top_k_batch(queries, k=5)
+        for q, hits in zip(queries, batch):
+            single = self.retriever.get_top_k(q, k=5)
+            self.assertEqual([r["chunk_id"] for r, _ in hits], [r["chunk_id"] for r, _ in single])
+
+class TestReloadedRetriever(unittest.TestCase):
+    def setUp(self):
+        from baseline.retriever.index_factory import choose_params, build_index, write_index
+        self.dir = tempfile.mkdtemp()
+        self.index_path   = os.path.join(self.dir, "faiss_index.idx")
+        self.records_path = os.path.join(self.dir, "chunk_store")
+        vectors = np.eye(4, dtype="float32")
+        write_index(build_index(vectors, choose_params("flat", 4, 4)), self.index_path)
+        self.write_records(4)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_records(self, n):
+        from baseline.retriever.chunk_store import write_chunk_store
+        write_chunk_store(((i, {"doc_id": "a.pdf", "text": f"chunk {i}"}) for i in range(n)), self.records_path)
+
+    def test_replaced_retriever_is_closed_once_released(self):
+        from baseline.pipeline import RAGPipeline
+        pipeline = RAGPipeline(self.index_path, self.records_path, answer_cache_size=0)
+        old, _ = pipeline._acquire()
+        store = old.records
+        self.write_records(3)
+        new, _ = pipeline._acquire()
+        self.assertIsNot(new, old)
+        # still in use by whoever acquired it
+        self.assertFalse(store._file.closed)
+        del old
+        gc.collect()
+        self.assertTrue(store._file.closed)
+        self.assertFalse(new.records._file.closed)
+        new.close()
+        self.assertTrue(new.records._file.closed)
 
 if __name__ == '__main__':
     unittest.main()
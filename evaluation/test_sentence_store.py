@@ -0,0 +1,83 @@
+# evaluation/test_sentence_store.py
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from baseline.retriever.sentence_store import (
+    split_sentences,
+    write_sentence_store,
+    SentenceStore,
+    compress_hits
+)
+
+def unit(v):
+    v = np.asarray(v, dtype="float32")
+    return v / np.linalg.norm(v)
+
+class TestSentenceStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = self.dir + "/sentences"
+        self.texts = {
+            7: "Sea ice is thinning fast. Arctic summers may be ice free by 2050. Coral reefs bleach in warm water.",
+            3: "Glaciers in the Alps retreat every year. Tourism depends on snow cover in winter."
+        }
+        # dimension 0 = ice, 1 = reefs, 2 = alps
+        self.vecs = {
+            7: np.stack([unit([1, 0, 0.1]), unit([0.9, 0, 0.3]), unit([0, 1, 0])]),
+            3: np.stack([unit([0.2, 0, 1]), unit([0, 0.1, 1])])
+        }
+        chunks = [(fid, split_sentences(t), self.vecs[fid], [6, 9, 7] if fid == 7 else [8, 9])
+                  for fid, t in self.texts.items()]
+        write_sentence_store(chunks, self.path, "test-model")
+        self.store = SentenceStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_split_sentences(self):
+        spans = split_sentences(self.texts[7])
+        self.assertEqual([self.texts[7][a:b] for a, b in spans],
+                         ["Sea ice is thinning fast.", "Arctic summers may be ice free by 2050.",
+                          "Coral reefs bleach in warm water."])
+        # a short fragment (a window edge) is merged into its neighbour
+        self.assertEqual(len(split_sentences("and more. Glaciers retreat in the Alps every year.")), 1)
+
+    def test_roundtrip(self):
+        self.assertEqual(self.store.model, "test-model")
+        spans, n_tokens, vecs = self.store.get(7)
+        self.assertEqual(len(spans), 3)
+        self.assertEqual(list(n_tokens), [6, 9, 7])
+        np.testing.assert_allclose(vecs, self.vecs[7], atol=1e-3)
+        self.assertIsNone(self.store.get(5))
+
+    def test_compress_picks_similar_sentences_within_budget(self):
+        hits = [({"faiss_id": 3, "text": self.texts[3]}, 0.6),
+                ({"faiss_id": 7, "text": self.texts[7]}, 0.5)]
+        candidates, contexts = compress_hits(self.store, unit([1, 0, 0]), hits, budget=25, min_similarity=0.5)
+        # both ice sentences fit (6+1+4 + 9+1); reefs and alps are not similar enough
+        self.assertEqual([c[0]["faiss_id"] for c in candidates], [7])
+        self.assertEqual(contexts, ["Sea ice is thinning fast. Arctic summers may be ice free by 2050."])
+
+        _, contexts = compress_hits(self.store, unit([1, 0, 0]), hits, budget=12, min_similarity=0.5)
+        self.assertEqual(contexts, ["Sea ice is thinning fast."])
+
+    def test_compress_keeps_retrieval_order(self):
+        hits = [({"faiss_id": 3, "text": self.texts[3]}, 0.6),
+                ({"faiss_id": 7, "text": self.texts[7]}, 0.5)]
+        candidates, contexts = compress_hits(self.store, unit([1, 0, 1]), hits, budget=100, min_similarity=0.5)
+        self.assertEqual([c[0]["faiss_id"] for c in candidates], [3, 7])
+        self.assertTrue(contexts[0].startswith("Glaciers"))
+        self.assertIsNone(compress_hits(self.store, unit([1, 0, 0]), [({"text": "x"}, 1.0)], budget=100))
+
+    def test_hits_missing_from_the_store_are_kept_whole(self):
+        new = {"faiss_id": 99, "text": "Permafrost thaw releases methane.", "n_tokens": 10}
+        hits = [(new, 0.9), ({"faiss_id": 7, "text": self.texts[7]}, 0.5)]
+        candidates, contexts = compress_hits(self.store, unit([1, 0, 0]), hits, budget=30, min_similarity=0.5)
+        self.assertEqual([c[0]["faiss_id"] for c in candidates], [99, 7])
+        # 10+4 for the whole chunk leaves room for the best ice sentence only (6+1+4)
+        self.assertEqual(contexts, ["Permafrost thaw releases methane.", "Sea ice is thinning fast."])
+
+if __name__ == '__main__':
+    unittest.main()
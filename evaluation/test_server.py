@@ -0,0 +1,151 @@
+# evaluation/test_server.py
+
+import json
+import asyncio
+import unittest
+from baseline.server import QueryBatcher, QueryServer
+
+class FakePipeline:
+    """
+    Records the batches it is asked to retrieve; answers are the upper-cased questions.
+    """
+    def __init__(self, delays=None):
+        self.batches = []
+        self.delays  = delays or {}
+
+    async def answer_each_async(self, questions, threshold=0.2, doc_ids=None, sections=None):
+        self.batches.append((list(questions), threshold))
+        if "boom" in questions:
+            raise RuntimeError("search failed")
+
+        async def answer(q):
+            await asyncio.sleep(self.delays.get(q, 0))
+            return q.upper()
+        return [asyncio.ensure_future(answer(q)) for q in questions]
+
+async def http(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(data)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload.decode()
+
+class TestQueryBatcher(unittest.TestCase):
+    def test_concurrent_questions_share_a_batch(self):
+        async def run():
+            pipeline = FakePipeline()
+            batcher  = QueryBatcher(pipeline, max_batch=8, max_wait_ms=50)
+            answers  = await asyncio.gather(*(batcher.submit(f"q{i}") for i in range(5)))
+            await batcher.stop()
+            return pipeline, answers
+        pipeline, answers = asyncio.run(run())
+        self.assertEqual(answers, [f"Q{i}" for i in range(5)])
+        self.assertEqual(pipeline.batches, [([f"q{i}" for i in range(5)], 0.2)])
+
+    def test_max_batch_and_thresholds_split_batches(self):
+        async def run():
+            pipeline = FakePipeline()
+            batcher  = QueryBatcher(pipeline, max_batch=3, max_wait_ms=50)
+            subs = [batcher.submit(f"q{i}") for i in range(4)] + [batcher.submit("strict", threshold=0.5)]
+            await asyncio.gather(*subs)
+            await batcher.stop()
+            return pipeline
+        pipeline = asyncio.run(run())
+        self.assertEqual(sorted(len(q) for q, _ in pipeline.batches), [1, 1, 3])
+        self.assertIn((["strict"], 0.5), pipeline.batches)
+
+    def test_fast_answers_do_not_wait_for_slow_ones(self):
+        async def run():
+            batcher = QueryBatcher(FakePipeline({"slow": 0.3}), max_batch=8, max_wait_ms=20)
+            slow = asyncio.ensure_future(batcher.submit("slow"))
+            fast = asyncio.ensure_future(batcher.submit("fast"))
+            await fast
+            done = slow.done()
+            await slow
+            await batcher.stop()
+            return done
+        self.assertFalse(asyncio.run(run()))
+
+    def test_errors_reach_every_caller(self):
+        async def run():
+            batcher = QueryBatcher(FakePipeline(), max_batch=8, max_wait_ms=20)
+            results = await asyncio.gather(batcher.submit("boom"), batcher.submit("ok"), return_exceptions=True)
+            await batcher.stop()
+            return results
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    def test_stop_cancels_dispatches_in_flight(self):
+        async def run():
+            batcher = QueryBatcher(FakePipeline({"slow": 30}), max_batch=8, max_wait_ms=5)
+            slow = asyncio.ensure_future(batcher.submit("slow"))
+            while not batcher._dispatches:
+                await asyncio.sleep(0.01)
+            held = len(batcher._dispatches)
+            await batcher.stop()
+            with self.assertRaises(asyncio.CancelledError):
+                await slow
+            return held, len(batcher._dispatches)
+        self.assertEqual(asyncio.run(run()), (1, 0))
+
+class TestQueryServer(unittest.TestCase):
+    def test_http_endpoints(self):
+        async def run():
+            server = await QueryServer(QueryBatcher(FakePipeline(), max_wait_ms=5), port=0).start()
+            try:
+                return await asyncio.gather(
+                    http(server.port, "POST", "/query", {"question": "sea ice"}),
+                    http(server.port, "POST", "/query", {"questions": ["a", "b"]}),
+                    http(server.port, "POST", "/query", {"nope": 1}),
+                    http(server.port, "POST", "/query", {"question": "q", "threshold": "high"}),
+                    http(server.port, "GET", "/query"),
+                    http(server.port, "GET", "/health"),
+                    http(server.port, "GET", "/missing")
+                )
+            finally:
+                await server.close()
+        single, many, bad, threshold, get, health, missing = asyncio.run(run())
+        self.assertEqual(single, (200, json.dumps({"answer": "SEA ICE"})))
+        self.assertEqual(many, (200, json.dumps({"answers": ["A", "B"]})))
+        self.assertEqual(bad[0], 400)
+        self.assertEqual(threshold[0], 400)
+        self.assertEqual(get[0], 405)
+        self.assertEqual(health[0], 200)
+        self.assertEqual(missing[0], 404)
+
+    def test_threshold_must_be_a_finite_number(self):
+        bad = ["high", True, False, None, float("nan"), float("inf"), "-Infinity"]
+        async def run():
+            server = await QueryServer(QueryBatcher(FakePipeline(), max_wait_ms=5), port=0).start()
+            try:
+                return await asyncio.gather(
+                    *(http(server.port, "POST", "/query", {"question": "q", "threshold": t}) for t in bad),
+                    http(server.port, "POST", "/query", {"question": "q", "threshold": 0})
+                )
+            finally:
+                await server.close()
+        *rejected, ok = asyncio.run(run())
+        self.assertEqual([r[0] for r in rejected], [400] * len(bad))
+        self.assertEqual(rejected[0][1], json.dumps({"error": "\"threshold\" must be a number"}))
+        self.assertEqual(ok[0], 200)
+
+    def test_malformed_content_length_is_a_bad_request(self):
+        async def run():
+            server = await QueryServer(QueryBatcher(FakePipeline()), port=0).start()
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(b"POST /query HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+                await writer.drain()
+                raw = await reader.read()
+                writer.close()
+                return int(raw.split()[1])
+            finally:
+                await server.close()
+        self.assertEqual(asyncio.run(run()), 400)
+
+if __name__ == '__main__':
+    unittest.main()
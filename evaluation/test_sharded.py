@@ -0,0 +1,96 @@
+# evaluation/test_sharded.py
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import faiss
+from baseline.retriever.index_factory import choose_params, build_index, write_index, save_params
+from baseline.retriever.chunk_store import write_chunk_store
+from baseline.retriever.sharded import (
+    INDEX_NAME,
+    RECORDS_NAME,
+    ShardedIndex,
+    assign_shard,
+    merge_topk,
+    shard_name,
+    write_shard_manifest
+)
+
+class TestSharded(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(300, 16)).astype("float32")
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.records = [{"doc_id": f"doc{i % 7}.pdf", "section": "s", "chunk_id": i, "text": f"chunk {i}"}
+                        for i in range(300)]
+        part_of = [assign_shard(r, str(i), 3, "doc") for i, r in enumerate(self.records)]
+        entries = []
+        for p in range(3):
+            rows = np.array([i for i in range(300) if part_of[i] == p], dtype="int64")
+            shard_dir = os.path.join(self.dir, shard_name(p))
+            os.makedirs(shard_dir)
+            params = choose_params("flat", len(rows), 16)
+            index = build_index(self.vectors[rows], params, ids=rows)
+            write_index(index, os.path.join(shard_dir, INDEX_NAME))
+            save_params(os.path.join(shard_dir, INDEX_NAME), params)
+            write_chunk_store(((int(i), self.records[i]) for i in rows), os.path.join(shard_dir, RECORDS_NAME))
+            entries.append({"name": shard_name(p), "count": len(rows), "index_type": "flat"})
+        write_shard_manifest(self.dir, entries, "doc")
+        self.part_of = part_of
+        self.queries = rng.normal(size=(20, 16)).astype("float32")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_assign_shard_keeps_documents_together(self):
+        for doc in {r["doc_id"] for r in self.records}:
+            self.assertEqual(len({p for r, p in zip(self.records, self.part_of) if r["doc_id"] == doc}), 1)
+
+    def test_merge_topk(self):
+        a = (np.array([[0.9, 0.5]]), np.array([[1, 2]]))
+        b = (np.array([[0.7, -3.4e38]]), np.array([[3, -1]]))
+        D, I = merge_topk([a, b], 3)
+        self.assertEqual(I.tolist(), [[1, 3, 2]])
+        D, I = merge_topk([a, b], 5)
+        self.assertEqual(I.tolist(), [[1, 3, 2, -1, -1]])
+
+    def test_matches_single_index(self):
+        exact = faiss.IndexFlatIP(16)
+        exact.add(self.vectors)
+        D0, I0 = exact.search(self.queries, 10)
+        sharded = ShardedIndex(self.dir)
+        D, I = sharded.search(self.queries, 10)
+        np.testing.assert_array_equal(I, I0)
+        np.testing.assert_allclose(D, D0, rtol=1e-5)
+        self.assertEqual(sharded.records[int(I[0, 0])]["chunk_id"], int(I[0, 0]))
+        sharded.close()
+
+    def test_filtered_search_spans_shards(self):
+        allowed = np.array([i for i, r in enumerate(self.records) if r["doc_id"] in ("doc1.pdf", "doc4.pdf")])
+        sharded = ShardedIndex(self.dir)
+        np.testing.assert_array_equal(sharded.records.ids_where("doc_id", ["doc1.pdf", "doc4.pdf"]), allowed)
+        _, I = sharded.search_filtered(self.queries, 10, allowed)
+        exact = np.argsort(-(self.queries @ self.vectors[allowed].T), axis=1, kind="stable")[:, :10]
+        np.testing.assert_array_equal(I, allowed[exact])
+        sharded.close()
+
+    def test_load_and_unload(self):
+        sharded = ShardedIndex(self.dir, only=[shard_name(0)])
+        self.assertEqual(list(sharded.shards), [shard_name(0)])
+        _, I = sharded.search(self.queries, 5)
+        self.assertTrue(all(self.part_of[i] == 0 for i in I.ravel() if i >= 0))
+
+        sharded.load_shard(shard_name(2))
+        sharded.unload_shard(shard_name(0))
+        _, I = sharded.search(self.queries, 5)
+        self.assertTrue(all(self.part_of[i] == 2 for i in I.ravel() if i >= 0))
+        self.assertEqual(len(sharded.records), self.part_of.count(2))
+        with self.assertRaises(KeyError):
+            sharded.load_shard("shard_999")
+        sharded.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# evaluation/test_streaming_chunks.py
+
+import random
+import unittest
+from specialization.specialization import (
+    chunk_by_headings,
+    normalize_whitespace,
+    iter_paragraphs,
+    iter_chunks,
+    iter_chunk_records,
+    iter_windows,
+    sliding_window_chunk,
+    chunk_records,
+    MAX_HEADING_CHARS
+)
+
+PIECES = ["12", "1.2", "INTRO", "CLIMATE RISK", "2019 was hot", "Sea", "level", "rise",
+          " ", "  ", "\t", "\n", "\n \n", "\x0c", "\r"]
+
+class TestStreamingChunks(unittest.TestCase):
+    def assertSameAsBatch(self, pages, win, stride):
+        expected = chunk_by_headings(normalize_whitespace("\n".join(pages)), win, stride)
+        self.assertEqual(list(iter_chunks(iter_paragraphs(pages), win, stride)), expected)
+        # line by line, as build_corpus streams them
+        records = iter_chunk_records(pages, "doc.pdf", win, stride)
+        self.assertEqual([{"section": r["section"], "text": r["text"]} for r in records], expected)
+
+    def test_headings_and_sections(self):
+        pages = ["1 INTRODUCTION\nsome text here\n\nmore text", "\n\n2.1\n\nMethods used\nand more"]
+        self.assertSameAsBatch(pages, win=3, stride=2)
+
+    def test_no_headings_falls_back_to_full_document(self):
+        pages = ["lower case words only\nacross lines", "\n\nand pages too"]
+        self.assertSameAsBatch(pages, win=4, stride=2)
+
+    def test_paragraphs_match_normalize_whitespace(self):
+        pages = ["  lead\n  in  \n\n  para two \t\n", "\n\nthree"]
+        self.assertEqual("\n\n".join(iter_paragraphs(pages)), normalize_whitespace("\n".join(pages)))
+
+    def test_windows_match_sliding_window_chunk(self):
+        words = [str(i) for i in range(23)]
+        for win, stride in [(5, 2), (4, 4), (3, 5), (30, 10)]:
+            self.assertEqual(list(iter_windows(iter(words), win, stride)),
+                             sliding_window_chunk(words, win, stride))
+
+    def test_random_documents(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            pages = ["".join(rng.choice(PIECES) + rng.choice(["", " "]) for _ in range(rng.randint(0, 30)))
+                     for _ in range(rng.randint(0, 3))]
+            self.assertSameAsBatch(pages, win=rng.randint(1, 6), stride=rng.randint(1, 6))
+        # long enough for paragraphs and would-be titles past MAX_HEADING_CHARS
+        for _ in range(300):
+            pages = ["".join(rng.choice(PIECES) + rng.choice(["", " "]) for _ in range(rng.randint(0, 300)))
+                     for _ in range(rng.randint(0, 3))]
+            self.assertSameAsBatch(pages, win=rng.randint(1, 60), stride=rng.randint(1, 60))
+
+    def test_long_heading_like_lines_are_body_text(self):
+        # numbered or capitalised lines past MAX_HEADING_CHARS are body text in
+        # both chunkers; one at the limit is still a heading
+        numbered = "2 " + "degrees of warming " * 14
+        capitals = "SEA LEVEL RISE " * 17
+        at_limit = "3 " + "x" * (MAX_HEADING_CHARS - 2)
+        pages = ["1 INTRODUCTION\n\nsome text here", f"\n\n{numbered}\n\n{capitals}\n\n{at_limit}\n\nmore text"]
+        self.assertGreater(min(len(numbered.strip()), len(capitals.strip())), MAX_HEADING_CHARS)
+        self.assertSameAsBatch(pages, win=100, stride=50)
+        chunks = chunk_by_headings(normalize_whitespace("\n".join(pages)), 100, 50)
+        self.assertEqual([c["section"] for c in chunks], ["1 INTRODUCTION"] * 4 + [at_limit] * 2)
+        self.assertEqual([c["text"] for c in chunks[2:4]], [numbered.strip(), capitals.strip()])
+
+    def test_pdfplumber_pages_without_blank_lines(self):
+        # pdfplumber output: one line per text line, no blank lines, so a whole
+        # document is a single paragraph that must not be held in memory
+        def pages(read, n=200):
+            yield "1 INTRODUCTION\n\n"
+            for i in range(n):
+                read.append(i)
+                yield "\n".join(f"Line {j} of page {i} on sea ice and glaciers." for j in range(40))
+
+        read = []
+        records = iter_chunk_records(pages(read), "doc.pdf")
+        head = [next(records), next(records)]
+        self.assertEqual([r["section"] for r in head], ["1 INTRODUCTION"] * 2)
+        self.assertEqual(len(head[1]["text"].split()), 100)
+        self.assertLess(len(read), 3)
+        self.assertEqual(head + list(records), chunk_records("\n".join(pages([])), "doc.pdf"))
+
+        # a numbered first line does not turn the whole document into a title
+        raw = "\n".join(f"{i} degrees of warming by the year {2000 + i}" for i in range(1, 500))
+        chunks = chunk_records(raw, "doc.pdf")
+        self.assertEqual({c["section"] for c in chunks}, {"FULL_DOCUMENT"})
+        self.assertEqual(list(iter_chunk_records(raw.split("\n"), "doc.pdf")), chunks)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Start-up benchmark: import time of the pipeline and its heavy dependencies,
+and time-to-first-answer of a fresh process, with and without an mmap'd index.
+Every measurement runs in a new interpreter so nothing is already imported.
+
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --no-generate      # stop after retrieval (no API key needed)
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SCRIPT_DIR   = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
+
+MODULES = [
+    "baseline.pipeline",
+    "faiss",
+    "sentence_transformers",
+    "cerebras.cloud.sdk",
+    "transformers",
+]
+
+# Runs inside the child interpreter; prints one JSON line of stage timings
+FIRST_ANSWER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from baseline.pipeline import get_pipeline
+t_import = time.perf_counter()
+pipeline = get_pipeline(mmap={mmap})
+retriever = pipeline.retriever
+t_load = time.perf_counter()
+retriever.get_top_k({question!r}, k=10)
+t_retrieve = time.perf_counter()
+if {generate}:
+    pipeline.answer({question!r})
+t_answer = time.perf_counter()
+print(json.dumps({{
+    "import":   t_import - t0,
+    "load":     t_load - t_import,
+    "retrieve": t_retrieve - t_load,
+    "generate": t_answer - t_retrieve,
+    "total":    t_answer - t0
+}}))
+"""
+
+def run_child(code: str, env: dict) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "child failed")
+    return out.stdout.strip().splitlines()[-1]
+
+def import_time(module: str, env: dict) -> float:
+    code = f"import time; t=time.perf_counter(); import {module}; print(time.perf_counter()-t)"
+    return float(run_child(code, env))
+
+def main(runs: int, question: str, generate: bool, warm_cache: bool):
+    env = dict(os.environ)
+    if not warm_cache:
+        # measure a cold query-embedding cache (the embedder must load)
+        env["EMBED_CACHE_PATH"] = ""
+
+    print(f"[+] Import time (median of {runs} fresh interpreters)")
+    for module in MODULES:
+        try:
+            times = [import_time(module, env) for _ in range(runs)]
+            print(f"    {module:<24} {statistics.median(times) * 1000:8.1f} ms")
+        except RuntimeError as e:
+            print(f"    {module:<24} {'n/a':>8}    ({e})")
+
+    print(f"[+] Time to first {'answer' if generate else 'retrieval'} (median of {runs} runs)")
+    for mmap in (False, True):
+        code = FIRST_ANSWER.format(mmap=mmap, question=question, generate=generate)
+        try:
+            rows = [json.loads(run_child(code, env)) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"    mmap={mmap!s:<5}  failed: {e}")
+            continue
+        stages = "  ".join(
+            f"{k}={statistics.median(r[k] for r in rows) * 1000:.0f}ms" for k in rows[0]
+        )
+        print(f"    mmap={mmap!s:<5}  {stages}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure pipeline start-up latency.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement")
+    parser.add_argument("-q", "--question", default="How much ice did Greenland lose annually?")
+    parser.add_argument("--no-generate", action="store_true", help="Stop after retrieval (no Cerebras call)")
+    parser.add_argument("--warm-cache", action="store_true", help="Use the persistent query-embedding cache")
+    args = parser.parse_args()
+    main(args.runs, args.question, not args.no_generate, args.warm_cache)
@@ -11,65 +11,284 @@ sys.path.insert(0, PROJECT_ROOT)
 import os
 import sys
 import json
+import time
+import queue
+import shutil
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from specialization.specialization import (
-    load_and_chunk_pdf,
-    normalize_whitespace,
-    chunk_by_headings
+    count_pdf_pages,
+    extract_page_range,
+    iter_chunk_records,
+    iter_pdf_pages,
+    page_ranges,
+    strip_boilerplate
 )
+from specialization.dedup import NearDuplicateFilter
 
 
-def load_and_chunk_txt(txt_path: str, win: int = 100, stride: int = 50):
+def iter_txt_lines(txt_path: str):
     """
-    Load a plain-text file, normalize and chunk via the same logic
-    as PDFs.
+    Lines of a text file without their newline; "\n".join() gives the file text.
     """
     with open(txt_path, "r", encoding="utf-8") as f:
-        raw = f.read()
-    norm = normalize_whitespace(raw)
-    chunks = chunk_by_headings(norm, win, stride)
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
 
-    records = []
-    doc_id = os.path.basename(txt_path)
-    for idx, c in enumerate(chunks):
-        records.append({
-            "doc_id":   doc_id,
-            "section":  c["section"],
-            "chunk_id": idx,
-            "text":     c["text"]
-        })
-    return records
 
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-def main(input_dir: str, output_path: str):
-    all_records = []
 
+class PageTasks:
+    """
+    Page-range extraction of several PDFs in a process pool, keeping at most
+    `window` tasks in flight and handing results back in submission order.
+    """
+    def __init__(self, pool, paths: list, pages_per_task: int, window: int):
+        self._pool     = pool
+        self._window   = window
+        self._tasks    = self._iter_tasks(paths, pages_per_task)
+        self._inflight = deque()
+        self._fill()
+
+    @staticmethod
+    def _iter_tasks(paths, pages_per_task):
+        for path in paths:
+            ranges = page_ranges(count_pdf_pages(path), pages_per_task) or [(0, 0)]
+            for i, (start, stop) in enumerate(ranges):
+                yield path, start, stop, i == len(ranges) - 1
+
+    def _fill(self):
+        while len(self._inflight) < self._window:
+            task = next(self._tasks, None)
+            if task is None:
+                break
+            path, start, stop, last = task
+            self._inflight.append((last, self._pool.submit(extract_page_range, path, start, stop)))
+
+    def pages(self, stats: dict):
+        """
+        Yields the page texts of the next PDF in order, adding to stats["pages"/"parse"].
+        """
+        while True:
+            last, fut = self._inflight.popleft()
+            self._fill()
+            texts, secs = fut.result()
+            stats["pages"] += len(texts)
+            stats["parse"] += secs
+            yield from texts
+            if last:
+                return
+
+
+def counted(pages, stats: dict):
+    for page in pages:
+        stats["pages"] += 1
+        yield page
+
+
+def tapped(pages, fname: str, stats: dict):
+    """
+    Passes `pages` through while a thread chunks them as they are, so
+    stats["unstripped"] ends up as the chunk count without boilerplate
+    stripping; the queue keeps only a few pages in memory.
+    """
+    pages_q = queue.Queue(maxsize=8)
+
+    def count():
+        stats["unstripped"] = sum(1 for _ in iter_chunk_records(iter(pages_q.get, None), fname))
+
+    worker = threading.Thread(target=count, daemon=True)
+    worker.start()
+    try:
+        for page in pages:
+            pages_q.put(page)
+            yield page
+    finally:
+        pages_q.put(None)
+        worker.join()
+
+
+def main(
+    input_dir: str,
+    output_path: str,
+    full: bool = False,
+    workers: int = 1,
+    pages_per_task: int = 16,
+    dedup: bool = False,
+    dedup_threshold: float = 0.8
+):
+    """
+    Builds the chunk corpus, streaming page → paragraph → chunk → JSONL line
+    so memory stays bounded whatever the document size.
+    A manifest next to the output records a content hash per source file and
+    per chunk; files whose hash is unchanged reuse their cached chunks instead
+    of being extracted again.
+    With workers > 1, PDFs are parsed in a process pool in page ranges of
+    `pages_per_task`; output order is the same as a sequential build.
+    With dedup, running headers/footers are stripped from PDF pages and
+    chunks that nearly duplicate an earlier chunk (MinHash Jaccard >=
+    `dedup_threshold`) are left out of the corpus; each dropped chunk is
+    listed with the chunk it duplicates in <output>.provenance.jsonl.
+    """
+    out_dir         = os.path.dirname(output_path)
+    cache_dir       = os.path.join(out_dir, ".cache")
+    manifest_path   = os.path.splitext(output_path)[0] + ".manifest.json"
+    provenance_path = os.path.splitext(output_path)[0] + ".provenance.jsonl"
+    options         = {"strip_boilerplate": dedup}
+
+    manifest = {}
+    if not full and os.path.isfile(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    # cached chunks are only valid for the extraction options they were built with
+    old_files = manifest.get("files", {}) if manifest.get("options", {}) == options else {}
+
+    # 1) Hash every source file and decide what needs extracting
+    sources = []
     for fname in sorted(os.listdir(input_dir)):
         path = os.path.join(input_dir, fname)
-        if not os.path.isfile(path):
-            continue
-        lower = fname.lower()
-        if lower.endswith(".pdf"):
-            recs = load_and_chunk_pdf(path)
-        elif lower.endswith(".txt"):
-            recs = load_and_chunk_txt(path)
-        else:
+        if not os.path.isfile(path) or not fname.lower().endswith((".pdf", ".txt")):
             # skip other file types
             continue
+        digest = file_sha256(path)
+        # records carry doc_id, so the cache is per file name and content
+        cache_name = hashlib.sha1(fname.encode("utf-8")).hexdigest()[:12] + "-" + digest[:32] + ".jsonl"
+        cache_path = os.path.join(cache_dir, cache_name)
+        entry = old_files.get(fname)
+        fresh = bool(entry and entry["sha256"] == digest and os.path.isfile(cache_path))
+        sources.append((fname, path, digest, cache_path, fresh))
 
-        print(f"[+] {fname}: {len(recs)} chunks")
-        all_records.extend(recs)
+    # 2) Queue page-range extraction of changed PDFs across the pool
+    pool, tasks = None, None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        changed_pdfs = [path for fname, path, _, _, fresh in sources
+                        if not fresh and fname.lower().endswith(".pdf")]
+        tasks = PageTasks(pool, changed_pdfs, pages_per_task, window=2 * workers)
 
-    # ensure output directory exists
+    # 3) Stream changed files into their per-file chunk cache, in file order
+    new_files = {}
+    reused = 0
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        for fname, path, digest, cache_path, fresh in sources:
+            if fresh:
+                hashes = old_files[fname]["chunks"]
+                reused += 1
+                print(f"[=] {fname}: {len(hashes)} chunks (unchanged)")
+            else:
+                t0 = time.perf_counter()
+                stats = {"pages": 0, "parse": 0.0, "boilerplate": 0}
+                if not fname.lower().endswith(".pdf"):
+                    pages, timing = iter_txt_lines(path), None
+                elif tasks is not None:
+                    pages, timing = tasks.pages(stats), "pool"
+                else:
+                    pages, timing = counted(iter_pdf_pages(path), stats), "seq"
+                if dedup and timing is not None:
+                    pages = strip_boilerplate(tapped(pages, fname, stats), stats=stats)
+
+                hashes = []
+                tmp = cache_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for r in iter_chunk_records(pages, fname):
+                        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                        hashes.append(hashlib.sha1(r["text"].encode("utf-8")).hexdigest())
+                os.replace(tmp, cache_path)
+
+                wall = time.perf_counter() - t0
+                if timing == "pool":
+                    detail = f"{stats['pages']} pages, parse {stats['parse']:.2f}s, {wall:.2f}s wall"
+                elif timing == "seq":
+                    detail = f"{stats['pages']} pages, {wall:.2f}s"
+                else:
+                    detail = f"text, {wall:.2f}s"
+                stripped = stats.get("unstripped", len(hashes)) - len(hashes)
+                if stats["boilerplate"]:
+                    detail += f", {stats['boilerplate']} header/footer lines stripped, {stripped} chunks fewer"
+                print(f"[+] {fname}: {len(hashes)} chunks ({detail})")
+
+            new_files[fname] = {
+                "sha256":   digest,
+                "cache":    os.path.basename(cache_path),
+                "chunks":   hashes,
+                # chunks that boilerplate stripping removed from this file
+                "stripped": old_files[fname].get("stripped", 0) if fresh else stripped
+            }
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    # drop cache entries of files that were removed or changed
+    live = {e["cache"] for e in new_files.values()}
+    for name in os.listdir(cache_dir):
+        if name not in live:
+            os.remove(os.path.join(cache_dir, name))
+
+    # 4) Concatenate the per-file caches into the corpus, leaving out near-duplicates
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    total   = sum(len(e["chunks"]) for e in new_files.values())
+    dropped = 0
     with open(output_path, "w", encoding="utf-8") as out:
-        for r in all_records:
-            out.write(json.dumps(r, ensure_ascii=False) + "\n")
+        if not dedup:
+            for entry in new_files.values():
+                with open(os.path.join(cache_dir, entry["cache"]), "r", encoding="utf-8") as f:
+                    shutil.copyfileobj(f, out)
+        else:
+            near = NearDuplicateFilter(threshold=dedup_threshold)
+            with open(provenance_path, "w", encoding="utf-8") as prov:
+                for entry in new_files.values():
+                    with open(os.path.join(cache_dir, entry["cache"]), "r", encoding="utf-8") as f:
+                        for line in f:
+                            r = json.loads(line)
+                            dup = near.check((r["doc_id"], r["chunk_id"]), r["text"])
+                            if dup is None:
+                                out.write(line)
+                                continue
+                            (kept_doc, kept_chunk), sim = dup
+                            prov.write(json.dumps({
+                                "doc_id":       r["doc_id"],
+                                "chunk_id":     r["chunk_id"],
+                                "duplicate_of": {"doc_id": kept_doc, "chunk_id": kept_chunk},
+                                "similarity":   round(sim, 3)
+                            }, ensure_ascii=False) + "\n")
+                            dropped += 1
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"options": options, "files": new_files}, f, indent=1)
 
-    print(f"[✓] Wrote {len(all_records)} total chunks to {output_path}")
+    print(f"[✓] Wrote {total - dropped} total chunks to {output_path} "
+          f"({reused}/{len(new_files)} files unchanged)")
+    if dedup:
+        stripped = sum(e["stripped"] for e in new_files.values())
+        before   = total + stripped
+        share    = 100.0 * (stripped + dropped) / before if before else 0.0
+        print(f"[✓] Removed {stripped} chunks by stripping headers/footers and {dropped} near-duplicates "
+              f"({share:.1f}% fewer vectors); provenance in {provenance_path}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python build_corpus.py <input_dir> <output_jsonl>", file=sys.stderr)
-        sys.exit(1)
-    main(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(description="Extract and chunk source documents into a JSONL corpus.")
+    parser.add_argument("input_dir",    help="Directory of .pdf / .txt files")
+    parser.add_argument("output_jsonl", help="Output chunk corpus (JSONL)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-extract every file, ignoring the build manifest")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for PDF parsing (1 = sequential)")
+    parser.add_argument("--pages-per-task", type=int, default=16,
+                        help="Pages per parsing task when --workers > 1")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Strip PDF headers/footers and drop near-duplicate chunks")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="MinHash Jaccard similarity above which a chunk counts as a duplicate")
+    args = parser.parse_args()
+    main(args.input_dir, args.output_jsonl, args.full, args.workers, args.pages_per_task,
+         args.dedup, args.dedup_threshold)
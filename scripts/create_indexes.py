@@ -2,56 +2,308 @@
 import os
 import sys
 import json
-import pickle
-from sentence_transformers import SentenceTransformer
-import faiss
+import uuid
+import hashlib
+import shutil
+import argparse
+import numpy as np
 
-def main(input_jsonl: str, index_dir: str, model_name: str = "all-MiniLM-L6-v2"):
-    # 1. Load chunks
-    texts = []
-    records = []
-    with open(input_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            texts.append(rec["text"])
-            records.append(rec)
+# ───── Add project root so we can import baseline.retriever ─────
+SCRIPT_DIR   = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+# ────────────────────────────────────────────────────────────────
 
-    print(f"[+] Loaded {len(texts)} chunks from {input_jsonl}")
+from baseline.retriever.index_factory import (
+    INDEX_TYPES,
+    choose_params,
+    build_index,
+    read_index,
+    write_index,
+    save_params,
+    load_params,
+    is_legacy_ivf,
+    sample_recall
+)
+from baseline.retriever.chunk_store import ChunkStore, write_chunk_store
+from baseline.retriever.layout import (
+    SHARD_BY,
+    SHARD_MANIFEST,
+    INDEX_NAME,
+    RECORDS_NAME,
+    SENTENCES_NAME,
+    shard_name,
+    assign_shard,
+    write_shard_manifest,
+    load_manifest,
+    save_manifest
+)
+from baseline.retriever.sentence_store import split_sentences, write_sentence_store, SentenceStore
+from baseline.generator.tokens import get_counter
+from baseline.retriever.embedder import EMBED_BACKEND, load_embedder
 
-    # 2. Encode with SentenceTransformer
-    print(f"[+] Loading embedding model: {model_name}")
-    embedder = SentenceTransformer(model_name)
-    embeddings = embedder.encode(
+def chunk_keys(records: list) -> list:
+    """
+    Stable content key per record: sha1 of (doc_id, section, text), with an
+    occurrence suffix for repeats, so unchanged chunks keep their vector id.
+    """
+    seen = {}
+    keys = []
+    for rec in records:
+        raw = "\0".join([str(rec.get("doc_id")), str(rec.get("section")), rec["text"]])
+        h = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        keys.append(h if n == 0 else f"{h}#{n}")
+    return keys
+
+_EMBEDDERS = {}
+
+def encode(model_name: str, texts: list, backend: str = None):
+    backend = backend or EMBED_BACKEND
+    embedder = _EMBEDDERS.get((model_name, backend))
+    if embedder is None:
+        print(f"[+] Loading embedding model: {model_name} ({backend})")
+        embedder = _EMBEDDERS[(model_name, backend)] = load_embedder(model_name, backend)
+    return embedder.encode(
         texts,
         show_progress_bar=True,
         convert_to_numpy=True,
         normalize_embeddings=True
-    )
-    dim = embeddings.shape[1]
-    print(f"[+] Computed embeddings: shape={embeddings.shape}")
+    ).astype("float32")
 
-    # 3. Build FAISS index (cosine similarity via inner product)
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-    print(f"[+] Built FAISS index with {index.ntotal} vectors (dim={dim})")
+def build_sentences(records: list, ids: list, model_name: str, path: str, build_id: str):
+    """
+    Splits every chunk into sentences and writes their embeddings to a
+    sentence store tagged with the index's `build_id`. Chunks whose FAISS id
+    is already in an existing store of the same build and model keep their
+    vectors; only new chunks are encoded.
+    """
+    old = None
+    if os.path.isdir(path):
+        old = SentenceStore(path)
+        if old.model != model_name or old.build_id != build_id:
+            old = None
 
-    # 4. Save index and metadata
+    counter = get_counter()
+    recount = old is not None and old.tokenizer != counter.name
+    chunks, todo = [], []   # todo: (chunk position, sentence texts)
+    for rec, fid in zip(records, ids):
+        entry = old.get(fid) if old is not None else None
+        if entry is not None:
+            spans, n_tokens, vecs = entry
+            if recount:
+                n_tokens = [counter.count(rec["text"][a:b]) for a, b in spans]
+            chunks.append((fid, spans, vecs, n_tokens))
+            continue
+        spans = split_sentences(rec["text"])
+        texts = [rec["text"][a:b] for a, b in spans]
+        chunks.append((fid, spans, None, [counter.count(t) for t in texts]))
+        todo.append((len(chunks) - 1, texts))
+    print(f"[+] Sentence store: {len(todo)} chunks to encode, {len(chunks) - len(todo)} reused")
+
+    texts = [t for _, ts in todo for t in ts]
+    if texts:
+        vecs = encode(model_name, texts)
+        start = 0
+        for pos, ts in todo:
+            fid, spans, _, n_tokens = chunks[pos]
+            chunks[pos] = (fid, spans, vecs[start:start + len(ts)], n_tokens)
+            start += len(ts)
+    write_sentence_store(chunks, path, model_name, build_id, counter.name)
+    print(f"[✓] {len(texts)} new sentence embeddings saved to {path}")
+
+def build_part(embeddings, ids, index_type: str, dim: int, shortlist: int = None):
+    """
+    Builds one index (the whole corpus, or one shard) over `embeddings` with
+    parameters chosen for its size. Returns (index, params).
+    """
+    # an empty shard still gets an (exact) index, so later updates can add to it
+    params = choose_params(index_type if len(ids) else "flat", len(ids), dim)
+    if shortlist and "shortlist" in params:
+        params["shortlist"] = shortlist
+    params["trained_on"] = len(ids)
+    index = build_index(embeddings, params, ids=ids)
+    print(f"[+] Built {params['index_type']} FAISS index with {index.ntotal} vectors (dim={dim}): {params}")
+    if params["index_type"] != "flat":
+        recall = sample_recall(index, embeddings, k=10, ids=ids)
+        params["sample_recall_at_10"] = round(recall, 4)
+        print(f"[+] recall@10 vs exact search on a corpus sample: {recall:.3f}")
+    return index, params
+
+def main(
+    input_jsonl: str,
+    index_dir: str,
+    model_name: str = "all-MiniLM-L6-v2",
+    index_type: str = "flat",
+    full: bool = False,
+    shortlist: int = None,
+    sentences: bool = False,
+    shards: int = 0,
+    shard_by: str = "doc"
+):
+    # 1. Load chunks
+    records = []
+    with open(input_jsonl, "r", encoding="utf-8") as f:
+        for line in f:
+            records.append(json.loads(line))
+    keys = chunk_keys(records)
+
+    print(f"[+] Loaded {len(records)} chunks from {input_jsonl}")
+
+    # One part per shard (index + chunk store in index_dir/shard_NNN), or a
+    # single part directly in index_dir. FAISS ids are global across shards.
     os.makedirs(index_dir, exist_ok=True)
-    index_path = os.path.join(index_dir, "faiss_index.idx")
-    records_path = os.path.join(index_dir, "corpus_records.pkl")
+    part_dirs = [os.path.join(index_dir, shard_name(p)) for p in range(shards)] if shards else [index_dir]
+    for part_dir in part_dirs:
+        os.makedirs(part_dir, exist_ok=True)
+    index_paths = [os.path.join(d, INDEX_NAME) for d in part_dirs]
+    part_of = [assign_shard(r, key, shards, shard_by) if shards else 0 for r, key in zip(records, keys)]
+
+    # 2. Decide between an incremental update and a full rebuild
+    manifest = {} if full else load_manifest(index_dir)
+    incremental = (
+        manifest.get("model") == model_name
+        and manifest.get("index_type") == index_type
+        and manifest.get("shards", 0) == shards
+        and (not shards or manifest.get("shard_by") == shard_by)
+        and all(os.path.isfile(path) for path in index_paths)
+    )
+    entries = manifest.get("entries", {}) if incremental else {}
+    current = set(keys)
+    removed = [key for key in entries if key not in current]
+    if incremental and removed and index_type == "hnsw":
+        print("[!] HNSW indexes cannot delete vectors; doing a full rebuild")
+        incremental, entries, removed = False, {}, []
+    if incremental and removed and index_type in ("ivf", "ivfpq") and \
+            any(is_legacy_ivf(read_index(path)) for path in index_paths):
+        print("[!] IVF index was built with an id map that breaks on deletion; doing a full rebuild")
+        incremental, entries, removed = False, {}, []
+
+    # ids are never reused by incremental updates, so a stored id still refers
+    # to the same chunk text; a full rebuild renumbers from 0 and gets a new build id
+    build_id = (manifest.get("build_id") if incremental else None) or uuid.uuid4().hex
+    sentences_path = os.path.join(index_dir, SENTENCES_NAME)
+    if os.path.isdir(sentences_path) and SentenceStore(sentences_path).build_id != build_id:
+        # dropped before the index changes, so no reader pairs it with renumbered ids
+        shutil.rmtree(sentences_path)
+        if not sentences:
+            print(f"[!] Removed {sentences_path}: it belongs to an earlier build (rerun with --sentences)")
+
+    parts = []   # (index, params) per part
+    if incremental:
+        # 3a. Remove vectors of changed/deleted chunks, embed only new chunk texts
+        removed_ids = np.array([entries.pop(key) for key in removed], dtype="int64")
+        new_rows = [i for i, key in enumerate(keys) if key not in entries]
+        next_id = manifest["next_id"]
+        new_ids = np.arange(next_id, next_id + len(new_rows), dtype="int64")
+        vecs = encode(model_name, [records[i]["text"] for i in new_rows]) if new_rows else None
+        for i, vid in zip(new_rows, new_ids):
+            entries[keys[i]] = int(vid)
+        next_id += len(new_rows)
+
+        for p, index_path in enumerate(index_paths):
+            params = load_params(index_path)
+            index = read_index(index_path, params)
+            if len(removed_ids):
+                # ids from other shards are simply not found
+                index.remove_ids(removed_ids)
+            mine = [j for j, i in enumerate(new_rows) if part_of[i] == p]
+            if mine:
+                index.add_with_ids(vecs[mine], new_ids[mine])
+            params["ntotal"] = int(index.ntotal)
+            if params.get("index_type") in ("ivf", "ivfpq") and index.ntotal > 4 * params.get("trained_on", index.ntotal):
+                print(f"[!] {index_path} has grown well past its training set; consider a --full rebuild")
+            parts.append((index, params))
+        print(f"[+] Incremental update: +{len(new_rows)} embedded, -{len(removed)} removed, "
+              f"{len(records) - len(new_rows)} reused ({sum(int(ix.ntotal) for ix, _ in parts)} vectors)")
+    else:
+        # 3b. Encode every chunk and build the FAISS index (cosine similarity via inner product)
+        embeddings = encode(model_name, [r["text"] for r in records])
+        dim = embeddings.shape[1]
+        print(f"[+] Computed embeddings: shape={embeddings.shape}")
+
+        ids = np.arange(len(records), dtype="int64")
+        if not shards:
+            parts.append(build_part(embeddings, ids, index_type, dim, shortlist))
+        for p in range(shards):
+            rows = np.array([i for i in range(len(records)) if part_of[i] == p], dtype="int64")
+            print(f"[+] {shard_name(p)}: {len(rows)} chunks")
+            parts.append(build_part(embeddings[rows], ids[rows], index_type, dim, shortlist))
+        entries = {key: int(i) for key, i in zip(keys, ids)}
+        next_id = len(records)
+
+    # 4. Save index, metadata (FAISS id -> record) and build manifest
+    for index_path, (index, params) in zip(index_paths, parts):
+        write_index(index, index_path)
+        save_params(index_path, params)
+        print(f"[✓] FAISS index saved to {index_path}")
+
+    # prompt-token count per chunk, so context packing does not re-tokenize at
+    # query time; unchanged chunks keep the last build's count if the store
+    # opens with it (i.e. it was made with the same tokenizer)
+    counter = get_counter()
+    known = {}
+    for part_dir in (part_dirs if incremental else []):
+        records_path = os.path.join(part_dir, RECORDS_NAME)
+        if os.path.isdir(records_path):
+            store = ChunkStore(records_path)
+            if "n_tokens" in store.ints:
+                known.update(zip(store.ids.tolist(), store.ints["n_tokens"].tolist()))
+            store.close()
+    counted = 0
+    for key, rec in zip(keys, records):
+        n = known.get(entries[key])
+        if n is None:
+            n = counter.count(rec["text"].strip())
+            counted += 1
+        rec["n_tokens"] = n
+    for p, part_dir in enumerate(part_dirs):
+        records_path = os.path.join(part_dir, RECORDS_NAME)
+        write_chunk_store(((entries[key], rec) for key, rec, q in zip(keys, records, part_of) if q == p),
+                          records_path, counter.name)
+        print(f"[✓] Records saved to chunk store {records_path} "
+              f"(token counts: {counter.name}, {counted} counted, {len(records) - counted} reused)")
+
+    if shards:
+        # written after every shard, so readers never see a half-built set
+        write_shard_manifest(index_dir, [
+            {"name": shard_name(p), "count": int(index.ntotal), "index_type": params["index_type"]}
+            for p, (index, params) in enumerate(parts)
+        ], shard_by)
+        print(f"[✓] {shards} shards (by {shard_by}) listed in {os.path.join(index_dir, SHARD_MANIFEST)}")
 
-    faiss.write_index(index, index_path)
-    print(f"[✓] FAISS index saved to {index_path}")
+    if sentences:
+        build_sentences(records, [entries[key] for key in keys], model_name, sentences_path, build_id)
 
-    with open(records_path, "wb") as f:
-        pickle.dump(records, f)
-    print(f"[✓] Records metadata saved to {records_path}")
+    save_manifest(index_dir, {
+        "build_id":   build_id,
+        "model":      model_name,
+        "index_type": index_type,
+        "shards":     shards,
+        "shard_by":   shard_by,
+        "next_id":    next_id,
+        "entries":    entries
+    })
 
 if __name__ == "__main__":
-    if len(sys.argv) not in (3,4):
-        print("Usage: python create_indexes.py <input_jsonl> <output_index_dir> [<model_name>]", file=sys.stderr)
-        sys.exit(1)
-    input_jsonl = sys.argv[1]
-    index_dir = sys.argv[2]
-    model_name = sys.argv[3] if len(sys.argv) == 4 else "all-MiniLM-L6-v2"
-    main(input_jsonl, index_dir, model_name)
+    parser = argparse.ArgumentParser(description="Embed corpus chunks and build the FAISS index.")
+    parser.add_argument("input_jsonl", help="Chunk corpus (JSONL)")
+    parser.add_argument("index_dir",   help="Output directory for index and chunk store")
+    parser.add_argument("model_name",  nargs="?", default="all-MiniLM-L6-v2", help="SentenceTransformer model")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="flat = exact search; ivf / ivfpq / hnsw = approximate, parameters chosen from corpus size; "
+                             "sq8 / binary = int8 or 1-bit codes with exact re-scoring of a shortlist")
+    parser.add_argument("--shortlist", type=int, default=None,
+                        help="Candidates re-scored in full precision (sq8 / binary only)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-embed every chunk instead of updating the existing index in place")
+    parser.add_argument("--sentences", action="store_true",
+                        help="Also embed every sentence, for extractive context compression at query time")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Split the index into this many shards (index_dir/shard_NNN + shards.json)")
+    parser.add_argument("--shard-by", choices=SHARD_BY, default="doc",
+                        help="doc = all chunks of a document in one shard; hash = spread by chunk content")
+    args = parser.parse_args()
+    main(args.input_jsonl, args.index_dir, args.model_name, args.index_type, args.full, args.shortlist,
+         args.sentences, args.shards, args.shard_by)
@@ -0,0 +1,82 @@
+# specialization/dedup.py
+
+import re
+import zlib
+import numpy as np
+
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD  = re.compile(r"\w+")
+
+def shingles(text: str, n: int = 5) -> set:
+    """
+    Word n-grams of the lower-cased text (the whole text if it is shorter).
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= n:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+class MinHasher:
+    """
+    MinHash signatures: `num_perm` universal hashes (a*h + b) mod (2^31 - 1)
+    over CRC32 shingle hashes; the share of equal slots between two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b, h < 2^31 keep a*h + b below 2^63, so the product is exact in uint64
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+                        dtype=np.uint64, count=len(shingle_set)) % _PRIME
+        return ((np.outer(h, self.a) + self.b) % _PRIME).min(axis=0)
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detection with MinHash + LSH banding. The first
+    chunk of a group is kept; later chunks whose estimated Jaccard similarity
+    to a kept chunk is >= `threshold` are reported as its duplicates.
+    With 16 bands of 4 rows, pairs at 0.8 similarity become candidates with
+    probability > 0.999 and pairs at 0.3 only ~12% of the time.
+    """
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands     = bands
+        self.rows      = num_perm // bands
+        self.shingle   = shingle
+        self.hasher    = MinHasher(num_perm)
+        self._buckets  = [{} for _ in range(bands)]   # band -> {band bytes: [kept ids]}
+        self._sigs     = []                           # kept id -> signature
+        self._keys     = []                           # kept id -> caller's key
+
+    def check(self, key, text: str):
+        """
+        Returns (kept_key, similarity) if `text` duplicates a kept chunk,
+        otherwise registers it under `key` and returns None.
+        """
+        sig   = self.hasher.signature(shingles(text, self.shingle))
+        bands = [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        best, best_sim = None, 0.0
+        seen = set()
+        for band, bucket in zip(bands, self._buckets):
+            for kid in bucket.get(band, ()):
+                if kid in seen:
+                    continue
+                seen.add(kid)
+                sim = float(np.mean(self._sigs[kid] == sig))
+                if sim > best_sim:
+                    best, best_sim = kid, sim
+        if best is not None and best_sim >= self.threshold:
+            return self._keys[best], best_sim
+
+        kid = len(self._sigs)
+        self._sigs.append(sig)
+        self._keys.append(key)
+        for band, bucket in zip(bands, self._buckets):
+            bucket.setdefault(band, []).append(kid)
+        return None
@@ -2,20 +2,69 @@
 import os
 import re
 import sys
-import pdfplumber
-from typing import List, Dict
+import time
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+def count_pdf_pages(pdf_path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> Tuple[List[str], float]:
     """
-    Extracts raw text from every page of the given PDF.
+    Extracts raw text of pages [start, stop) of the given PDF.
+    Returns (page_texts, seconds). Top-level so process pools can pickle it.
     """
+    import pdfplumber
+    t0 = time.perf_counter()
     text_pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            text_pages.append(_page_text(page))
+    return text_pages, time.perf_counter() - t0
+
+
+def _page_text(page) -> str:
+    t = page.extract_text(x_tolerance=1) or ""
+    # drop the page's parsed layout objects so long documents do not accumulate them
+    page.close() if hasattr(page, "close") else page.flush_cache()
+    return t
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """
+    Yields the raw text of each page of the given PDF, one page at a time.
+    """
+    import pdfplumber
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
-            t = page.extract_text(x_tolerance=1) or ""
-            text_pages.append(t)
-    return "\n".join(text_pages)
+            yield _page_text(page)
+
+
+def page_ranges(n_pages: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(i, min(i + pages_per_task, n_pages)) for i in range(0, n_pages, pages_per_task)]
+
+
+def extract_text_from_pdf(pdf_path: str, workers: int = 1, pages_per_task: int = 16) -> str:
+    """
+    Extracts raw text from every page of the given PDF.
+    With workers > 1, page ranges are parsed in a process pool; page order is kept.
+    """
+    if workers <= 1:
+        return "\n".join(extract_page_range(pdf_path, 0, None)[0])
+    ranges = page_ranges(count_pdf_pages(pdf_path), pages_per_task)
+    if not ranges:
+        return ""
+    starts, stops = zip(*ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = pool.map(extract_page_range, [pdf_path] * len(ranges), starts, stops)
+        return "\n".join(t for texts, _ in parts for t in texts)
 
 
 def normalize_whitespace(text: str) -> str:
@@ -30,9 +79,15 @@ def normalize_whitespace(text: str) -> str:
     return text.replace('<PARA>', '\n\n').strip()
 
 
+# Longer "headings" are body text that happens to start with a number or be
+# in capitals (pdfplumber pages often have no blank lines at all).
+MAX_HEADING_CHARS = 200
+
+
 def detect_headings(text: str) -> List[Dict[str, int]]:
     """
-    Finds headings in the text. Matches either numbered headings or ALL-CAPS lines.
+    Finds headings in the text. Matches either numbered headings or ALL-CAPS lines
+    of at most MAX_HEADING_CHARS characters.
     Returns a list of dicts with 'start' index and 'title'.
     """
     pattern = re.compile(
@@ -40,7 +95,8 @@ def detect_headings(text: str) -> List[Dict[str, int]]:
         re.MULTILINE
     )
     return [{"start": m.start(), "title": m.group("title").strip()}
-            for m in pattern.finditer(text)]
+            for m in pattern.finditer(text)
+            if len(m.group("title").strip()) <= MAX_HEADING_CHARS]
 
 
 def sliding_window_chunk(words: List[str], win: int, stride: int) -> List[str]:
@@ -89,20 +145,266 @@ def chunk_by_headings(text: str, win: int, stride: int) -> List[Dict[str, str]]:
     return raw_chunks
 
 
-def load_and_chunk_pdf(
-    pdf_path: str,
+# ───── Streaming variants: page → paragraph → chunk, bounded memory ─────
+# These produce exactly the chunks of
+#   chunk_by_headings(normalize_whitespace("\n".join(pages)), win, stride)
+# while holding at most the head of one paragraph (plus one of lookahead) in
+# memory: longer paragraphs are windowed word by word as the lines arrive.
+
+_HEADING_LINE = re.compile(r'(?:\d+(?:\.\d+)*\s+.+|[A-Z][A-Z0-9 ]{3,})')
+# A bare section number ("3", "2.1 ") followed by another paragraph: the
+# heading regex's \s+ runs across the paragraph break, so both form the title.
+_SECTION_NUMBER = re.compile(r'\d+(?:\.\d+)*\s*')
+
+
+def _iter_pieces(pages: Iterable[str]) -> Iterator[Optional[str]]:
+    """
+    The normalized text one line at a time: yields the pieces of each
+    paragraph, with None between paragraphs. Pieces only ever split the
+    text at whitespace.
+    """
+    prev = None     # last content line, held until we know how it ends
+    blanks = 0      # whitespace-only lines since the last content line
+    for page in pages:
+        for line in page.split("\n"):
+            if not line.strip():
+                if prev is not None:
+                    blanks += 1
+                continue
+            if prev is None:
+                prev = line.lstrip()
+            elif blanks:
+                # paragraph break: surrounding spaces survive normalization
+                yield prev
+                yield None
+                prev = line
+            else:
+                # single line-break collapses to one space
+                yield prev.rstrip() + " "
+                prev = line.lstrip()
+            blanks = 0
+    if prev is not None:
+        yield prev.rstrip()
+
+
+def iter_paragraphs(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Streaming normalize_whitespace(): yields the paragraphs of the normalized
+    text ("\n\n".join(paragraphs) == normalize_whitespace("\n".join(pages))).
+    """
+    cur = []
+    for piece in _iter_pieces(pages):
+        if piece is None:
+            yield "".join(cur)
+            cur = []
+        else:
+            cur.append(piece)
+    if cur:
+        yield "".join(cur)
+
+
+class _Paragraph:
+    """
+    One paragraph of an _iter_pieces() stream. Only its head is buffered;
+    words() streams the rest, so no paragraph has to fit in memory.
+    """
+    def __init__(self, first: str, pieces: Iterator[Optional[str]]):
+        self.head = first
+        self.n_words = len(first.split())
+        self.complete = False
+        self._pieces = pieces
+
+    def _rest(self) -> Iterator[str]:
+        while not self.complete:
+            piece = next(self._pieces, None)
+            if piece is None:
+                self.complete = True
+            else:
+                yield piece
+
+    def read(self, chars: int, words: int) -> None:
+        """
+        Buffers until the head is longer than `chars` characters (stripped)
+        and `words` words, or holds the whole paragraph.
+        """
+        for piece in self._rest():
+            self.head += piece
+            self.n_words += len(piece.split())
+            if self.n_words > words and len(self.head.strip()) > chars:
+                return
+
+    def words(self) -> Iterator[str]:
+        yield from self.head.split()
+        for piece in self._rest():
+            yield from piece.split()
+
+
+def _read_paragraphs(pages: Iterable[str]) -> Iterator[_Paragraph]:
+    pieces = _iter_pieces(pages)
+    piece = next(pieces, None)
+    while piece is not None:
+        para = _Paragraph(piece, pieces)
+        yield para
+        for _ in para._rest():      # skip whatever the caller left unread
+            pass
+        piece = next(pieces, None)
+
+
+_DIGITS = re.compile(r'\d+')
+# a page number on a line of its own: "12", "- 12 -", "Page 12", "12 of 30", "12/30"
+_PAGE_NUMBER = re.compile(r'[-–—\s]*(?:page\s*)?\d+(?:\s*(?:of|/)\s*\d+)?[-–—\s]*', re.IGNORECASE)
+
+
+def _line_key(line: str) -> str:
+    line = line.strip()
+    # only page numbers vary from page to page; other digits are content
+    return _DIGITS.sub("#", line) if _PAGE_NUMBER.fullmatch(line) else line
+
+
+def strip_boilerplate(
+    pages: Iterable[str],
+    min_pages: int = 3,
+    sample: int = 8,
+    max_len: int = 160,
+    stats: Dict = None
+) -> Iterator[str]:
+    """
+    Drops running headers and footers: short lines that occur (page
+    numbers matching one another) on at least `min_pages` pages of the
+    document. The first `sample` pages are buffered to learn them up front;
+    after that, counting continues and a line is dropped from the page on
+    which it reaches `min_pages`. Adds the number of dropped lines to
+    stats["boilerplate"].
+    """
+    counts = {}
+    buffered = []
+
+    def keys(page):
+        return {_line_key(l) for l in page.split("\n") if 0 < len(l.strip()) <= max_len}
+
+    def strip(page):
+        kept, dropped = [], 0
+        for line in page.split("\n"):
+            if counts.get(_line_key(line), 0) >= min_pages:
+                dropped += 1
+            else:
+                kept.append(line)
+        if stats is not None:
+            stats["boilerplate"] = stats.get("boilerplate", 0) + dropped
+        return "\n".join(kept)
+
+    pages = iter(pages)
+    for page in islice(pages, sample):
+        buffered.append(page)
+        for k in keys(page):
+            counts[k] = counts.get(k, 0) + 1
+    for page in buffered:
+        yield strip(page)
+    for page in pages:
+        for k in keys(page):
+            counts[k] = counts.get(k, 0) + 1
+        yield strip(page)
+
+
+def iter_windows(words: Iterable[str], win: int, stride: int) -> Iterator[str]:
+    """
+    Streaming sliding_window_chunk() over an iterable of words.
+    """
+    buf = deque()
+    skip = 0
+    for w in words:
+        if skip:
+            skip -= 1
+            continue
+        buf.append(w)
+        if len(buf) > win:
+            yield " ".join(islice(buf, win))
+            drop = min(stride, len(buf))
+            for _ in range(drop):
+                buf.popleft()
+            skip = stride - drop
+    if buf:
+        yield " ".join(buf)
+
+
+def iter_chunks(paragraphs: Iterable[str], win: int, stride: int) -> Iterator[Dict[str, str]]:
+    """
+    Streaming chunk_by_headings() over paragraphs from iter_paragraphs().
+    Text before the first heading is only needed if no heading ever appears
+    (the FULL_DOCUMENT fallback), so its words are spooled to a temp file.
+    """
+    it = (p if isinstance(p, _Paragraph) else _Paragraph(p, iter(())) for p in paragraphs)
+    section = None
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", encoding="utf-8")
+    try:
+        for para in it:
+            para.read(MAX_HEADING_CHARS, win)
+            title, group = None, [para]
+            nxt = None
+            if para.complete and _SECTION_NUMBER.fullmatch(para.head):
+                nxt = next(it, None)
+            if nxt is not None:
+                nxt.read(MAX_HEADING_CHARS, win)
+                group.append(nxt)
+                joined = (para.head + "\n\n" + nxt.head).strip()
+                if nxt.complete and len(joined) <= MAX_HEADING_CHARS:
+                    title = joined
+            elif para.complete and len(para.head.strip()) <= MAX_HEADING_CHARS \
+                    and _HEADING_LINE.fullmatch(para.head):
+                title = para.head.strip()
+
+            if title is not None:
+                if section is None:
+                    spool.seek(0)
+                    spool.truncate()
+                section = title
+            for p in group:
+                if section is None:
+                    for w in p.words():
+                        spool.write(w + "\n")
+                elif p.n_words <= win:
+                    # read() stops early only past `win` words, so this is all of it
+                    yield {"section": section, "text": p.head.strip()}
+                else:
+                    for sub in iter_windows(p.words(), win, stride):
+                        yield {"section": section, "text": sub}
+
+        if section is None:
+            # No headings at all: window over the whole document
+            spool.seek(0)
+            words = (line.rstrip("\n") for line in spool)
+            for sub in iter_windows(words, win, stride):
+                yield {"section": "FULL_DOCUMENT", "text": sub}
+    finally:
+        spool.close()
+
+
+def iter_chunk_records(
+    pages: Iterable[str],
+    doc_id: str,
     win: int = 100,
     stride: int = 50
-) -> List[Dict]:
+) -> Iterator[Dict]:
     """
-    Full pipeline: extract → normalize → detect headings → chunk → wrap records.
+    Streaming chunk_records(): pages in, records out, one at a time.
+    """
+    for idx, c in enumerate(iter_chunks(_read_paragraphs(pages), win, stride)):
+        yield {
+            "doc_id":   doc_id,
+            "section":  c["section"],
+            "chunk_id": idx,
+            "text":     c["text"]
+        }
+
+
+def chunk_records(raw: str, doc_id: str, win: int = 100, stride: int = 50) -> List[Dict]:
+    """
+    normalize → detect headings → chunk → wrap records for one document's raw text.
     """
-    raw = extract_text_from_pdf(pdf_path)
     norm = normalize_whitespace(raw)
     chunks = chunk_by_headings(norm, win, stride)
 
     records = []
-    doc_id = os.path.basename(pdf_path)
     for idx, c in enumerate(chunks):
         records.append({
             "doc_id":   doc_id,
@@ -113,6 +415,19 @@ def load_and_chunk_pdf(
     return records
 
 
+def load_and_chunk_pdf(
+    pdf_path: str,
+    win: int = 100,
+    stride: int = 50,
+    workers: int = 1
+) -> List[Dict]:
+    """
+    Full pipeline: extract → normalize → detect headings → chunk → wrap records.
+    """
+    raw = extract_text_from_pdf(pdf_path, workers=workers)
+    return chunk_records(raw, os.path.basename(pdf_path), win, stride)
+
+
 def load_and_chunk_environmental_data(
     data_dir: str,
     win: int = 100,
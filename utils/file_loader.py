@@ -7,16 +7,23 @@ def load_text_file(path):
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def load_pdf(path):
+def iter_pdf_pages(path):
     """
-    Loads and returns the text content from a PDF file.
+    Yields the text of each non-empty PDF page, one page at a time.
     Requires pdfplumber.
     """
     import pdfplumber
-    text = ""
     with pdfplumber.open(path) as pdf:
         for page in pdf.pages:
             page_text = page.extract_text()
+            # release the page's parsed layout before moving on
+            page.close() if hasattr(page, "close") else page.flush_cache()
             if page_text:
-                text += page_text + "\n"
-    return text
+                yield page_text
+
+def load_pdf(path):
+    """
+    Loads and returns the text content from a PDF file.
+    Requires pdfplumber.
+    """
+    return "".join(page_text + "\n" for page_text in iter_pdf_pages(path))
@@ -1,16 +1,151 @@
 # utils/logger.py
 
 import os
+import gzip
 import json
+import time
+import queue
+import atexit
+import shutil
+import hashlib
+import threading
 from datetime import datetime
 
 LOG_PATH = "evaluation/logs/log.jsonl"
+# rotate once the live file reaches LOG_MAX_BYTES; keep LOG_BACKUPS gzipped segments
+LOG_MAX_BYTES    = int(os.environ.get("LOG_MAX_BYTES", str(10 * 2**20)))
+LOG_BACKUPS      = int(os.environ.get("LOG_BACKUPS", "5"))
+# store a sha256 of each prompt instead of the prompt itself
+LOG_HASH_PROMPTS = os.environ.get("LOG_HASH_PROMPTS", "") not in ("", "0", "false")
 
-def log_query(question, retrieved_chunks, prompt, generated_answer, group_id="default"):
+class QueryLogger:
     """
-    Logs the query details into a JSONL file.
+    Writes log entries from a background thread. log() only enqueues; the
+    writer batches entries and flushes every `flush_every` entries or
+    `flush_interval` seconds, whichever comes first. When the file passes
+    `max_bytes` it is gzipped to <path>.1.gz (older segments shift up and
+    anything beyond `backups` is deleted). If the queue is full, entries
+    are dropped and counted rather than blocking the caller.
+    """
+    def __init__(
+        self,
+        path: str = LOG_PATH,
+        max_bytes: int = LOG_MAX_BYTES,
+        backups: int = LOG_BACKUPS,
+        hash_prompts: bool = LOG_HASH_PROMPTS,
+        flush_every: int = 64,
+        flush_interval: float = 1.0,
+        queue_size: int = 10000
+    ):
+        self.path           = path
+        self.max_bytes      = max_bytes
+        self.backups        = backups
+        self.hash_prompts   = hash_prompts
+        self.flush_every    = flush_every
+        self.flush_interval = flush_interval
+        self.dropped        = 0
+        self._queue         = queue.Queue(maxsize=queue_size)
+        self._closed        = False
+        self._thread        = threading.Thread(target=self._run, name="query-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, entry: dict):
+        if self.hash_prompts and "prompt" in entry:
+            entry = dict(entry)
+            prompt = entry.pop("prompt")
+            entry["prompt_sha256"] = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = None):
+        """
+        Blocks until everything logged so far is on disk.
+        """
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        buffer, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False   # interval elapsed
+            if isinstance(item, dict):
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(buffer) < self.flush_every:
+                    continue
+            # size or interval reached, or a flush/close marker
+            if buffer:
+                self._write(buffer)
+                buffer, deadline = [], None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, entries: list):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as logfile:
+                logfile.write("".join(json.dumps(e) + "\n" for e in entries))
+                size = logfile.tell()
+            if self.max_bytes and size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            # never let a logging failure kill the writer thread
+            print(f"[!] query log write failed: {e}")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(f"{self.path}.1.gz.tmp", f"{self.path}.1.gz")
+        os.remove(self.path)
+
+_LOGGER = None
+_LOGGER_LOCK = threading.Lock()
+
+def get_logger() -> QueryLogger:
+    """
+    The process-wide QueryLogger, writing to LOG_PATH.
+    """
+    global _LOGGER
+    with _LOGGER_LOCK:
+        if _LOGGER is None or _LOGGER.path != LOG_PATH:
+            if _LOGGER is not None:
+                _LOGGER.close()
+            _LOGGER = QueryLogger(LOG_PATH)
+    return _LOGGER
+
+def log_query(question, retrieved_chunks, prompt, generated_answer, group_id="default",
+              timings=None, tokens=None, cached=None):
+    """
+    Logs the query details into a JSONL file. `timings` (stage -> seconds),
+    `tokens` (prompt/completion counts) and `cached` are added when given.
+    The entry is written asynchronously by the background logger.
     """
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "question": question,
@@ -19,5 +154,10 @@ def log_query(question, retrieved_chunks, prompt, generated_answer, group_id="de
         "generated_answer": generated_answer,
         "group_id": group_id
     }
-    with open(LOG_PATH, "a", encoding="utf-8") as logfile:
-        logfile.write(json.dumps(log_entry) + "\n")
+    if timings is not None:
+        log_entry["timings"] = timings
+    if tokens is not None:
+        log_entry["tokens"] = tokens
+    if cached is not None:
+        log_entry["cached"] = cached
+    get_logger().log(log_entry)
@@ -0,0 +1,199 @@
+# utils/metrics.py
+
+import sys
+import gzip
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds in seconds; spans a cache hit (~µs) to a slow completion (~s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class StageTimer:
+    """
+    Per-request stage durations in seconds. Time spent on a whole batch can
+    be attributed to each request in it with add().
+    """
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_dict(self) -> dict:
+        return {k: round(v, 6) for k, v in self.stages.items()}
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * len(self.buckets)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum   += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms, keyed by metric name and a label
+    tuple, rendered in the Prometheus text exposition format.
+    """
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._counters   = {}   # name -> {labels: value}
+        self._histograms = {}   # name -> {labels: Histogram}
+        self._help       = {}
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def snapshot(self) -> dict:
+        """
+        Plain-dict copy: counters by label string, histograms as count/sum.
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name: {_labels(k): v for k, v in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {_labels(k): {"count": h.count, "sum": h.sum} for k, h in series.items()}
+                    for name, series in self._histograms.items()
+                }
+            }
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(h.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# process-wide registry used by the pipeline
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("rag_requests_total", "Answered questions")
+REGISTRY.describe("rag_stage_seconds", "Time per pipeline stage and request")
+REGISTRY.describe("rag_tokens_total", "Tokens reported by the generation API")
+REGISTRY.describe("rag_coalesced_requests_total", "Generation calls that joined an identical request in flight")
+
+def record_request(timings: dict, tokens: dict = None, cached: bool = False, registry: MetricsRegistry = None):
+    """
+    Folds one request's stage timings (seconds) and token usage into `registry`.
+    """
+    registry = registry or REGISTRY
+    registry.inc("rag_requests_total", cached=str(bool(cached)).lower())
+    for stage, seconds in timings.items():
+        registry.observe("rag_stage_seconds", seconds, stage=stage)
+    for kind, count in (tokens or {}).items():
+        if count:
+            registry.inc("rag_tokens_total", count, kind=kind)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_SERVERS = {}
+_SERVERS_LOCK = threading.Lock()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = None):
+    """
+    Serves GET /metrics from a daemon thread; at most one server per port.
+    Returns the server (port 0 picks a free port, see server.server_address).
+    """
+    with _SERVERS_LOCK:
+        if port and port in _SERVERS:
+            return _SERVERS[port]
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.registry = registry or REGISTRY
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        _SERVERS[server.server_address[1]] = server
+        return server
+
+def registry_from_log(path: str) -> MetricsRegistry:
+    """
+    Rebuilds the metrics from the timings/tokens stored in a log.jsonl
+    (or one of its gzipped rotated segments).
+    """
+    registry = MetricsRegistry()
+    registry._help = dict(REGISTRY._help)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "timings" in entry:
+                record_request(entry["timings"], entry.get("tokens"), entry.get("cached", False), registry)
+    return registry
+
+if __name__ == "__main__":
+    # Dump metrics aggregated from a query log: python -m utils.metrics [log.jsonl]
+    from utils.logger import LOG_PATH
+    sys.stdout.write(registry_from_log(sys.argv[1] if len(sys.argv) > 1 else LOG_PATH).render())